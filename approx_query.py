@@ -0,0 +1,513 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基于分层样本的近似查询 (HR离职分析版)
+
+Notebook 中的探索性问题（如按部门 × 工作年限 × 工时区间的离职率）不需要精确答案，
+却每次都要扫描整张员工表。此模块：
+- 按 (部门, 是否离职) 分层，每层维护一个容量有界的均匀样本（默认每层 2000 人），
+  并记录每层的总体人数，查询只读取样本（几万行），与员工表的规模无关
+- 样本按员工ID的固定伪随机键取每层最小的 k 个（bottom-k），入职、离职只需比较键与该层的阈值，
+  不必重新抽样；daily_update 和 ingest 在同一事务中增量更新，某层因离职变得过小时只重建该层
+- 支持人数、比率（如离职率）和均值，按分层抽样公式给出标准误和置信区间（含有限总体校正）
+- 调用方可以指定误差要求（置信区间半宽的绝对值或相对值）：样本达不到要求时自动改为扫描全表；
+  exact=True 时直接使用全表，全表数据读取一次后缓存复用
+- 持久化在 sample_strata（各层总体人数、样本数、阈值）和 employee_samples（样本员工ID）两张表中
+
+示例：
+    q = ApproxQuery()
+    q.rate('left', by=['department', 'average_monthly_hours'],
+           bins={'average_monthly_hours': [96, 150, 200, 250, 311]}, max_error=0.05)
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from statistics import NormalDist
+
+import numpy as np
+
+import storage
+from storage import EMPLOYEE_COLUMNS, connect_for_analytics, get_backend
+
+DEFAULT_CAPACITY = 2000           # 每层的样本容量
+REFILL_RATIO = 0.5                # 离职使某层样本少于容量的一半时重建该层
+DEFAULT_CONFIDENCE = 0.95
+MIN_GROUP_ROWS = 30               # 指定误差要求时，每组至少需要的样本行数（太少时方差估计不可靠）
+KEY_LIMIT = 2 ** 53               # 样本键的上界，阈值为上界时该层全部入样
+KEY_SEPARATOR = '|'
+DELETE_BATCH_SIZE = 1000
+STRATUM_COLUMNS = ['department', 'left']
+# 查询时读取的员工列
+QUERY_COLUMNS = [column for column in EMPLOYEE_COLUMNS if column != 'name']
+QUERY_KINDS = ('count', 'rate', 'mean')
+
+
+def sample_keys(employee_ids):
+    """每个员工固定的伪随机样本键（splitmix64 的高53位），同一员工在任何分层中的键相同"""
+    z = np.asarray(employee_ids, dtype=np.int64).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.int64)
+
+
+def make_key(department, left):
+    return f"{department}{KEY_SEPARATOR}{int(left)}"
+
+
+# ---- 样本维护 ----
+
+def load_strata(conn):
+    """读取各层信息，返回 {层: {'population', 'sample_count', 'capacity', 'threshold'}}"""
+    if not get_backend().table_exists(conn, 'sample_strata'):
+        return {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT stratum_key, population, sample_count, capacity, threshold FROM sample_strata")
+        return {
+            key: {'population': int(population), 'sample_count': int(count),
+                  'capacity': int(capacity), 'threshold': int(threshold)}
+            for key, population, count, capacity, threshold in cursor.fetchall()
+        }
+    finally:
+        cursor.close()
+
+
+def save_strata(conn, strata, keys=None):
+    """在调用方的事务中写回各层信息（keys 为 None 时写回全部）"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = [(key, strata[key]['population'], strata[key]['sample_count'], strata[key]['capacity'],
+             strata[key]['threshold'], now) for key in sorted(strata if keys is None else keys)]
+    get_backend().bulk_insert(conn, 'sample_strata',
+                              ['stratum_key', 'population', 'sample_count', 'capacity', 'threshold', 'updated_at'],
+                              rows, upsert_key='stratum_key')
+
+
+def _bottom_k(employee_ids, capacity):
+    """按样本键取最小的 capacity 个，返回 (样本ID, 样本键, 阈值)"""
+    keys = sample_keys(employee_ids)
+    order = np.argsort(keys, kind='stable')
+    if len(order) <= capacity:
+        return np.asarray(employee_ids, dtype=np.int64)[order], keys[order], KEY_LIMIT
+    threshold = int(keys[order[capacity]])
+    order = order[:capacity]
+    return np.asarray(employee_ids, dtype=np.int64)[order], keys[order], threshold
+
+
+def _insert_samples(conn, stratum_key, employee_ids, keys):
+    get_backend().bulk_insert(conn, 'employee_samples', ['employee_id', 'stratum_key', 'sample_key'],
+                              [(int(emp_id), stratum_key, int(key)) for emp_id, key in zip(employee_ids, keys)],
+                              upsert_key='employee_id')
+
+
+def _delete_samples(conn, employee_ids):
+    employee_ids = list(employee_ids)
+    cursor = conn.cursor()
+    try:
+        for i in range(0, len(employee_ids), DELETE_BATCH_SIZE):
+            chunk = employee_ids[i:i + DELETE_BATCH_SIZE]
+            cursor.execute(f"DELETE FROM employee_samples WHERE employee_id IN ({', '.join(['%s'] * len(chunk))})",
+                           tuple(chunk))
+    finally:
+        cursor.close()
+
+
+def rebuild_samples(conn, capacity=DEFAULT_CAPACITY):
+    """扫描员工表重建全部分层样本，不提交，返回各层信息"""
+    backend = get_backend()
+    backend.ensure_table(conn, 'sample_strata')
+    backend.ensure_table(conn, 'employee_samples')
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT employee_id, department, {backend.quote('left')} FROM employees")
+        rows = cursor.fetchall()
+        cursor.execute("DELETE FROM employee_samples")
+        cursor.execute("DELETE FROM sample_strata")
+    finally:
+        cursor.close()
+
+    groups = {}
+    for emp_id, department, left in rows:
+        groups.setdefault(make_key(department, left), []).append(emp_id)
+    strata = {}
+    for key, employee_ids in groups.items():
+        sample_ids, keys, threshold = _bottom_k(employee_ids, capacity)
+        _insert_samples(conn, key, sample_ids, keys)
+        strata[key] = {'population': len(employee_ids), 'sample_count': len(sample_ids),
+                       'capacity': capacity, 'threshold': threshold}
+    save_strata(conn, strata)
+    return strata
+
+
+def _rebuild_stratum(conn, strata, key):
+    """只重建一层（离职使样本过小时）"""
+    backend = get_backend()
+    department, left = key.split(KEY_SEPARATOR)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT employee_id FROM employees WHERE department = %s AND {backend.quote('left')} = %s",
+                       (department, int(left)))
+        employee_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("DELETE FROM employee_samples WHERE stratum_key = %s", (key,))
+    finally:
+        cursor.close()
+    sample_ids, keys, threshold = _bottom_k(employee_ids, strata[key]['capacity'])
+    _insert_samples(conn, key, sample_ids, keys)
+    strata[key].update(population=len(employee_ids), sample_count=len(sample_ids), threshold=threshold)
+
+
+def _trim_stratum(conn, strata, key):
+    """样本超过容量时降低阈值，只保留键最小的 capacity 个"""
+    stratum = strata[key]
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT sample_key FROM employee_samples WHERE stratum_key = %s "
+                       f"ORDER BY sample_key LIMIT 1 OFFSET {stratum['capacity']}", (key,))
+        threshold = int(cursor.fetchone()[0])
+        cursor.execute("DELETE FROM employee_samples WHERE stratum_key = %s AND sample_key >= %s", (key, threshold))
+    finally:
+        cursor.close()
+    stratum.update(sample_count=stratum['capacity'], threshold=threshold)
+
+
+def update_samples(conn, hires, exits):
+    """在调用方的事务中用入职、离职员工（字典列表）增量更新样本，返回更新的层数
+
+    每层的样本始终是"该层中样本键小于阈值的全部员工"：入职、离职只需比较键与阈值。
+    表为空（首次运行）时改为扫描员工表完整建立。调用前应先确保两张表已存在
+    （ensure_table 会提交，不能在更新事务中途调用），并已写入员工表的变更。
+    """
+    strata = load_strata(conn)
+    if not strata:
+        return len(rebuild_samples(conn))
+    capacity = max(stratum['capacity'] for stratum in strata.values())
+
+    def stratum(key):
+        return strata.setdefault(key, {'population': 0, 'sample_count': 0, 'capacity': capacity,
+                                       'threshold': KEY_LIMIT})
+
+    pending = {}      # 待写入的样本 {员工ID: (层, 键)}
+    deleted = set()
+    touched = set()
+    hire_keys = sample_keys([emp['employee_id'] for emp in hires])
+    for emp, key in zip(hires, hire_keys.tolist()):
+        active = make_key(emp['department'], 0)
+        stratum(active)['population'] += 1
+        if key < strata[active]['threshold']:
+            pending[int(emp['employee_id'])] = (active, key)
+            strata[active]['sample_count'] += 1
+        touched.add(active)
+    exit_keys = sample_keys([emp['employee_id'] for emp in exits])
+    for emp, key in zip(exits, exit_keys.tolist()):
+        emp_id = int(emp['employee_id'])
+        active, left = make_key(emp['department'], 0), make_key(emp['department'], 1)
+        stratum(active)['population'] -= 1
+        if key < strata[active]['threshold']:
+            if pending.pop(emp_id, None) is None:
+                deleted.add(emp_id)
+            strata[active]['sample_count'] -= 1
+        stratum(left)['population'] += 1
+        if key < strata[left]['threshold']:
+            pending[emp_id] = (left, key)
+            strata[left]['sample_count'] += 1
+        touched.update((active, left))
+
+    _delete_samples(conn, deleted)
+    get_backend().bulk_insert(conn, 'employee_samples', ['employee_id', 'stratum_key', 'sample_key'],
+                              [(emp_id, key, sample_key) for emp_id, (key, sample_key) in pending.items()],
+                              upsert_key='employee_id')
+    for key in sorted(touched):
+        info = strata[key]
+        if info['sample_count'] > info['capacity']:
+            _trim_stratum(conn, strata, key)
+        elif info['sample_count'] < info['capacity'] * REFILL_RATIO and info['population'] > info['sample_count']:
+            _rebuild_stratum(conn, strata, key)
+    save_strata(conn, strata, touched)
+    return len(touched)
+
+
+# ---- 查询 ----
+
+def _select_frame(conn, sample):
+    """读取样本员工（sample 为真）或全部员工，附加所属分层"""
+    import pandas as pd
+
+    backend = get_backend()
+    columns = ', '.join(f"e.{backend.quote(column)}" for column in QUERY_COLUMNS)
+    if sample:
+        query = (f"SELECT {columns}, s.stratum_key FROM employee_samples s "
+                 f"JOIN employees e ON e.employee_id = s.employee_id")
+    else:
+        query = f"SELECT {columns} FROM employees e"
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    frame = pd.DataFrame(rows, columns=QUERY_COLUMNS + (['stratum_key'] if sample else []))
+    if not sample:
+        frame['stratum_key'] = frame['department'].astype(str) + KEY_SEPARATOR + frame['left'].astype(int).astype(str)
+    return frame
+
+
+def _bin(values, edges):
+    """按区间 [下限, 上限) 分箱，标签如 '150-200'"""
+    import pandas as pd
+
+    labels = [f"{low:g}-{high:g}" for low, high in zip(edges[:-1], edges[1:])]
+    return pd.cut(values, edges, right=False, labels=labels)
+
+
+def _wilson_interval(rate, variance, sample_rows, z):
+    """比率的 Wilson 区间（按有效样本量 p(1-p)/方差 计算），比率接近0或1时比正态区间可靠
+
+    方差为0时：比率为0或1（样本中全部相同）用样本行数作为有效样本量；
+    否则比率由分层本身确定（如按部门的离职率），区间宽度为0。
+    """
+    rate = rate.clip(0, 1)
+    spread = rate * (1 - rate)
+    effective = (spread / variance.where(variance > 0)).where(spread > 0, sample_rows.astype(float))
+    exact = effective.isna()
+    effective = effective.fillna(1.0)
+    denominator = 1 + z ** 2 / effective
+    center = (rate + z ** 2 / (2 * effective)) / denominator
+    half = z * np.sqrt(spread / effective + z ** 2 / (4 * effective ** 2)) / denominator
+    return (center - half).clip(lower=0).where(~exact, rate), (center + half).clip(upper=1).where(~exact, rate)
+
+
+class Estimator:
+    """由样本（或全表）和各层的总体人数计算分层估计值与置信区间"""
+
+    def __init__(self, frame, strata, exact=False):
+        self.frame = frame
+        self.strata = strata      # 以层为索引，含 population、sample_count 两列
+        self.exact = exact
+
+    def estimate(self, kind='count', column=None, by=(), where=None, bins=None, confidence=DEFAULT_CONFIDENCE):
+        """估计各组的人数（count）、column 的比率（rate，0/1列）或均值（mean）
+
+        where 为 DataFrame.query 表达式，bins 为 {列: 分箱边界}。返回各组的
+        estimate、stderr、ci_low、ci_high、margin（置信区间半宽）和 sample_rows。
+        """
+        if kind not in QUERY_KINDS:
+            raise ValueError(f"未知的查询类型: {kind}")
+        if kind != 'count' and column is None:
+            raise ValueError(f"{kind} 查询需要指定列")
+        by = [by] if isinstance(by, str) else list(by)
+        frame = self.frame.query(where) if where else self.frame
+        if bins:
+            frame = frame.assign(**{name: _bin(frame[name], edges) for name, edges in bins.items()})
+        values = frame[column].astype(float) if kind != 'count' else 1.0
+        frame = frame.assign(_all=0, _y=values, _yy=values * values)
+        group_by = by or ['_all']
+
+        # 每个 (组, 层) 的样本行数 m、Σy、Σy²，再按分层抽样公式汇总到组
+        cells = (frame.groupby([*group_by, 'stratum_key'], observed=True)
+                 .agg(m=('_y', 'size'), sy=('_y', 'sum'), syy=('_yy', 'sum'))
+                 .reset_index().join(self.strata, on='stratum_key'))
+        n, population = cells['sample_count'], cells['population']
+        weight = population / n
+        # 各层方差的系数 N²(1-n/N)/n，全表时为0
+        scale = (population ** 2 * (1 - n / population) / n).where(n > 1, 0.0)
+        cells['total'] = weight * cells['m']
+        cells['total_y'] = weight * cells['sy']
+        cells['var_count'] = scale * (cells['m'] - cells['m'] ** 2 / n) / (n - 1).clip(lower=1)
+
+        groups = cells.groupby(group_by, observed=True)[['total', 'total_y', 'var_count', 'm']].sum()
+        if kind == 'count':
+            estimate, variance = groups['total'], groups['var_count']
+        else:
+            ratio = groups['total_y'] / groups['total']
+            r = cells[group_by].merge(ratio.rename('r').reset_index(), on=group_by, how='left')['r'].to_numpy()
+            m, sy, syy = cells['m'], cells['sy'], cells['syy']
+            # 线性化残差 d = y - R 在层内的样本方差（层内不在组中的行 d = 0）
+            residual = (syy - 2 * r * sy + r ** 2 * m) - (sy - r * m) ** 2 / n
+            # 组内 y 恒定时残差应为0，去掉相减产生的舍入误差
+            residual = residual.where(residual > 1e-9 * (syy.abs() + r ** 2 * m), 0.0)
+            cells['var_ratio'] = scale * residual / (n - 1).clip(lower=1)
+            estimate = ratio
+            variance = cells.groupby(group_by, observed=True)['var_ratio'].sum() / groups['total'] ** 2
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        stderr = np.sqrt(variance)
+        result = groups[[]].copy()
+        result['estimate'] = estimate
+        result['stderr'] = stderr
+        if kind == 'rate' and not self.exact:
+            low, high = _wilson_interval(estimate, variance, groups['m'], z)
+        else:
+            low, high = estimate - z * stderr, estimate + z * stderr
+            if kind == 'count':
+                low = low.clip(lower=0)
+        result['ci_low'] = low
+        result['ci_high'] = high
+        result['margin'] = (high - low) / 2
+        result['sample_rows'] = groups['m'].astype(int)
+        result = result.reset_index()
+        return result.drop(columns='_all') if not by else result
+
+
+def meets_target(result, max_error=None, max_relative_error=None):
+    """估计结果是否满足误差要求（每组置信区间半宽不超过要求，且样本行数不少于 MIN_GROUP_ROWS）"""
+    if max_error is None and max_relative_error is None:
+        return True
+    if (result['sample_rows'] < MIN_GROUP_ROWS).any():
+        return False
+    if max_error is not None and (result['margin'] > max_error).any():
+        return False
+    if max_relative_error is not None and (result['margin'] > max_relative_error * result['estimate'].abs()).any():
+        return False
+    return True
+
+
+class ApproxQuery:
+    """近似查询入口：默认用分层样本回答，exact=True 或达不到误差要求时扫描全表
+
+    数据在首次查询时读取（配置了分析副本时读副本）并缓存在内存中，refresh() 后重新读取。
+    """
+
+    def __init__(self, confidence=DEFAULT_CONFIDENCE):
+        self.confidence = confidence
+        self._sample = None
+        self._population = None
+
+    def refresh(self):
+        self._sample = None
+        self._population = None
+
+    def sample(self):
+        """分层样本的 Estimator"""
+        if self._sample is None:
+            conn, _ = connect_for_analytics()
+            try:
+                strata = load_strata(conn)
+                if not strata:
+                    raise RuntimeError("样本表为空，请先运行 approx_query.py --rebuild 或 daily_update.py")
+                frame = _select_frame(conn, sample=True)
+            finally:
+                conn.close()
+            import pandas as pd
+            self._sample = Estimator(frame, pd.DataFrame.from_dict(strata, orient='index')[['population', 'sample_count']])
+        return self._sample
+
+    def population(self):
+        """全表的 Estimator（每层的样本即总体，标准误为0）"""
+        if self._population is None:
+            conn, _ = connect_for_analytics()
+            try:
+                frame = _select_frame(conn, sample=False)
+            finally:
+                conn.close()
+            counts = frame['stratum_key'].value_counts()
+            strata = counts.to_frame('population').assign(sample_count=counts)
+            self._population = Estimator(frame, strata, exact=True)
+        return self._population
+
+    def query(self, kind='count', column=None, by=(), where=None, bins=None,
+              max_error=None, max_relative_error=None, exact=False):
+        """估计人数、比率或均值；结果的 attrs['exact'] 表示是否由全表计算"""
+        args = dict(kind=kind, column=column, by=by, where=where, bins=bins, confidence=self.confidence)
+        if not exact:
+            result = self.sample().estimate(**args)
+            if meets_target(result, max_error, max_relative_error):
+                result.attrs['exact'] = False
+                return result
+            logging.info("样本达不到误差要求，改为扫描全表")
+        result = self.population().estimate(**args)
+        result.attrs['exact'] = True
+        return result
+
+    def count(self, by=(), where=None, bins=None, **options):
+        """估计人数"""
+        return self.query('count', None, by, where, bins, **options)
+
+    def rate(self, column='left', by=(), where=None, bins=None, **options):
+        """估计0/1列的比率（默认为离职率）"""
+        return self.query('rate', column, by, where, bins, **options)
+
+    def mean(self, column, by=(), where=None, bins=None, **options):
+        """估计列的均值"""
+        return self.query('mean', column, by, where, bins, **options)
+
+
+def print_strata(strata):
+    """打印各层的总体人数、样本数和抽样比例"""
+    print("\n===== 分层样本 =====")
+    print(f"{'分层':<18} {'总体人数':>10} {'样本数':>8} {'抽样比例':>8}")
+    for key in sorted(strata):
+        info = strata[key]
+        fraction = info['sample_count'] / info['population'] if info['population'] else 0
+        print(f"{key:<18} {info['population']:>10,} {info['sample_count']:>8,} {fraction:>8.1%}")
+    print(f"合计: 总体 {sum(s['population'] for s in strata.values()):,} 人，"
+          f"样本 {sum(s['sample_count'] for s in strata.values()):,} 人")
+
+
+def parse_bins(values):
+    """解析 列=边界1,边界2,... 形式的分箱参数"""
+    bins = {}
+    for value in values:
+        column, _, edges = value.partition('=')
+        bins[column] = [float(edge) for edge in edges.split(',')]
+    return bins
+
+
+def main():
+    """主函数：重建样本、查看分层，或运行一次近似查询"""
+    parser = argparse.ArgumentParser(description='基于分层样本的近似查询')
+    parser.add_argument('--rebuild', action='store_true', help='扫描员工表重建分层样本')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help='重建时每层的样本容量')
+    parser.add_argument('--status', action='store_true', help='显示各层的总体人数和样本数')
+    parser.add_argument('--rate', type=str, metavar='COLUMN', help='估计0/1列的比率（如 left）')
+    parser.add_argument('--mean', type=str, metavar='COLUMN', help='估计列的均值')
+    parser.add_argument('--by', type=str, nargs='+', default=[], help='分组列')
+    parser.add_argument('--where', type=str, help='筛选条件（DataFrame.query 表达式）')
+    parser.add_argument('--bins', type=str, nargs='+', default=[], help='分箱，如 average_monthly_hours=96,150,200,250,311')
+    parser.add_argument('--max-error', type=float, help='置信区间半宽的上限（绝对值），达不到时扫描全表')
+    parser.add_argument('--max-relative-error', type=float, help='置信区间半宽相对于估计值的上限')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE, help='置信水平')
+    parser.add_argument('--exact', action='store_true', help='扫描全表计算精确值')
+    storage.add_cli_arguments(parser, replica=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage.configure_from_args(args)
+
+    if args.rebuild or args.status:
+        conn = get_backend().connect()
+        try:
+            if args.rebuild:
+                start = time.perf_counter()
+                strata = rebuild_samples(conn, args.capacity)
+                conn.commit()
+                logging.info(f"已重建 {len(strata)} 个分层的样本，耗时 {time.perf_counter() - start:.2f} 秒")
+            else:
+                strata = load_strata(conn)
+        finally:
+            conn.close()
+        print_strata(strata)
+        return 0
+
+    import pandas as pd
+
+    kind, column = ('rate', args.rate) if args.rate else (('mean', args.mean) if args.mean else ('count', None))
+    query = ApproxQuery(args.confidence)
+    start = time.perf_counter()
+    try:
+        result = query.query(kind, column, args.by, args.where, parse_bins(args.bins),
+                             max_error=args.max_error, max_relative_error=args.max_relative_error, exact=args.exact)
+    except (RuntimeError, ValueError, KeyError, pd.errors.UndefinedVariableError) as e:
+        logging.error(f"查询失败: {e}")
+        return 1
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(result.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    logging.info(f"{'全表' if result.attrs['exact'] else '样本'}查询耗时 {time.perf_counter() - start:.2f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
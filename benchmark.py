@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工数据脚本基准测试 (HR离职分析版)
+
+此脚本在不依赖MySQL服务的情况下测量关键函数的耗时：
+- 覆盖 generate_employee_data、calculate_turnover_probability、display_sample_data、
+  import_to_mysql、select_employees_for_termination 和一次完整的 update_employee_database
+- 默认规模为 15k、150k、1.5M 条员工记录
+- 数据库操作通过 storage 模块的SQLite后端在临时文件上执行，不会触及生产库
+- 每次运行的结果（含git提交号）追加到 benchmark_results.jsonl，
+  并与上一个不同提交的结果对比，便于发现性能回退
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import daily_update
+import data
+import storage
+
+BENCHMARK_SIZES = [15000, 150000, 1500000]
+DEFAULT_RESULTS_FILE = 'benchmark_results.jsonl'
+REGRESSION_THRESHOLD = 1.2   # 比上一个提交慢20%以上视为回退
+LARGE_SIZE = 1000000         # 超过此规模时每项只运行一轮
+BENCHMARK_DATE = date(2025, 6, 2)  # 固定的周一，保证每日变动规模可比
+
+
+def get_git_revision():
+    """获取当前git提交号，工作区有未提交修改时加上 -dirty 后缀"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def time_rounds(func, rounds, setup=None):
+    """运行 func 多轮并返回每轮耗时（秒），setup 不计入耗时"""
+    timings = []
+    result = None
+    for i in range(rounds):
+        with contextlib.redirect_stdout(io.StringIO()):
+            args = setup(i) if setup else ()
+            started = time.perf_counter()
+            result = func(*args)
+            timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def run_size(size, rounds, workdir, backend='sqlite'):
+    """在指定规模下运行全部基准测试，返回 {基准名称: 耗时列表}"""
+    db_path = os.path.join(workdir, f'employee_db_{size}.{backend}')
+    storage.configure(backend, path=db_path)
+    timings = {}
+
+    def reseed(i=0):
+        random.seed(42 + i)
+        np.random.seed(42 + i)
+        return ()
+
+    timings['generate_employee_data'], employees_data = time_rounds(
+        lambda: data.generate_employee_data(size), rounds, setup=reseed)
+
+    score_args = [(
+        emp['satisfaction_level'], emp['last_evaluation'], emp['number_project'],
+        emp['average_monthly_hours'], emp['time_spend_company'], emp['Work_accident'],
+        emp['promotion_last_5years']
+    ) for emp in employees_data]
+    timings['calculate_turnover_probability'], _ = time_rounds(
+        lambda: [data.calculate_turnover_probability(*args) for args in score_args], rounds)
+
+    columns = [np.array(column) for column in zip(*score_args)]
+    timings['calculate_turnover_probability_batch'], _ = time_rounds(
+        lambda: daily_update.calculate_turnover_probability_batch(*columns), rounds)
+
+    timings['display_sample_data'], _ = time_rounds(
+        lambda: data.display_sample_data(employees_data), rounds, setup=reseed)
+
+    def fresh_database(i):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        data.create_database()
+        return ()
+
+    timings['import_to_mysql'], _ = time_rounds(
+        lambda: data.import_to_mysql(employees_data), rounds, setup=fresh_database)
+
+    active_count = sum(1 for emp in employees_data if emp['left'] == 0)
+    reseed()
+    _, termination_count = daily_update.calculate_daily_changes(active_count, BENCHMARK_DATE)
+    timings['select_employees_for_termination'], _ = time_rounds(
+        lambda: daily_update.select_employees_for_termination(termination_count, BENCHMARK_DATE),
+        rounds, setup=reseed)
+
+    # 先初始化 last_update 表，之后每轮更新连续的下一天
+    daily_update.get_last_update_date()
+
+    def next_day(i):
+        reseed(i)
+        return (BENCHMARK_DATE + timedelta(days=i),)
+
+    timings['update_employee_database'], updated = time_rounds(
+        daily_update.update_employee_database, rounds, setup=next_day)
+    if not updated:
+        logging.warning(f"规模 {size} 的 update_employee_database 未成功执行")
+
+    return timings
+
+
+def load_results(path):
+    """读取历史基准结果"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_with_previous(records, history, threshold=REGRESSION_THRESHOLD):
+    """与上一个不同提交的同名基准对比，打印耗时变化"""
+    print("\n===== 与上一个提交对比 =====")
+    regressions = 0
+    for record in records:
+        previous = [
+            old for old in history
+            if old['benchmark'] == record['benchmark'] and old['size'] == record['size']
+            and old.get('backend', 'sqlite') == record['backend'] and old['revision'] != record['revision']
+        ]
+        if not previous:
+            print(f"  {record['benchmark']} @ {record['size']}: 无历史记录")
+            continue
+        baseline = previous[-1]
+        ratio = record['median'] / baseline['median'] if baseline['median'] else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = '  <-- 性能回退'
+            regressions += 1
+        print(f"  {record['benchmark']} @ {record['size']}: {baseline['median']:.4f}s ({baseline['revision']}) -> "
+              f"{record['median']:.4f}s, {ratio:.2f}x{flag}")
+    return regressions
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='员工数据脚本基准测试')
+    parser.add_argument('--sizes', type=str, default=','.join(str(size) for size in BENCHMARK_SIZES),
+                        help='逗号分隔的员工规模列表')
+    parser.add_argument('--rounds', type=int, default=3, help='每项基准的运行轮数')
+    parser.add_argument('--results', type=str, default=DEFAULT_RESULTS_FILE, help='结果文件路径')
+    parser.add_argument('--no-save', action='store_true', help='不保存本次结果')
+    parser.add_argument('--backend', choices=['sqlite', 'duckdb'], default='sqlite', help='嵌入式存储后端')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    revision = get_git_revision()
+    history = load_results(args.results)
+    logging.disable(logging.INFO)
+
+    records = []
+    with tempfile.TemporaryDirectory(prefix='workforce_bench_') as workdir:
+        cwd = os.getcwd()
+        # import_to_mysql 会在当前目录写备份CSV，切换到临时目录避免覆盖仓库文件
+        os.chdir(workdir)
+        try:
+            for size in sizes:
+                rounds = args.rounds if size < LARGE_SIZE else 1
+                print(f"\n===== 规模 {size} (每项 {rounds} 轮) =====")
+                for name, timings in run_size(size, rounds, workdir, args.backend).items():
+                    record = {
+                        'revision': revision,
+                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        'python': platform.python_version(),
+                        'backend': args.backend,
+                        'size': size,
+                        'benchmark': name,
+                        'rounds': len(timings),
+                        'min': min(timings),
+                        'median': statistics.median(timings),
+                        'max': max(timings)
+                    }
+                    records.append(record)
+                    print(f"  {name}: 中位数 {record['median']:.4f}s, 最小 {record['min']:.4f}s")
+        finally:
+            os.chdir(cwd)
+
+    regressions = compare_with_previous(records, history)
+
+    if not args.no_save:
+        with open(args.results, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"\n结果已追加到 {args.results}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生成器参数校准 (HR离职分析版)
+
+data.py 中各分布的参数（满意度/评估分数的 beta 参数、离职员工的项目数偏移、工时、事故率和晋升率）
+原本靠手工调整，每调一次都要生成15000条记录再看 display_sample_data 的输出。此脚本自动拟合：
+- 向量化采样器：噪声（均匀数、正态数）按固定种子只抽一次，参数变化时只重新变换，
+  目标函数对参数连续，优化器不会被抽样噪声干扰；离散部分（项目数、离职与否）按概率加权而不抽样
+- 目标为各项边际统计（满意度/评估/工时均值、项目数分布、事故率、晋升率）和分层离职率
+  （按项目数、工时区间、满意度区间），默认取原始数据集的数值，也可以从数据集CSV直接计算
+- 用有界 Nelder-Mead 最小化 Σ((模拟值 - 目标值) / 容差)²，几秒内完成
+- 输出参数文件（data.py 启动时自动读取）和拟合优度报告；--check 用拟合后的参数真正运行一次
+  data.generate_employee_data，核对生成器的实际统计
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import data
+from bitmap_index import BIN_COLUMNS
+
+DEFAULT_SAMPLE_SIZE = 20000
+DEFAULT_SEED = 42
+BETA_GRID = 2048    # beta 分布逆函数的网格点数
+HOURS_RANGE = (96, 310)    # 月均工时的上下限（与 data.generate_monthly_hours 一致）
+
+PROJECTS = np.array(list(data.PROJECT_DISTRIBUTION))
+PROJECT_WEIGHTS = np.array(list(data.PROJECT_DISTRIBUTION.values())) / sum(data.PROJECT_DISTRIBUTION.values())
+
+# 参数的取值范围，优化在范围内进行
+PARAMETER_BOUNDS = {
+    'leaver_satisfaction_a': (1, 20),
+    'leaver_satisfaction_b': (1, 20),
+    'stayer_satisfaction_a': (1, 20),
+    'stayer_satisfaction_b': (1, 20),
+    'evaluation_a': (1, 20),
+    'evaluation_b': (1, 20),
+    'leaver_project_shift_rate': (0, 1),
+    'leaver_project_up_share': (0, 1),
+    'hours_mean': (150, 250),
+    'hours_sd': (5, 80),
+    'hours_per_project': (0, 40),
+    'leaver_hours_shift': (-40, 40),
+    'leaver_accident_rate': (0, 0.5),
+    'stayer_accident_rate': (0, 0.5),
+    'leaver_promotion_rate': (0, 0.2),
+    'stayer_promotion_rate': (0, 0.2)
+}
+
+# 默认目标 - 基于原始数据集
+TARGETS = {
+    'satisfaction_mean_left': 0.440,
+    'satisfaction_mean_stayed': 0.667,
+    'satisfaction_sd': 0.249,
+    'evaluation_mean': 0.716,
+    'evaluation_sd': 0.171,
+    'hours_mean_left': 207.4,
+    'hours_mean_stayed': 199.1,
+    'hours_sd': 49.9,
+    'accident_rate_left': 0.0473,
+    'accident_rate_stayed': 0.1750,
+    'promotion_rate_left': 0.0053,
+    'promotion_rate_stayed': 0.0263,
+    'left_rate_projects_2': 0.656,
+    'left_rate_projects_3': 0.018,
+    'left_rate_projects_4': 0.094,
+    'left_rate_projects_5': 0.222,
+    'left_rate_projects_6': 0.558,
+    'left_rate_projects_7': 1.000,
+    **{f'project_share_{projects}': share for projects, share in data.PROJECT_DISTRIBUTION.items()}
+}
+
+# 各类统计量的容差：偏差等于容差时贡献1，报告中偏差超过容差的项标记出来
+TOLERANCES = {
+    'satisfaction_mean': 0.01,
+    'satisfaction_sd': 0.01,
+    'evaluation_mean': 0.01,
+    'evaluation_sd': 0.01,
+    'hours_mean': 2.0,
+    'hours_sd': 2.0,
+    'accident_rate': 0.005,
+    'promotion_rate': 0.002,
+    'project_share': 0.01,
+    'left_rate': 0.02
+}
+
+
+def tolerance(name):
+    return next(value for prefix, value in TOLERANCES.items() if name.startswith(prefix))
+
+
+def _bin_key(column, low, high):
+    return f"left_rate_{'hours' if column == 'average_monthly_hours' else 'satisfaction'}_{low}_{high}"
+
+
+# ---- 统计量：模拟结果和真实数据按相同方式汇总 ----
+
+def _combine(leaver, stayer, turnover_rate):
+    """由离职/在职两组的汇总计算各项统计量"""
+    t = turnover_rate
+    stats = {}
+    for group, label in ((leaver, 'left'), (stayer, 'stayed')):
+        stats[f'satisfaction_mean_{label}'] = group['satisfaction_mean']
+        stats[f'hours_mean_{label}'] = group['hours_mean']
+        stats[f'accident_rate_{label}'] = group['accident_rate']
+        stats[f'promotion_rate_{label}'] = group['promotion_rate']
+    for column in ('satisfaction', 'evaluation', 'hours'):
+        mean = t * leaver[f'{column}_mean'] + (1 - t) * stayer[f'{column}_mean']
+        square = t * leaver[f'{column}_square_mean'] + (1 - t) * stayer[f'{column}_square_mean']
+        if column == 'evaluation':
+            stats['evaluation_mean'] = mean
+        stats[f'{column}_sd'] = float(np.sqrt(max(square - mean ** 2, 0.0)))
+
+    def left_rate(leaver_share, stayer_share):
+        total = t * leaver_share + (1 - t) * stayer_share
+        return t * leaver_share / total if total > 0 else 0.0
+
+    for i, projects in enumerate(PROJECTS):
+        stats[f'project_share_{projects}'] = t * leaver['project_share'][i] + (1 - t) * stayer['project_share'][i]
+        stats[f'left_rate_projects_{projects}'] = left_rate(leaver['project_share'][i], stayer['project_share'][i])
+    for key in leaver['bin_share']:
+        stats[key] = left_rate(leaver['bin_share'][key], stayer['bin_share'][key])
+    return {name: float(value) for name, value in stats.items()}
+
+
+def _group_summary(df):
+    """一组真实员工（DataFrame）的汇总"""
+    hours = df['average_monthly_hours'].to_numpy(dtype=np.float64)
+    satisfaction = df['satisfaction_level'].to_numpy(dtype=np.float64)
+    evaluation = df['last_evaluation'].to_numpy(dtype=np.float64)
+    projects = df['number_project'].to_numpy()
+    bin_share = {}
+    for column, values in (('average_monthly_hours', hours), ('satisfaction_level', satisfaction)):
+        for low, high, _ in BIN_COLUMNS[column]:
+            bin_share[_bin_key(column, low, high)] = float(np.mean((values >= low) & (values < high)))
+    return {
+        'satisfaction_mean': satisfaction.mean(),
+        'satisfaction_square_mean': np.mean(satisfaction ** 2),
+        'evaluation_mean': evaluation.mean(),
+        'evaluation_square_mean': np.mean(evaluation ** 2),
+        'hours_mean': hours.mean(),
+        'hours_square_mean': np.mean(hours ** 2),
+        'accident_rate': df['Work_accident'].mean(),
+        'promotion_rate': df['promotion_last_5years'].mean(),
+        'project_share': np.array([np.mean(projects == value) for value in PROJECTS]),
+        'bin_share': bin_share
+    }
+
+
+def observed_statistics(df):
+    """真实数据（员工快照或原始数据集）的各项统计量"""
+    left = df['left'].to_numpy() == 1
+    return _combine(_group_summary(df[left]), _group_summary(df[~left]), left.mean())
+
+
+# ---- 向量化采样器 ----
+
+def make_noise(size=DEFAULT_SAMPLE_SIZE, seed=DEFAULT_SEED):
+    """固定种子的噪声，整个校准过程中复用（只用到各变量的边际分布，预先排序：插值更快，区间占比可二分查找）"""
+    rng = np.random.default_rng(seed)
+    return {
+        'leaver_satisfaction': np.sort(rng.random(size)),
+        'stayer_satisfaction': np.sort(rng.random(size)),
+        'evaluation': np.sort(rng.random(size)),
+        'hours': np.sort(rng.standard_normal(size))
+    }
+
+
+_GRID = (np.arange(BETA_GRID) + 0.5) / BETA_GRID
+_EDGES = np.linspace(0.0, 1.0, BETA_GRID + 1)
+
+
+def beta_ppf(u, a, b):
+    """beta(a, b) 的逆分布函数（网格数值积分后插值，a, b >= 1）"""
+    log_pdf = (a - 1) * np.log(_GRID) + (b - 1) * np.log1p(-_GRID)
+    cdf = np.concatenate([[0.0], np.cumsum(np.exp(log_pdf - log_pdf.max()))])
+    return np.interp(u, cdf / cdf[-1], _EDGES)
+
+
+def leaver_project_shares(params):
+    """离职员工的项目数分布：按比例 +2（上限7）或 -1（下限2）"""
+    up = np.zeros(len(PROJECTS))
+    down = np.zeros(len(PROJECTS))
+    np.add.at(up, np.searchsorted(PROJECTS, np.minimum(PROJECTS + 2, PROJECTS.max())), PROJECT_WEIGHTS)
+    np.add.at(down, np.searchsorted(PROJECTS, np.maximum(PROJECTS - 1, PROJECTS.min())), PROJECT_WEIGHTS)
+    rate, up_share = params['leaver_project_shift_rate'], params['leaver_project_up_share']
+    return (1 - rate) * PROJECT_WEIGHTS + rate * (up_share * up + (1 - up_share) * down)
+
+
+def _below(values, value, offset=0.0, low=-np.inf, high=np.inf):
+    """clip(values + offset, low, high) 中小于 value 的个数（values 升序）"""
+    if value <= low:
+        return 0
+    if value > high:
+        return len(values)
+    return int(np.searchsorted(values, value - offset))
+
+
+def _simulated_group(params, satisfaction, evaluation, hours, project_share, hours_shift, prefix):
+    # 工时 = clip(基础工时 + 项目数调整, 96, 310)，基础工时升序：按项目数用前缀和计算均值和平方均值，
+    # 用二分查找计算各区间占比，不展开 项目数 x 样本数 的矩阵
+    base, total, square_total = hours
+    n = len(base)
+    low, high = HOURS_RANGE
+    hours_mean = hours_square_mean = 0.0
+    bin_share = {_bin_key('average_monthly_hours', a, b): 0.0 for a, b, _ in BIN_COLUMNS['average_monthly_hours']}
+    for weight, projects in zip(project_share, PROJECTS):
+        offset = (projects - 3.8) * params['hours_per_project'] + hours_shift
+        i, j = np.searchsorted(base, low - offset), np.searchsorted(base, high - offset, side='right')
+        middle, middle_sum, middle_square = j - i, total[j] - total[i], square_total[j] - square_total[i]
+        hours_mean += weight * (low * i + middle_sum + offset * middle + high * (n - j)) / n
+        hours_square_mean += weight * (low ** 2 * i + middle_square + 2 * offset * middle_sum
+                                       + offset ** 2 * middle + high ** 2 * (n - j)) / n
+        for a, b, _ in BIN_COLUMNS['average_monthly_hours']:
+            bin_share[_bin_key('average_monthly_hours', a, b)] += weight * (
+                _below(base, b, offset, low, high) - _below(base, a, offset, low, high)) / n
+    for a, b, _ in BIN_COLUMNS['satisfaction_level']:
+        bin_share[_bin_key('satisfaction_level', a, b)] = (_below(satisfaction, b) - _below(satisfaction, a)) / n
+    return {
+        'satisfaction_mean': satisfaction.mean(),
+        'satisfaction_square_mean': np.mean(satisfaction ** 2),
+        'evaluation_mean': evaluation.mean(),
+        'evaluation_square_mean': np.mean(evaluation ** 2),
+        'hours_mean': hours_mean,
+        'hours_square_mean': hours_square_mean,
+        'accident_rate': params[f'{prefix}_accident_rate'],
+        'promotion_rate': params[f'{prefix}_promotion_rate'],
+        'project_share': project_share,
+        'bin_share': bin_share
+    }
+
+
+def simulated_statistics(params, noise, turnover_rate=data.TARGET_TURNOVER_RATE):
+    """按 data.py 的生成规则模拟一组参数下的各项统计量"""
+    leaver_satisfaction = np.clip(beta_ppf(noise['leaver_satisfaction'], params['leaver_satisfaction_a'],
+                                           params['leaver_satisfaction_b']) * 0.9 + 0.1, 0.09, 1.0)
+    stayer_satisfaction = np.clip(beta_ppf(noise['stayer_satisfaction'], params['stayer_satisfaction_a'],
+                                           params['stayer_satisfaction_b']) * 0.85 + 0.15, 0.1, 1.0)
+    evaluation = np.clip(beta_ppf(noise['evaluation'], params['evaluation_a'], params['evaluation_b']) * 0.7 + 0.35,
+                         0.36, 1.0)
+    base_hours = np.trunc(params['hours_mean'] + params['hours_sd'] * noise['hours'])
+    hours = (base_hours, np.concatenate([[0.0], np.cumsum(base_hours)]),
+             np.concatenate([[0.0], np.cumsum(base_hours ** 2)]))
+    leaver = _simulated_group(params, leaver_satisfaction, evaluation, hours, leaver_project_shares(params),
+                              params['leaver_hours_shift'], 'leaver')
+    stayer = _simulated_group(params, stayer_satisfaction, evaluation, hours, PROJECT_WEIGHTS, 0.0, 'stayer')
+    return _combine(leaver, stayer, turnover_rate)
+
+
+def loss(stats, targets):
+    return sum(((stats[name] - value) / tolerance(name)) ** 2 for name, value in targets.items())
+
+
+# ---- 优化 ----
+
+def nelder_mead(f, x0, step=0.5, max_evals=5000, tol=1e-7):
+    """Nelder-Mead 单纯形法（无约束），返回 (最优点, 最优值, 评估次数)"""
+    n = len(x0)
+    simplex = np.vstack([x0, x0 + step * np.eye(n)])
+    values = np.array([f(x) for x in simplex])
+    evals = n + 1
+    while evals < max_evals:
+        order = np.argsort(values)
+        simplex, values = simplex[order], values[order]
+        if values[-1] - values[0] <= tol * (abs(values[0]) + tol):
+            break
+        centroid = simplex[:-1].mean(axis=0)
+        reflected = 2 * centroid - simplex[-1]
+        reflected_value = f(reflected)
+        evals += 1
+        if reflected_value < values[0]:
+            expanded = 3 * centroid - 2 * simplex[-1]
+            expanded_value = f(expanded)
+            evals += 1
+            if expanded_value < reflected_value:
+                simplex[-1], values[-1] = expanded, expanded_value
+            else:
+                simplex[-1], values[-1] = reflected, reflected_value
+        elif reflected_value < values[-2]:
+            simplex[-1], values[-1] = reflected, reflected_value
+        else:
+            outside = reflected_value < values[-1]
+            contracted = centroid + 0.5 * ((reflected if outside else simplex[-1]) - centroid)
+            contracted_value = f(contracted)
+            evals += 1
+            if contracted_value < min(reflected_value, values[-1]):
+                simplex[-1], values[-1] = contracted, contracted_value
+            else:
+                # 收缩：所有点向最优点靠拢
+                simplex[1:] = simplex[0] + 0.5 * (simplex[1:] - simplex[0])
+                values[1:] = [f(x) for x in simplex[1:]]
+                evals += n
+    best = np.argmin(values)
+    return simplex[best], values[best], evals
+
+
+def calibrate(targets, params=None, names=None, noise=None, restarts=2, max_evals=5000):
+    """拟合参数，返回 (参数, 损失, 评估次数)；names 为参与拟合的参数，其余保持不变"""
+    params = dict(params or data.GENERATOR_PARAMS)
+    names = list(names or PARAMETER_BOUNDS)
+    noise = noise if noise is not None else make_noise()
+    low = np.array([PARAMETER_BOUNDS[name][0] for name in names], dtype=np.float64)
+    high = np.array([PARAMETER_BOUNDS[name][1] for name in names], dtype=np.float64)
+
+    # 在无界空间中优化：x = low + (high - low) * sigmoid(y)
+    def to_params(y):
+        values = low + (high - low) / (1 + np.exp(-y))
+        return {**params, **dict(zip(names, values.tolist()))}
+
+    def objective(y):
+        return loss(simulated_statistics(to_params(y), noise), targets)
+
+    start = np.clip((np.array([params[name] for name in names], dtype=np.float64) - low) / (high - low), 1e-3, 1 - 1e-3)
+    y = np.log(start / (1 - start))
+    total_evals = 0
+    # 从上一次的最优点重新开始，避免单纯形在高维中过早退化
+    for _ in range(restarts + 1):
+        y, value, evals = nelder_mead(objective, y, max_evals=max_evals)
+        total_evals += evals
+    fitted = {name: round(value, 6) for name, value in to_params(y).items()}
+    return fitted, loss(simulated_statistics(fitted, noise), targets), total_evals
+
+
+# ---- 报告 ----
+
+def print_report(targets, columns, params_before, params_after):
+    """拟合优度报告：各统计量的目标值与各组结果，偏差超过容差的标记 *"""
+    print("\n===== 参数 =====")
+    print(f"  {'参数':<28}{'原值':>10}{'拟合值':>10}")
+    for name in PARAMETER_BOUNDS:
+        print(f"  {name:<28}{params_before[name]:>10.4g}{params_after[name]:>10.4g}")
+
+    print("\n===== 拟合优度 =====")
+    print(f"  {'统计量':<34}{'目标':>9}" + ''.join(f"{label:>10}" for label in columns))
+    for name, target in targets.items():
+        cells = []
+        for stats in columns.values():
+            flag = '*' if abs(stats[name] - target) > tolerance(name) else ' '
+            cells.append(f"{stats[name]:>9.4g}{flag}")
+        print(f"  {name:<34}{target:>9.4g}" + ''.join(cells))
+    print("  " + ' ' * 43 + ''.join(f"{loss(stats, targets):>10.1f}" for stats in columns.values()) + "  (损失)")
+
+
+def load_targets(path):
+    """读取目标：JSON 文件为 {统计量: 目标值}；CSV 为数据集，按与模拟相同的方式计算全部统计量"""
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            targets = json.load(f)
+        probe = simulated_statistics(data.GENERATOR_PARAMS, make_noise(100))
+        unknown = set(targets) - set(probe)
+        if unknown:
+            raise ValueError(f"未知的统计量: {', '.join(sorted(unknown))}")
+        return targets
+    return observed_statistics(pd.read_csv(path, encoding='utf-8-sig'))
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='拟合 data.py 的生成器参数')
+    parser.add_argument('--targets', type=str, help='目标统计量 JSON 或数据集CSV，默认使用原始数据集的统计')
+    parser.add_argument('--params', type=lambda text: text.split(','), help='只拟合这些参数（逗号分隔），其余保持不变')
+    parser.add_argument('--output', type=str, default=data.GENERATOR_PARAMS_FILE, help='参数文件')
+    parser.add_argument('--report', type=str, help='把拟合优度报告另存为 JSON')
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE, help='每组模拟的样本数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='噪声的随机种子')
+    parser.add_argument('--restarts', type=int, default=2, help='Nelder-Mead 重启次数')
+    parser.add_argument('--check', type=int, metavar='N', help='用拟合后的参数运行 data.generate_employee_data 生成 N 人核对')
+    args = parser.parse_args()
+
+    unknown = set(args.params or []) - set(PARAMETER_BOUNDS)
+    if unknown:
+        print(f"未知的参数: {', '.join(sorted(unknown))}")
+        return 1
+    try:
+        targets = load_targets(args.targets) if args.targets else dict(TARGETS)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"读取目标失败: {e}")
+        return 1
+
+    data.load_generator_params()
+    params_before = dict(data.GENERATOR_PARAMS)
+    noise = make_noise(args.sample_size, args.seed)
+    start = time.perf_counter()
+    fitted, fitted_loss, evals = calibrate(targets, params_before, args.params, noise, restarts=args.restarts)
+    elapsed = time.perf_counter() - start
+    print(f"拟合完成：{evals} 次评估，耗时 {elapsed:.1f} 秒，损失 "
+          f"{loss(simulated_statistics(params_before, noise), targets):.1f} -> {fitted_loss:.1f}")
+
+    columns = {'拟合前': simulated_statistics(params_before, noise), '拟合后': simulated_statistics(fitted, noise)}
+    if args.check:
+        data.GENERATOR_PARAMS.update(fitted)
+        columns['生成器'] = observed_statistics(data.generate_employee_data(args.check).to_pandas())
+    print_report(targets, columns, params_before, fitted)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(fitted, f, indent=2)
+    print(f"\n参数已保存到 {args.output}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'targets': targets, 'tolerances': {name: tolerance(name) for name in targets},
+                       'parameters': fitted, 'loss': fitted_loss, 'statistics': columns}, f, ensure_ascii=False, indent=2)
+        print(f"拟合优度报告已保存到 {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工变更事件日志 (HR离职分析版)
+
+daily_update 每次更新时记录实际发生的变更，下游抽取任务和缓存可以按偏移量增量同步，
+不必再按 last_updated 扫描整张员工表：
+- 事件类型：hire（入职）、termination（离职）、update（工作年限、离职概率等属性变化）
+- 事件与员工数据在同一事务中写入 employee_events 表，序号 seq 从ID序列 event_seq（id_allocator.py）
+  预留并单调递增，daily_update、ingest 等多个写入进程不会分配到相同的序号
+- 提交后追加到本地只追加的二进制日志（默认 employee_events.bin），
+  日志落后于数据库时（如进程在提交后中断）下次同步会自动补齐
+- 消费接口：fetch_events() 按序号从数据库读取，EventLog.read() 按字节偏移量从日志读取
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+import zlib
+from datetime import datetime
+
+import storage
+from config import EVENT_LOG_PATH
+from storage import get_backend
+
+# 事件类型
+EVENT_HIRE = 'hire'
+EVENT_TERMINATION = 'termination'
+EVENT_UPDATE = 'update'
+
+EVENT_COLUMNS = ['seq', 'event_type', 'employee_id', 'event_date', 'changes', 'recorded_at']
+
+# 二进制日志格式：文件头 MAGIC，之后每条记录为
+#   记录头 (seq: uint64, 负载长度: uint32, 负载CRC32: uint32) + JSON负载 + 记录总长度 (uint32)
+# 记录末尾的总长度使得无需扫描整个文件即可从文件尾读取最后一条记录
+MAGIC = b'WFEVLOG1'
+RECORD_HEADER = struct.Struct('<QII')
+RECORD_TRAILER = struct.Struct('<I')
+
+SYNC_BATCH_SIZE = 10000
+
+# 事件序号使用的ID序列（id_allocator.SEQUENCE_COLUMNS）
+EVENT_SEQUENCE = 'event_seq'
+
+# configure() 设置的默认日志路径，None 时使用 config.EVENT_LOG_PATH
+_log_path = None
+
+
+def configure(path=None):
+    """设置默认的二进制日志路径（如多租户运行时每个租户一个日志），None 时恢复 config.EVENT_LOG_PATH"""
+    global _log_path
+    _log_path = path
+
+
+class EventLog:
+    """本地只追加的二进制事件日志"""
+
+    def __init__(self, path=None):
+        self.path = path or _log_path or EVENT_LOG_PATH
+
+    def _read_record(self, f, offset):
+        """读取 offset 处的一条记录，记录不完整或校验失败时返回 None"""
+        f.seek(offset)
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        seq, length, checksum = RECORD_HEADER.unpack(header)
+        payload = f.read(length)
+        trailer = f.read(RECORD_TRAILER.size)
+        if len(payload) < length or len(trailer) < RECORD_TRAILER.size:
+            return None
+        if zlib.crc32(payload) != checksum:
+            return None
+        if RECORD_TRAILER.unpack(trailer)[0] != RECORD_HEADER.size + length + RECORD_TRAILER.size:
+            return None
+        event = json.loads(payload.decode('utf-8'))
+        if event.get('seq') != seq:
+            return None
+        return event, offset + RECORD_HEADER.size + length + RECORD_TRAILER.size
+
+    def _valid_end(self, f):
+        """从头扫描，返回最后一条完整记录之后的偏移量"""
+        offset = len(MAGIC)
+        while True:
+            record = self._read_record(f, offset)
+            if record is None:
+                return offset
+            offset = record[1]
+
+    def _open_for_append(self):
+        """打开日志用于追加，返回 (文件对象, 最后一条记录的序号)
+
+        文件尾有写了一半的记录时（进程在写入过程中中断）截断到最后一条完整记录。
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            f = open(self.path, 'wb+')
+            f.write(MAGIC)
+            return f, 0
+        f = open(self.path, 'rb+')
+        if f.read(len(MAGIC)) != MAGIC:
+            f.close()
+            raise ValueError(f"{self.path} 不是员工事件日志文件")
+        size = f.seek(0, os.SEEK_END)
+        last = self._last_record(f, size)
+        if last is None and size > len(MAGIC):
+            end = self._valid_end(f)
+            logging.warning(f"事件日志 {self.path} 尾部不完整，截断 {size - end} 字节")
+            f.truncate(end)
+            last = self._last_record(f, end)
+        f.seek(0, os.SEEK_END)
+        return f, last['seq'] if last else 0
+
+    def _last_record(self, f, size):
+        if size < len(MAGIC) + RECORD_HEADER.size + RECORD_TRAILER.size:
+            return None
+        f.seek(size - RECORD_TRAILER.size)
+        total = RECORD_TRAILER.unpack(f.read(RECORD_TRAILER.size))[0]
+        start = size - total
+        if start < len(MAGIC):
+            return None
+        record = self._read_record(f, start)
+        if record is None or record[1] != size:
+            return None
+        return record[0]
+
+    def last_seq(self):
+        """返回日志中最后一条事件的序号，日志为空时返回0"""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            last = self._last_record(f, size)
+            if last is None and size > len(MAGIC):
+                end = self._valid_end(f)
+                last = self._last_record(f, end)
+        return last['seq'] if last else 0
+
+    def append(self, events):
+        """按序号顺序追加事件（只追加序号大于日志末尾的事件），返回追加的条数"""
+        f, last_seq = self._open_for_append()
+        appended = 0
+        try:
+            chunks = []
+            for event in events:
+                if event['seq'] <= last_seq:
+                    continue
+                payload = json.dumps(event, ensure_ascii=False, sort_keys=True).encode('utf-8')
+                chunks.append(RECORD_HEADER.pack(event['seq'], len(payload), zlib.crc32(payload)))
+                chunks.append(payload)
+                chunks.append(RECORD_TRAILER.pack(RECORD_HEADER.size + len(payload) + RECORD_TRAILER.size))
+                last_seq = event['seq']
+                appended += 1
+            if chunks:
+                f.write(b''.join(chunks))
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            f.close()
+        return appended
+
+    def read(self, offset=0, limit=None):
+        """从字节偏移量 offset 开始读取事件，返回 (事件列表, 下一次读取的偏移量)
+
+        offset 为0时从头读取。遇到不完整的尾部记录时停止，下次从同一偏移量继续。
+        """
+        if not os.path.exists(self.path):
+            return [], offset
+        events = []
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} 不是员工事件日志文件")
+            offset = max(offset, len(MAGIC))
+            while limit is None or len(events) < limit:
+                record = self._read_record(f, offset)
+                if record is None:
+                    break
+                event, offset = record
+                events.append(event)
+        return events, offset
+
+
+def _event_row(event):
+    """把数据库中的事件行转换为字典"""
+    seq, event_type, employee_id, event_date, changes, recorded_at = event
+    return {
+        'seq': int(seq),
+        'event_type': event_type,
+        'employee_id': int(employee_id),
+        'event_date': str(event_date)[:10],
+        'changes': json.loads(changes) if changes else {},
+        'recorded_at': str(recorded_at)[:19]
+    }
+
+
+def ensure_tables(conn):
+    """表不存在时创建 employee_events 和ID序列表"""
+    backend = get_backend()
+    backend.ensure_table(conn, 'employee_events')
+    backend.ensure_table(conn, 'id_sequences')
+
+
+def record_events(conn, events):
+    """在调用方的事务中写入事件，返回分配的 (首个序号, 末个序号)，没有事件时返回 None
+
+    events 为 (事件类型, 员工ID, 事件日期, 变更字段字典) 元组，序号按列表顺序分配。
+    序号从ID序列预留（两个写入进程各自读取 MAX(seq) 会得到相同的值）；预留在调用方的事务中进行，
+    序列的行锁持有到提交，因此序号的顺序与提交顺序一致，按序号增量读取的消费者不会漏掉事件。
+    调用前应先用 ensure_tables() 建好表（建表会提交，不能在写入事务中途进行）。
+    """
+    if not events:
+        return None
+    import id_allocator
+
+    ensure_tables(conn)
+    first_seq = id_allocator.reserve_block(conn, len(events), EVENT_SEQUENCE)
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = [
+        (first_seq + i, event_type, employee_id, str(event_date)[:10],
+         json.dumps(changes, ensure_ascii=False, sort_keys=True, default=str), now)
+        for i, (event_type, employee_id, event_date, changes) in enumerate(events)
+    ]
+    get_backend().bulk_insert(conn, 'employee_events', EVENT_COLUMNS, rows)
+    return first_seq, first_seq + len(rows) - 1
+
+
+def latest_seq(conn):
+    """数据库中最新的事件序号，没有事件时返回 0"""
+    if not get_backend().table_exists(conn, 'employee_events'):
+        return 0
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM employee_events")
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def fetch_events(conn, after_seq=0, limit=None):
+    """按序号顺序读取 seq > after_seq 的事件"""
+    if not get_backend().table_exists(conn, 'employee_events'):
+        return []
+    query = f"SELECT {', '.join(EVENT_COLUMNS)} FROM employee_events WHERE seq > %s ORDER BY seq"
+    params = [after_seq]
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(int(limit))
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, tuple(params))
+        return [_event_row(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def sync_event_log(conn, path=None):
+    """把数据库中已提交、尚未写入二进制日志的事件追加到日志，返回追加的条数"""
+    log = EventLog(path)
+    last_seq = log.last_seq()
+    appended = 0
+    while True:
+        events = fetch_events(conn, after_seq=last_seq, limit=SYNC_BATCH_SIZE)
+        if not events:
+            return appended
+        appended += log.append(events)
+        last_seq = events[-1]['seq']
+
+
+def main():
+    """主函数：输出事件（每行一个JSON），或把数据库中的事件同步到日志"""
+    parser = argparse.ArgumentParser(description='员工变更事件日志')
+    parser.add_argument('--offset', type=int, help='从二进制日志的字节偏移量开始读取')
+    parser.add_argument('--after-seq', type=int, help='从数据库读取序号大于此值的事件')
+    parser.add_argument('--limit', type=int, help='最多读取的事件数')
+    parser.add_argument('--sync', action='store_true', help='把数据库中的事件补齐到二进制日志')
+    parser.add_argument('--log-path', type=str, help='二进制日志路径，默认使用 config.py 中的设置')
+    storage.add_cli_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage.configure_from_args(args)
+
+    if args.offset is not None:
+        events, next_offset = EventLog(args.log_path).read(args.offset, args.limit)
+        for event in events:
+            print(json.dumps(event, ensure_ascii=False))
+        logging.info(f"读取 {len(events)} 条事件，下一偏移量: {next_offset}")
+        return 0
+
+    conn = get_backend().connect()
+    try:
+        if args.sync:
+            appended = sync_event_log(conn, args.log_path)
+            logging.info(f"已追加 {appended} 条事件到 {args.log_path or EVENT_LOG_PATH}")
+        else:
+            events = fetch_events(conn, args.after_seq or 0, args.limit)
+            for event in events:
+                print(json.dumps(event, ensure_ascii=False))
+            logging.info(f"读取 {len(events)} 条事件" + (f"，最后序号: {events[-1]['seq']}" if events else ''))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
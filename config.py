@@ -1,8 +1,27 @@
 # config.py
+import os
+
+# 数据库连接配置 - 请修改为您的实际配置
 DB_CONFIG = {
     'host': 'localhost',
     'user': 'root',
-    'password': 'Taylor@1989',
+    'password': 'Taylor@1989',  # 请替换为您的MySQL密码
     'database': 'employee_db',
-    'auth_plugin': 'Taylor@1989'  # 请替换为您的MySQL密码
-}
\ No newline at end of file
+    'port': 3306
+}
+
+# 存储后端：mysql（生产库）、sqlite 或 duckdb（嵌入式，本地分析和CI使用）
+STORAGE_BACKEND = os.environ.get('WORKFORCE_STORAGE_BACKEND', 'mysql')
+
+# 嵌入式数据库文件路径，仅在 sqlite / duckdb 后端下使用
+EMBEDDED_DB_PATH = os.environ.get('WORKFORCE_EMBEDDED_DB', 'employee_db.sqlite')
+
+# 员工变更事件的本地只追加二进制日志（change_log.py），供下游增量同步
+EVENT_LOG_PATH = os.environ.get('WORKFORCE_EVENT_LOG', 'employee_events.bin')
+
+# 只读分析副本（metrics_api、interval_index 等分析查询使用），未设置时所有查询都访问主库。
+# MySQL 使用 mysql://用户:密码@主机:端口/数据库，sqlite/duckdb 后端直接使用副本文件路径
+REPLICA_DSN = os.environ.get('WORKFORCE_REPLICA_DSN')
+
+# 副本最多允许落后主库的 last_update 记录数，超过时分析查询回退到主库
+REPLICA_MAX_LAG = int(os.environ.get('WORKFORCE_REPLICA_MAX_LAG', '0'))
@@ -9,45 +9,43 @@
 - 维护历史数据完整性
 - 记录数据库刷新日期
 - 支持手动设置更新日期（用于补充历史数据）
+- 批量补数据时逐日保存检查点（含随机数状态），中断后重新运行同一命令即可从断点继续，
+  并通过一次 last_update 查询找出范围内缺失的日期
 - 提供数据更新日志
+- 通过 storage 模块支持MySQL和嵌入式SQLite/DuckDB后端
+- 入职、离职和属性变化写入变更事件日志（change_log.py），只修改实际发生变化的行
+- 新员工ID从ID序列（id_allocator.py）原子预留，多个写入进程可以并发运行
+- 运行期间持有数据库的更新锁（MySQL GET_LOCK，嵌入式数据库为文件锁），同一数据库上重叠的运行
+  （如 cron 与 tenant_update.py）以及 ingest.py、restore.py 不会同时写入
+- 每次更新提交后运行数据完整性校验（validation.py），违规时记录警告
+- 在同一事务中增量更新薪资、工时等指标的分位数草图（quantile_sketch.py）和近似查询的分层样本（approx_query.py）
+- 快速启动：numpy 和 Faker 只在确实需要时才导入，"今日已更新"时几十毫秒即可返回；
+  --startup-report 输出各模块的导入耗时
 """
 
-import pandas as pd
-import numpy as np
-import mysql.connector
-from faker import Faker
 from datetime import datetime, timedelta
 import random
 import os
 import argparse
+import json
 import logging
 
+import change_log
+import storage
+from storage import DB_ERRORS, EMPLOYEE_COLUMNS, get_backend
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('employee_updates.log'),
+        logging.FileHandler('employee_updates.log', delay=True),
         logging.StreamHandler()
     ]
 )
 
-# 设置随机种子以确保可重复性
-random.seed(datetime.now().timestamp())
-np.random.seed(int(datetime.now().timestamp()))
-
-# 设置中文和英文随机数据生成器
-fake = Faker('zh_CN')
-fake_en = Faker()
-
-# 数据库连接配置
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'Taylor@1989',  # 修改为您的MySQL密码
-    'database': 'employee_db',
-    'port': 3306
-}
+# 英文随机数据生成器，首次生成新员工时才创建（导入Faker较慢）
+_fake_en = None
 
 # 部门设置
 DEPARTMENTS = {
@@ -85,12 +83,35 @@ WEEKDAY_TERM_FACTOR = [1.0, 0.9, 0.9, 1.1, 1.3, 0.4, 0.1]  # 周五离职较多
 MONTH_HIRE_FACTOR = [1.2, 1.0, 1.0, 1.1, 1.0, 1.2, 0.8, 0.9, 1.3, 1.0, 1.0, 0.7]  # 9月、1月、6月入职高峰
 MONTH_TERM_FACTOR = [0.8, 0.9, 1.0, 1.0, 1.1, 1.2, 1.0, 0.9, 0.8, 0.9, 1.0, 1.5]  # 12月、6月离职高峰
 
+# 离职概率重新打分时每批读取/写回的行数
+RESCORE_BATCH_SIZE = 5000
+
+# 每日更新的建议锁名（storage 后端的 acquire_lock），同一数据库同一时间只有一个更新进程
+UPDATE_LOCK_NAME = 'daily_update'
+# 命令行默认等待锁的秒数：ingest.py 每批提交时只短暂持锁，等待片刻即可，不必跳过当晚的更新
+UPDATE_LOCK_TIMEOUT = 30
+
+# 启动报告中单独列出的重量级依赖
+HEAVY_MODULES = ['numpy', 'pandas', 'faker', 'mysql.connector', 'duckdb', 'sqlite3']
+
+def get_fake_en():
+    """返回英文Faker实例，首次调用时导入并创建"""
+    global _fake_en
+    if _fake_en is None:
+        from faker import Faker
+        _fake_en = Faker()
+    return _fake_en
+
+def seed_random_generators():
+    """设置随机种子（numpy 的全局随机数生成器在首次导入时已由系统熵初始化）"""
+    random.seed(datetime.now().timestamp())
+
 def get_db_connection():
-    """连接到MySQL数据库"""
+    """连接到数据库（后端由 storage 模块配置）"""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = get_backend().connect()
         return conn
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         logging.error(f"数据库连接失败: {e}")
         return None
 
@@ -98,7 +119,7 @@ def get_current_employee_count():
     """获取当前在职员工数量"""
     conn = get_db_connection()
     if not conn:
-        return 0
+        return 0, 0, 1000
     
     cursor = conn.cursor()
     try:
@@ -120,7 +141,7 @@ def get_current_employee_count():
         cursor.close()
         conn.close()
         return employee_count, total_count, max_id
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         logging.error(f"获取员工数量失败: {e}")
         cursor.close()
         conn.close()
@@ -134,18 +155,8 @@ def get_last_update_date():
     
     cursor = conn.cursor()
     try:
-        # 先检查是否存在last_update表
-        cursor.execute("SHOW TABLES LIKE 'last_update'")
-        if not cursor.fetchone():
-            # 如果表不存在，创建它
-            cursor.execute("""
-            CREATE TABLE last_update (
-                id INT PRIMARY KEY AUTO_INCREMENT,
-                update_date DATE NOT NULL,
-                updated_at DATETIME NOT NULL
-            )
-            """)
-            conn.commit()
+        # 先检查是否存在last_update表，如果表不存在，创建它
+        if get_backend().ensure_table(conn, 'last_update'):
             cursor.close()
             conn.close()
             return None
@@ -160,7 +171,7 @@ def get_last_update_date():
         if result:
             return result[0]
         return None
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         logging.error(f"获取最后更新日期失败: {e}")
         cursor.close()
         conn.close()
@@ -205,12 +216,45 @@ def calculate_turnover_probability(satisfaction_score, evaluation_score, project
     
     return max(0.0, min(1.0, prob))
 
+def calculate_turnover_probability_batch(satisfaction_score, evaluation_score, project_count, monthly_hours, years, accident, promotion):
+    """向量化计算离职概率，规则与 calculate_turnover_probability 完全一致，参数为等长数组"""
+    import numpy as np
+
+    satisfaction_score = np.asarray(satisfaction_score, dtype=np.float64)
+    evaluation_score = np.asarray(evaluation_score, dtype=np.float64)
+    project_count = np.asarray(project_count)
+    monthly_hours = np.asarray(monthly_hours)
+    years = np.asarray(years)
+    
+    prob = np.full(satisfaction_score.shape, 0.238)  # 基础离职率
+    
+    # 与逐行版本按相同顺序累加，保证浮点结果一致
+    prob += np.select(
+        [satisfaction_score < 0.2, satisfaction_score < 0.4, satisfaction_score > 0.7],
+        [0.5, 0.3, -0.2], 0.0
+    )
+    prob += np.select([project_count <= 2, project_count >= 6], [0.1, 0.4], 0.0)
+    prob += np.select([monthly_hours < 150, monthly_hours > 250], [-0.05, 0.2], 0.0)
+    prob += np.where(years > 5, 0.1, 0.0)
+    prob += np.select(
+        [evaluation_score < 0.5,
+         (evaluation_score > 0.6) & (evaluation_score < 0.8),
+         (evaluation_score > 0.8) & (monthly_hours > 220)],
+        [0.1, -0.05, 0.2], 0.0
+    )
+    prob -= np.where(np.asarray(accident) == 1, 0.15, 0.0)
+    prob -= np.where(np.asarray(promotion) == 1, 0.3, 0.0)
+    
+    return np.clip(prob, 0.0, 1.0)
+
 def generate_satisfaction_level():
     """生成员工满意度"""
+    import numpy as np
     return np.clip(np.random.beta(5, 2) * 0.85 + 0.15, 0.1, 1.0)
 
 def generate_evaluation_score():
     """生成评估分数"""
+    import numpy as np
     return np.clip(np.random.beta(7, 3) * 0.7 + 0.35, 0.36, 1.0)
 
 def generate_project_count():
@@ -219,6 +263,7 @@ def generate_project_count():
 
 def generate_monthly_hours(project_count):
     """生成月均工作小时"""
+    import numpy as np
     base_hours = int(np.random.normal(201, 25))
     hours_adjustment = (project_count - 3) * 8
     hours = base_hours + hours_adjustment
@@ -299,55 +344,16 @@ def calculate_daily_changes(employee_count, update_date):
 
 def select_employees_for_termination(count, update_date):
     """从数据库中选择可能离职的员工"""
+    import numpy as np
+
     conn = get_db_connection()
     if not conn:
         return []
     
-    cursor = conn.cursor(dictionary=True)
     try:
         # 查询在职员工，加权离职概率较高的员工
-        query = """
-        SELECT employee_id, name, department, satisfaction_level, last_evaluation, 
-               number_project, average_monthly_hours, time_spend_company, 
-               Work_accident, promotion_last_5years, hire_date
-        FROM employees 
-        WHERE `left` = 0 
-        ORDER BY (
-            CASE 
-                WHEN satisfaction_level < 0.3 THEN 5
-                WHEN satisfaction_level < 0.5 THEN 3
-                WHEN satisfaction_level > 0.8 THEN 0.5
-                ELSE 1
-            END + 
-            CASE
-                WHEN number_project > 5 THEN 3
-                WHEN number_project < 3 THEN 1.5
-                ELSE 1
-            END +
-            CASE
-                WHEN average_monthly_hours > 250 THEN 2
-                WHEN average_monthly_hours < 150 THEN 1.5
-                ELSE 1
-            END +
-            CASE
-                WHEN time_spend_company > 5 THEN 1.5
-                WHEN time_spend_company < 1 THEN 0.8
-                ELSE 1
-            END +
-            CASE
-                WHEN promotion_last_5years = 1 THEN 0.5
-                ELSE 1
-            END +
-            CASE
-                WHEN Work_accident = 1 THEN 0.7
-                ELSE 1
-            END
-        ) * RAND() DESC
-        LIMIT %s
-        """
-        
-        cursor.execute(query, (count * 2,))  # 获取两倍数量的候选人
-        candidates = cursor.fetchall()
+        # 获取两倍数量的候选人，排序种子取自全局随机数生成器，使补数据续跑时结果可复现
+        candidates = get_backend().fetch_termination_candidates(conn, count * 2, seed=random.randrange(1, 2**31))
         
         # 从候选人中随机选择需要的数量，但权重较高的更可能被选中
         selected = []
@@ -378,12 +384,10 @@ def select_employees_for_termination(count, update_date):
             )
             selected = [candidates[i] for i in indices]
         
-        cursor.close()
         conn.close()
         return selected
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         logging.error(f"选择离职员工失败: {e}")
-        cursor.close()
         conn.close()
         return []
 
@@ -406,7 +410,7 @@ def generate_new_hire(emp_id, hire_date):
     
     employee = {
         'employee_id': emp_id,
-        'name': fake_en.name(),
+        'name': get_fake_en().name(),
         'department': department,
         'salary_level': salary_level,
         'actual_salary': generate_actual_salary(salary_level),
@@ -426,8 +430,97 @@ def generate_new_hire(emp_id, hire_date):
     
     return employee
 
-def update_employee_database(update_date=None):
-    """更新员工数据库"""
+def rescore_active_employees(conn, cursor):
+    """重新计算在职员工的离职概率，只批量写回分数发生变化的行
+    
+    在调用方的事务中执行，应在更新工作年限之后调用。返回写回的 (员工ID, 新分数, 更新时间) 列表。
+    """
+    import numpy as np
+
+    # 1. 一次流式查询读取在职员工的特征列
+    cursor.execute("""
+    SELECT employee_id, satisfaction_level, last_evaluation, number_project,
+           average_monthly_hours, time_spend_company, Work_accident,
+           promotion_last_5years, COALESCE(turnover_probability, -1)
+    FROM employees
+    WHERE `left` = 0
+    """)
+    # 员工ID单独读入 int64 数组：BIGINT 的ID超过 2^53 时经 float64 转换会丢失精度
+    id_chunks, feature_chunks = [], []
+    while True:
+        rows = cursor.fetchmany(RESCORE_BATCH_SIZE)
+        if not rows:
+            break
+        id_chunks.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+        feature_chunks.append(np.asarray([row[1:] for row in rows], dtype=np.float64))
+    if not id_chunks:
+        return []
+    employee_ids = np.concatenate(id_chunks)
+    features = np.concatenate(feature_chunks)
+    
+    # 2. 向量化打分（特征按生成时的精度取整）
+    scores = np.round(calculate_turnover_probability_batch(
+        np.round(features[:, 0], 2), np.round(features[:, 1], 2), features[:, 2],
+        features[:, 3], features[:, 4], features[:, 5], features[:, 6]
+    ), 3)
+    changed = np.abs(scores - features[:, 7]) > 0.0005
+    if not changed.any():
+        return []
+    
+    # 3. 变化的行写入临时表，再用一条 UPDATE ... JOIN 批量更新
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    updates = [
+        (emp_id, score, now)
+        for emp_id, score in zip(employee_ids[changed].tolist(), scores[changed].tolist())
+    ]
+    get_backend().bulk_update(conn, 'employees', 'employee_id', ['turnover_probability', 'last_updated'],
+                              updates, batch_size=RESCORE_BATCH_SIZE)
+    
+    return updates
+
+def update_changed_tenure(conn, cursor, update_date, now):
+    """只更新工作年限发生变化的在职员工（通常只有入职周年当天的员工），返回 (员工ID, 新年限, 更新时间) 列表"""
+    backend = get_backend()
+    years_sql = backend.years_between_sql('hire_date', '%s')
+    date_str = update_date.strftime('%Y-%m-%d')
+    cursor.execute(f"""
+    SELECT employee_id, {years_sql}
+    FROM employees
+    WHERE `left` = 0 AND COALESCE(time_spend_company, -1) <> {years_sql}
+    """, (date_str, date_str))
+    updates = [(emp_id, years, now) for emp_id, years in cursor.fetchall()]
+    backend.bulk_update(conn, 'employees', 'employee_id', ['time_spend_company', 'last_updated'], updates)
+    return updates
+
+def build_change_events(update_date, terminating_employees, new_employees, tenure_updates, rescored):
+    """汇总当日的变更事件：离职、入职，以及每名员工合并后的属性变化"""
+    date_str = update_date.strftime('%Y-%m-%d')
+    events = [
+        (change_log.EVENT_TERMINATION, emp['employee_id'], date_str,
+         {'left': 1, 'termination_date': date_str, 'turnover_probability': 1.0})
+        for emp in terminating_employees
+    ]
+    events += [
+        (change_log.EVENT_HIRE, emp['employee_id'], date_str,
+         {column: emp[column] for column in EMPLOYEE_COLUMNS if column != 'employee_id'})
+        for emp in new_employees
+    ]
+    attribute_changes = {}
+    for emp_id, years, _ in tenure_updates:
+        attribute_changes.setdefault(emp_id, {})['time_spend_company'] = years
+    for emp_id, score, _ in rescored:
+        attribute_changes.setdefault(emp_id, {})['turnover_probability'] = score
+    events += [
+        (change_log.EVENT_UPDATE, emp_id, date_str, changes)
+        for emp_id, changes in sorted(attribute_changes.items())
+    ]
+    return events
+
+def update_employee_database(update_date=None, checkpoint=None):
+    """更新员工数据库
+    
+    checkpoint 为可选回调 checkpoint(conn, update_date)，在提交前于同一事务中执行（批量补数据时保存检查点）。
+    """
     # 如果未指定更新日期，使用当前日期
     if update_date is None:
         update_date = datetime.now().date()
@@ -441,7 +534,7 @@ def update_employee_database(update_date=None):
         return False
     
     # 获取当前员工数量
-    employee_count, total_count, max_id = get_current_employee_count()
+    employee_count, total_count, _ = get_current_employee_count()
     
     if employee_count == 0:
         logging.error("无法获取员工数量或数据库为空")
@@ -460,10 +553,17 @@ def update_employee_database(update_date=None):
     if len(terminating_employees) < daily_terminations:
         logging.warning(f"只找到 {len(terminating_employees)} 名员工离职，少于计划的 {daily_terminations} 名")
     
+    # 从ID序列一次预留当天新员工的ID，多个写入进程并发运行时不会分配到相同的ID
+    import id_allocator
+    try:
+        new_ids = id_allocator.IdAllocator(block_size=daily_hires).allocate(daily_hires).tolist()
+    except DB_ERRORS as e:
+        logging.error(f"预留员工ID失败: {e}")
+        return False
+    
     # 生成新员工
     new_employees = []
-    for i in range(daily_hires):
-        new_id = max_id + i + 1
+    for new_id in new_ids:
         new_emp = generate_new_hire(new_id, update_date)
         new_employees.append(new_emp)
     
@@ -474,55 +574,44 @@ def update_employee_database(update_date=None):
     
     cursor = conn.cursor()
     try:
-        # 1. 更新离职员工
-        for emp in terminating_employees:
-            update_query = """
-            UPDATE employees 
-            SET `left` = 1, 
-                termination_date = %s,
-                last_updated = %s,
-                turnover_probability = 1.0
-            WHERE employee_id = %s
-            """
-            cursor.execute(update_query, (
-                update_date.strftime('%Y-%m-%d'),
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                emp['employee_id']
-            ))
+        backend = get_backend()
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 草图表、样本表须在写入前建好：建表会提交，不能放在更新事务中途
+        import approx_query
+        import quantile_sketch
+        change_log.ensure_tables(conn)
+        backend.ensure_table(conn, 'quantile_sketches')
+        backend.ensure_table(conn, 'sample_strata')
+        backend.ensure_table(conn, 'employee_samples')
         
-        # 2. 插入新员工
-        insert_query = """
-        INSERT INTO employees (
-            employee_id, name, department, salary_level, actual_salary, 
-            `left`, satisfaction_level, last_evaluation, number_project, 
-            average_monthly_hours, time_spend_company, Work_accident, 
-            promotion_last_5years, hire_date, termination_date, 
-            turnover_probability, last_updated
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        # 1. 批量更新离职员工
+        backend.bulk_update(
+            conn, 'employees', 'employee_id',
+            ['left', 'termination_date', 'last_updated', 'turnover_probability'],
+            [(emp['employee_id'], 1, update_date.strftime('%Y-%m-%d'), now, 1.0) for emp in terminating_employees]
+        )
         
-        for emp in new_employees:
-            cursor.execute(insert_query, (
-                emp['employee_id'], emp['name'], emp['department'], emp['salary_level'], emp['actual_salary'],
-                emp['left'], emp['satisfaction_level'], emp['last_evaluation'], emp['number_project'],
-                emp['average_monthly_hours'], emp['time_spend_company'], emp['Work_accident'],
-                emp['promotion_last_5years'], emp['hire_date'], emp['termination_date'],
-                emp['turnover_probability'], emp['last_updated']
-            ))
+        # 2. 批量插入新员工
+        backend.bulk_insert(
+            conn, 'employees', EMPLOYEE_COLUMNS,
+            [tuple(emp[column] for column in EMPLOYEE_COLUMNS) for emp in new_employees]
+        )
         
-        # 3. 更新所有在职员工的工作年限和其他参数
-        update_all_query = """
-        UPDATE employees
-        SET time_spend_company = TIMESTAMPDIFF(YEAR, hire_date, %s),
-            last_updated = %s
-        WHERE `left` = 0
-        """
-        cursor.execute(update_all_query, (
-            update_date.strftime('%Y-%m-%d'),
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ))
+        # 3. 更新工作年限发生变化的在职员工（未变化的行不修改，last_updated 保持不变）
+        tenure_updates = update_changed_tenure(conn, cursor, update_date, now)
+        
+        # 4. 重新计算在职员工的离职概率（工作年限变化后分数可能变化）
+        rescored = rescore_active_employees(conn, cursor)
+        
+        # 5. 在同一事务中记录变更事件
+        change_log.record_events(conn, build_change_events(
+            update_date, terminating_employees, new_employees, tenure_updates, rescored))
+        
+        # 6. 用当天的入职、离职员工增量更新分位数草图（只读写受影响的单元）
+        quantile_sketch.update_sketches(conn, new_employees, terminating_employees)
+        approx_query.update_samples(conn, new_employees, terminating_employees)
         
-        # 4. 更新last_update表
+        # 7. 更新last_update表
         update_date_query = """
         INSERT INTO last_update (update_date, updated_at)
         VALUES (%s, %s)
@@ -532,13 +621,30 @@ def update_employee_database(update_date=None):
             datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         ))
         
+        if checkpoint:
+            checkpoint(conn, update_date)
+        
         conn.commit()
         cursor.close()
+        
+        # 8. 提交后追加到本地二进制事件日志，失败时下次更新会补齐
+        try:
+            change_log.sync_event_log(conn)
+        except (OSError, ValueError, *DB_ERRORS) as e:
+            logging.warning(f"事件日志同步失败，将在下次更新时补齐: {e}")
+        
+        # 9. 数据完整性校验（一条聚合查询完成全部规则），只记录警告，不影响已提交的更新
+        import validation
+        try:
+            validation.log_report(validation.validate_table(conn, update_date), f"{update_date} 更新后")
+        except DB_ERRORS as e:
+            logging.warning(f"数据校验失败: {e}")
         conn.close()
         
-        logging.info(f"数据库更新成功: {len(new_employees)} 名新员工, {len(terminating_employees)} 名员工离职")
+        logging.info(f"数据库更新成功: {len(new_employees)} 名新员工, {len(terminating_employees)} 名员工离职, "
+                     f"{len(tenure_updates)} 名员工工作年限、{len(rescored)} 名员工离职概率已更新")
         return True
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         logging.error(f"数据库更新失败: {e}")
         conn.rollback()
         cursor.close()
@@ -563,15 +669,225 @@ def generate_date_range(start_date_str, end_date_str=None):
     
     return date_list
 
+def parse_importtime(stderr):
+    """解析 -X importtime 的输出，返回 {模块名: (自身耗时微秒, 累计耗时微秒, 嵌套层级)}"""
+    import re
+
+    timings = {}
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)', line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            timings[module] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return timings
+
+def direct_dependencies(timings, module):
+    """返回 module 直接导入的模块 [(模块名, 累计耗时微秒)]
+
+    -X importtime 按导入完成的顺序输出，子模块在父模块之前：module 的子树是它与上一个顶层条目之间的行，
+    解释器启动时导入的模块（encodings、site 等）不在其中。
+    """
+    entries = list(timings.items())
+    names = [name for name, _ in entries]
+    if module not in names:
+        return []
+    end = names.index(module)
+    start = end
+    while start > 0 and entries[start - 1][1][2] > 0:
+        start -= 1
+    return [(name, cumulative_us) for name, (_, cumulative_us, level) in entries[start:end] if level == 1]
+
+def startup_report(top=15):
+    """在子进程中以 -X importtime 导入本脚本，打印启动耗时分解"""
+    import subprocess
+    import sys
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    started = datetime.now()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import daily_update'],
+        cwd=script_dir, capture_output=True, text=True
+    )
+    wall_ms = (datetime.now() - started).total_seconds() * 1000
+    if result.returncode != 0:
+        print(result.stderr)
+        return False
+    timings = parse_importtime(result.stderr)
+    total_ms = sum(self_us for self_us, _, _ in timings.values()) / 1000
+
+    print("\n===== 启动耗时报告 =====")
+    print(f"进程总耗时: {wall_ms:.1f}ms, 其中模块导入: {total_ms:.1f}ms")
+    if 'daily_update' in timings:
+        print(f"daily_update 导入累计: {timings['daily_update'][1] / 1000:.1f}ms")
+    print("\ndaily_update 的直接依赖（按累计耗时）:")
+    direct = sorted(direct_dependencies(timings, 'daily_update'), key=lambda item: item[1], reverse=True)
+    for module, cumulative_us in direct[:top]:
+        print(f"  {module}: {cumulative_us / 1000:.1f}ms")
+    print("\n重量级依赖:")
+    for module in HEAVY_MODULES:
+        if module in timings:
+            print(f"  {module}: {timings[module][1] / 1000:.1f}ms (启动时已导入)")
+        else:
+            print(f"  {module}: 未导入（按需加载）")
+    return True
+
+def get_random_state():
+    """获取 random、numpy 和 Faker 的随机数状态（可JSON序列化）"""
+    import numpy as np
+    
+    np_name, np_keys, np_pos, np_has_gauss, np_cached_gauss = np.random.get_state()
+    return {
+        'random': random.getstate(),
+        'numpy': [np_name, np_keys.tolist(), np_pos, np_has_gauss, np_cached_gauss],
+        'faker': get_fake_en().random.getstate()
+    }
+
+def set_random_state(state):
+    """恢复 get_random_state() 保存的随机数状态"""
+    import numpy as np
+    
+    def to_tuple(value):
+        return tuple(to_tuple(item) for item in value) if isinstance(value, list) else value
+    
+    random.setstate(to_tuple(state['random']))
+    np_name, np_keys, np_pos, np_has_gauss, np_cached_gauss = state['numpy']
+    np.random.set_state((np_name, np.array(np_keys, dtype=np.uint32), np_pos, np_has_gauss, np_cached_gauss))
+    get_fake_en().random.setstate(to_tuple(state['faker']))
+
+def get_backfill_checkpoint(range_id):
+    """读取批量补数据的检查点，不存在时返回 None"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        get_backend().ensure_table(conn, 'backfill_checkpoint')
+        cursor.execute(
+            "SELECT last_committed_date, rng_state, status FROM backfill_checkpoint WHERE range_id = %s",
+            (range_id,)
+        )
+        return cursor.fetchone()
+    except DB_ERRORS as e:
+        logging.error(f"读取补数据检查点失败: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+def save_backfill_checkpoint(conn, range_id, start_date, end_date, last_date, status='running'):
+    """在调用方的事务中保存检查点：最后提交的日期和此时的随机数状态"""
+    backend = get_backend()
+    backend.ensure_table(conn, 'backfill_checkpoint')
+    columns = ['range_id', 'start_date', 'end_date', 'last_committed_date', 'rng_state', 'status', 'updated_at']
+    row = (
+        range_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'),
+        last_date.strftime('%Y-%m-%d') if last_date else None,
+        json.dumps(get_random_state()), status, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    )
+    backend.bulk_insert(conn, 'backfill_checkpoint', columns, [row], upsert_key='range_id')
+
+def get_updated_dates(start_date, end_date):
+    """一次查询 last_update，返回范围内已经更新过的日期集合"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    
+    cursor = conn.cursor()
+    try:
+        get_backend().ensure_table(conn, 'last_update')
+        cursor.execute(
+            "SELECT DISTINCT update_date FROM last_update WHERE update_date BETWEEN %s AND %s",
+            (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        )
+        return {datetime.strptime(str(row[0])[:10], '%Y-%m-%d').date() for row in cursor.fetchall()}
+    except DB_ERRORS as e:
+        logging.error(f"查询已更新日期失败: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+def run_backfill(start_date, end_date):
+    """批量补数据：只处理范围内缺失的日期，每天提交时保存检查点，失败时停止以便从断点继续
+    
+    返回是否全部完成。
+    """
+    range_id = f"{start_date:%Y-%m-%d}~{end_date:%Y-%m-%d}"
+    date_range = generate_date_range(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    
+    updated_dates = get_updated_dates(start_date, end_date)
+    if updated_dates is None:
+        return False
+    missing_dates = [single_date for single_date in date_range if single_date not in updated_dates]
+    logging.info(f"批量更新模式: 从 {start_date} 到 {end_date}, 共 {len(date_range)} 天, "
+                 f"已更新 {len(date_range) - len(missing_dates)} 天, 待更新 {len(missing_dates)} 天")
+    
+    checkpoint = get_backfill_checkpoint(range_id) if missing_dates else None
+    if checkpoint and checkpoint['rng_state']:
+        # 恢复中断时的随机数状态，续跑结果与未中断时一致
+        set_random_state(json.loads(checkpoint['rng_state']))
+        logging.info(f"从检查点继续: 最后提交日期 {checkpoint['last_committed_date']}")
+    
+    def save_checkpoint(conn, update_date):
+        save_backfill_checkpoint(conn, range_id, start_date, end_date, update_date)
+    
+    for single_date in missing_dates:
+        logging.info(f"正在更新: {single_date}")
+        if not update_employee_database(single_date, checkpoint=save_checkpoint):
+            logging.error(f"批量更新在 {single_date} 中断，重新运行相同的命令即可从此日期继续")
+            return False
+    
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        save_backfill_checkpoint(conn, range_id, start_date, end_date, end_date, status='completed')
+        conn.commit()
+    except DB_ERRORS as e:
+        logging.error(f"保存补数据检查点失败: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+    logging.info(f"批量更新完成: {start_date} 到 {end_date}")
+    return True
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='员工数据每日更新')
     parser.add_argument('--date', type=str, help='指定更新日期 (YYYY-MM-DD 格式)')
     parser.add_argument('--start-date', type=str, help='批量更新起始日期 (YYYY-MM-DD 格式)')
     parser.add_argument('--end-date', type=str, help='批量更新结束日期 (YYYY-MM-DD 格式)')
+    storage.add_cli_arguments(parser)
+    parser.add_argument('--lock-timeout', type=float, default=UPDATE_LOCK_TIMEOUT,
+                        help='其他进程正在更新此数据库时最多等待的秒数')
+    parser.add_argument('--startup-report', action='store_true', help='输出启动阶段各模块的导入耗时后退出')
     
     args = parser.parse_args()
     
+    if args.startup_report:
+        startup_report()
+        return
+    
+    seed_random_generators()
+    
+    storage.configure_from_args(args)
+    
+    try:
+        lock = get_backend().acquire_lock(UPDATE_LOCK_NAME, args.lock_timeout)
+    except (OSError, *DB_ERRORS) as e:
+        logging.error(f"获取更新锁失败: {e}")
+        return
+    if lock is None:
+        logging.warning("另一个进程正在更新此数据库，本次不运行")
+        return
+    try:
+        run_updates(args)
+    finally:
+        get_backend().release_lock(lock)
+
+def run_updates(args):
+    """按命令行参数运行批量、单日或当天更新（调用方已持有更新锁）"""
     if args.start_date:
         # 批量更新模式
         if not args.end_date:
@@ -579,12 +895,10 @@ def main():
         else:
             end_date = args.end_date
         
-        date_range = generate_date_range(args.start_date, end_date)
-        logging.info(f"批量更新模式: 从 {args.start_date} 到 {end_date}, 共 {len(date_range)} 天")
-        
-        for single_date in date_range:
-            logging.info(f"正在更新: {single_date}")
-            update_employee_database(single_date)
+        run_backfill(
+            datetime.strptime(args.start_date, '%Y-%m-%d').date(),
+            datetime.strptime(end_date, '%Y-%m-%d').date()
+        )
     elif args.date:
         # 单日更新模式
         date_obj = datetime.strptime(args.date, '%Y-%m-%d').date()
@@ -11,18 +11,28 @@
 - 离职率约为23.8%，符合原始数据集特征
 - 满意度与离职率负相关（满意度低的员工更容易离职）
 - 工作项目数与离职的非线性关系（过多或过少项目的员工更易离职）
-- 直接导入MySQL，无需用户交互
-- 生成的数据分布与真实数据集一致
+- 直接导入MySQL（或通过 storage 模块导入嵌入式SQLite/DuckDB），无需用户交互
+- 统计信息（各项分布与离职率）由位图索引（bitmap_index.py）计算
+- 导入后运行数据完整性校验（validation.py），并重建分位数草图（quantile_sketch.py）和分层样本（approx_query.py）
+- 生成的数据分布与真实数据集一致；各分布参数集中在 GENERATOR_PARAMS，可用 calibrate.py 拟合
 - 控制new_hires和terminations的年度变化不超过20%，并应用平滑机制
 """
 
 import pandas as pd
 import numpy as np
-import mysql.connector
 from faker import Faker
 from datetime import datetime, timedelta
 import random
 import os
+import json
+
+import approx_query
+import id_allocator
+import quantile_sketch
+import validation
+from bitmap_index import BIN_COLUMNS, BitmapIndex
+from employee_store import EmployeeStore
+from storage import DB_ERRORS, EMPLOYEE_COLUMNS, get_backend
 
 # 设置随机种子以确保可重复性
 random.seed(42)
@@ -32,15 +42,6 @@ np.random.seed(42)
 fake = Faker('zh_CN')
 fake_en = Faker()
 
-# 数据库连接配置 - 请修改为您的实际配置
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'Taylor@1989',  # 修改为您的MySQL密码
-    'database': 'employee_db',
-    'port': 3306
-}
-
 # 常量设置
 TOTAL_EMPLOYEES = 15000  # 总员工数量
 TARGET_TURNOVER_RATE = 0.238  # 目标离职率 23.8%
@@ -103,9 +104,42 @@ YEARS_DISTRIBUTION = {
     10: 0.014  # 1.4%
 }
 
+# 生成器参数：各分布的形状参数和比率，可由 calibrate.py 按目标分布拟合后写入 GENERATOR_PARAMS_FILE
+GENERATOR_PARAMS_FILE = 'generator_params.json'
+GENERATOR_PARAMS = {
+    'leaver_satisfaction_a': 2,         # 离职员工满意度 beta(a, b)
+    'leaver_satisfaction_b': 3,
+    'stayer_satisfaction_a': 5,         # 在职员工满意度 beta(a, b)
+    'stayer_satisfaction_b': 2,
+    'evaluation_a': 7,                  # 评估分数 beta(a, b)
+    'evaluation_b': 3,
+    'leaver_project_shift_rate': 0.4,   # 离职员工项目数偏离基础分布的比例
+    'leaver_project_up_share': 0.5,     # 其中项目数 +2（其余 -1）的比例
+    'hours_mean': 201,                  # 月均工时的正态分布
+    'hours_sd': 30,
+    'hours_per_project': 10,            # 每多一个项目增加的工时（以3.8个项目为基准）
+    'leaver_hours_shift': 8,            # 离职员工额外的工时
+    'leaver_accident_rate': 0.0473,
+    'stayer_accident_rate': 0.1750,
+    'leaver_promotion_rate': 0.0053,
+    'stayer_promotion_rate': 0.0263
+}
+
+def load_generator_params(path=GENERATOR_PARAMS_FILE):
+    """读取拟合后的生成器参数并覆盖默认值，文件不存在时返回 False"""
+    if not os.path.exists(path):
+        return False
+    with open(path, encoding='utf-8') as f:
+        params = json.load(f)
+    unknown = set(params) - set(GENERATOR_PARAMS)
+    if unknown:
+        raise ValueError(f"未知的生成器参数: {', '.join(sorted(unknown))}")
+    GENERATOR_PARAMS.update(params)
+    return True
+
 def generate_employee_ids(count):
-    """生成唯一的员工ID"""
-    return random.sample(range(1000, 100000), count)
+    """生成唯一的员工ID，数量超过默认ID范围时自动扩大范围（NumPy一次生成，支持数百万员工）"""
+    return id_allocator.sample_ids(count).tolist()
 
 def calculate_turnover_probability(satisfaction_score, evaluation_score, project_count, monthly_hours, years, accident, promotion):
     """根据多个因素计算离职概率，基于原始数据集的特征"""
@@ -149,13 +183,16 @@ def calculate_turnover_probability(satisfaction_score, evaluation_score, project
 def generate_satisfaction_level(is_leaver):
     """生成员工满意度"""
     if is_leaver:
-        return np.clip(np.random.beta(2, 3) * 0.9 + 0.1, 0.09, 1.0)
+        return np.clip(np.random.beta(GENERATOR_PARAMS['leaver_satisfaction_a'],
+                                      GENERATOR_PARAMS['leaver_satisfaction_b']) * 0.9 + 0.1, 0.09, 1.0)
     else:
-        return np.clip(np.random.beta(5, 2) * 0.85 + 0.15, 0.1, 1.0)
+        return np.clip(np.random.beta(GENERATOR_PARAMS['stayer_satisfaction_a'],
+                                      GENERATOR_PARAMS['stayer_satisfaction_b']) * 0.85 + 0.15, 0.1, 1.0)
 
 def generate_evaluation_score(is_leaver):
     """生成评估分数"""
-    return np.clip(np.random.beta(7, 3) * 0.7 + 0.35, 0.36, 1.0)
+    return np.clip(np.random.beta(GENERATOR_PARAMS['evaluation_a'], GENERATOR_PARAMS['evaluation_b']) * 0.7 + 0.35,
+                   0.36, 1.0)
 
 def generate_project_count(is_leaver):
     """生成项目数量，2-7个，基于原始数据分布"""
@@ -165,8 +202,8 @@ def generate_project_count(is_leaver):
         k=1
     )[0]
     
-    if is_leaver and random.random() < 0.4:
-        if random.random() < 0.5:
+    if is_leaver and random.random() < GENERATOR_PARAMS['leaver_project_shift_rate']:
+        if random.random() < GENERATOR_PARAMS['leaver_project_up_share']:
             return min(7, projects + 2)
         else:
             return max(2, projects - 1)
@@ -175,10 +212,10 @@ def generate_project_count(is_leaver):
 
 def generate_monthly_hours(is_leaver, project_count):
     """生成月均工作小时"""
-    base_hours = int(np.random.normal(201, 30))
-    hours_adjustment = (project_count - 3.8) * 10
+    base_hours = int(np.random.normal(GENERATOR_PARAMS['hours_mean'], GENERATOR_PARAMS['hours_sd']))
+    hours_adjustment = (project_count - 3.8) * GENERATOR_PARAMS['hours_per_project']
     if is_leaver:
-        hours_adjustment += 8
+        hours_adjustment += GENERATOR_PARAMS['leaver_hours_shift']
     hours = base_hours + hours_adjustment
     return max(96, min(310, hours))
 
@@ -193,16 +230,16 @@ def generate_years_at_company():
 def generate_work_accident(is_leaver):
     """生成工作事故记录，离职员工事故率更低(4.73% vs 17.50%)"""
     if is_leaver:
-        return 1 if random.random() < 0.0473 else 0
+        return 1 if random.random() < GENERATOR_PARAMS['leaver_accident_rate'] else 0
     else:
-        return 1 if random.random() < 0.1750 else 0
+        return 1 if random.random() < GENERATOR_PARAMS['stayer_accident_rate'] else 0
 
 def generate_promotion(is_leaver):
     """生成晋升记录，离职员工晋升率更低(0.53% vs 2.63%)"""
     if is_leaver:
-        return 1 if random.random() < 0.0053 else 0
+        return 1 if random.random() < GENERATOR_PARAMS['leaver_promotion_rate'] else 0
     else:
-        return 1 if random.random() < 0.0263 else 0
+        return 1 if random.random() < GENERATOR_PARAMS['stayer_promotion_rate'] else 0
 
 def generate_department():
     """生成部门，基于原始数据分布"""
@@ -267,18 +304,28 @@ def generate_termination_date(is_leaver):
         return termination_date.strftime('%Y-%m-%d')
     return None
 
-def generate_employee_data():
-    """生成所有员工数据，并控制new_hires和terminations"""
-    print(f"生成数据：目标离职率 {TARGET_TURNOVER_RATE:.1%}，总员工 {TOTAL_EMPLOYEES} 人")
-    print(f"目标在职员工：{CURRENT_EMPLOYEES} 人，历史离职员工：{HISTORICAL_LEAVERS} 人")
+def generate_employee_data(total_employees=TOTAL_EMPLOYEES, start_year=START_YEAR, end_year=END_YEAR,
+                           employee_ids=None):
+    """生成所有员工数据，并控制new_hires和terminations
+
+    start_year/end_year 为入职年份范围；employee_ids 为预先分配的员工ID（分批生成大数据集时使用）。
+    """
+    historical_leavers = int(total_employees * TARGET_TURNOVER_RATE)
+    current_employees = total_employees - historical_leavers
+    print(f"生成数据：目标离职率 {TARGET_TURNOVER_RATE:.1%}，总员工 {total_employees} 人")
+    print(f"目标在职员工：{current_employees} 人，历史离职员工：{historical_leavers} 人")
     
-    employee_ids = generate_employee_ids(TOTAL_EMPLOYEES)
-    leaver_ids = set(employee_ids[:HISTORICAL_LEAVERS])
+    if employee_ids is None:
+        employee_ids = generate_employee_ids(total_employees)
+    leaver_ids = set(employee_ids[:historical_leavers])
+    # leaver在leaver_ids中的位置，避免在循环中反复执行 list(leaver_ids).index()
+    leaver_index = {emp_id: idx for idx, emp_id in enumerate(leaver_ids)}
     
-    employees_data = []
+    # 按列存储，每名员工只在生成时临时使用一个字典
+    employees_data = EmployeeStore(capacity=total_employees)
     
     # 计算每年的new_hires和terminations目标
-    years_range = range(START_YEAR, END_YEAR + 1)
+    years_range = range(start_year, end_year + 1)
     num_years = len(years_range)
     
     # 初始值（参考你的表格2005年的数据）
@@ -290,7 +337,7 @@ def generate_employee_data():
     raw_terminations = []
     
     for year in years_range:
-        if year == START_YEAR:
+        if year == start_year:
             raw_new_hires.append(base_new_hires)
             raw_terminations.append(base_terminations)
         else:
@@ -321,12 +368,12 @@ def generate_employee_data():
     
     # 按比例分配员工
     # 修改：分配所有员工（包括leavers）到hire_counts，因为所有员工都需要一个hire_date
-    hire_counts = [int((nh / total_new_hires) * TOTAL_EMPLOYEES) for nh in smoothed_new_hires]
-    termination_counts = [int((t / total_terminations) * HISTORICAL_LEAVERS) for t in smoothed_terminations]
+    hire_counts = [int((nh / total_new_hires) * total_employees) for nh in smoothed_new_hires]
+    termination_counts = [int((t / total_terminations) * historical_leavers) for t in smoothed_terminations]
     
     # 调整以确保总数精确
-    hire_counts[-1] += TOTAL_EMPLOYEES - sum(hire_counts)
-    termination_counts[-1] += HISTORICAL_LEAVERS - sum(termination_counts)
+    hire_counts[-1] += total_employees - sum(hire_counts)
+    termination_counts[-1] += historical_leavers - sum(termination_counts)
     
     # 分配员工到各年
     hire_indices = []
@@ -374,7 +421,7 @@ def generate_employee_data():
         
         if is_leaver:
             # 只有leavers使用termination_map
-            term_index = list(leaver_ids).index(emp_id)  # 获取该leaver在leaver_ids中的索引
+            term_index = leaver_index[emp_id]  # 获取该leaver在leaver_ids中的索引
             term_year = termination_map[term_index]
             termination_date = f"{term_year}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
             
@@ -417,18 +464,19 @@ def generate_employee_data():
         employees_data.append(employee)
     
     # 计算实际离职率
-    actual_leavers = sum(1 for e in employees_data if e['left'] == 1)
+    actual_leavers = int(employees_data.column('left').sum())
     actual_turnover_rate = actual_leavers / len(employees_data)
     print(f"实际离职率: {actual_turnover_rate:.2%} ({actual_leavers}/{len(employees_data)})")
     
     # 输出年度统计
     annual_stats = {year: {'new_hires': 0, 'terminations': 0} for year in years_range}
-    for emp in employees_data:
-        hire_year = int(emp['hire_date'].split('-')[0])
-        annual_stats[hire_year]['new_hires'] += 1
-        if emp['termination_date']:
-            term_year = int(emp['termination_date'].split('-')[0])
-            annual_stats[term_year]['terminations'] += 1
+    hire_years = employees_data.column('hire_date').astype('datetime64[Y]').astype(int) + 1970
+    termination_dates = employees_data.column('termination_date')
+    term_years = termination_dates[~np.isnat(termination_dates)].astype('datetime64[Y]').astype(int) + 1970
+    for year, count in zip(*np.unique(hire_years, return_counts=True)):
+        annual_stats[int(year)]['new_hires'] += int(count)
+    for year, count in zip(*np.unique(term_years, return_counts=True)):
+        annual_stats[int(year)]['terminations'] += int(count)
     
     # 计算headcount
     headcount = 0
@@ -448,44 +496,14 @@ def create_database():
     """创建数据库和表"""
     try:
         print("\n尝试创建数据库...")
-        conn = mysql.connector.connect(
-            host=DB_CONFIG['host'],
-            port=DB_CONFIG['port'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password']
-        )
-        cursor = conn.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
-        cursor.execute(f"USE {DB_CONFIG['database']}")
-        
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS employees (
-            employee_id INT PRIMARY KEY,
-            name VARCHAR(100),
-            department VARCHAR(50),
-            salary_level VARCHAR(20),
-            actual_salary INT,
-            `left` TINYINT,
-            satisfaction_level FLOAT,
-            last_evaluation FLOAT,
-            number_project INT,
-            average_monthly_hours INT,
-            time_spend_company INT,
-            Work_accident TINYINT,
-            promotion_last_5years TINYINT,
-            hire_date DATE,
-            termination_date DATE,
-            turnover_probability FLOAT,
-            last_updated DATETIME
-        )
-        """)
-        
-        conn.commit()
-        cursor.close()
+        backend = get_backend()
+        backend.create_database()
+        conn = backend.connect()
+        backend.ensure_table(conn, 'employees')
         conn.close()
         print("数据库和表创建成功!")
         return True
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         print(f"创建数据库失败: {e}")
         print("\n可能的问题：")
         print("1. MySQL服务是否正在运行")
@@ -494,95 +512,66 @@ def create_database():
         return False
 
 def import_to_mysql(employees_data):
-    """将数据导入MySQL数据库"""
+    """将数据导入数据库（默认MySQL，后端由 config.STORAGE_BACKEND 决定）"""
     try:
-        print("\n尝试连接MySQL数据库...")
+        print("\n尝试连接数据库...")
         backup_file = "employee_data_turnover.csv"
         print(f"保存数据备份到 {backup_file}...")
         save_to_csv(employees_data, backup_file)
 
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS employees (
-            employee_id INT PRIMARY KEY,
-            name VARCHAR(100),
-            department VARCHAR(50),
-            salary_level VARCHAR(20),
-            actual_salary INT,
-            `left` TINYINT,
-            satisfaction_level FLOAT,
-            last_evaluation FLOAT,
-            number_project INT,
-            average_monthly_hours INT,
-            time_spend_company INT,
-            Work_accident TINYINT,
-            promotion_last_5years TINYINT,
-            hire_date DATE,
-            termination_date DATE,
-            turnover_probability FLOAT,
-            last_updated DATETIME
-        )
-        """)
+        backend = get_backend()
+        conn = backend.connect()
+        backend.ensure_table(conn, 'employees')
         
-        insert_sql = """
-        INSERT INTO employees (
-            employee_id, name, department, salary_level, actual_salary, 
-            `left`, satisfaction_level, last_evaluation, number_project, 
-            average_monthly_hours, time_spend_company, Work_accident, 
-            promotion_last_5years, hire_date, termination_date, 
-            turnover_probability, last_updated
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-            name = VALUES(name),
-            department = VALUES(department),
-            salary_level = VALUES(salary_level),
-            actual_salary = VALUES(actual_salary),
-            `left` = VALUES(`left`),
-            satisfaction_level = VALUES(satisfaction_level),
-            last_evaluation = VALUES(last_evaluation),
-            number_project = VALUES(number_project),
-            average_monthly_hours = VALUES(average_monthly_hours),
-            time_spend_company = VALUES(time_spend_company),
-            Work_accident = VALUES(Work_accident),
-            promotion_last_5years = VALUES(promotion_last_5years),
-            hire_date = VALUES(hire_date),
-            termination_date = VALUES(termination_date),
-            turnover_probability = VALUES(turnover_probability),
-            last_updated = VALUES(last_updated)
-        """
-        
-        data_to_insert = [(
-            emp['employee_id'], emp['name'], emp['department'], emp['salary_level'], emp['actual_salary'],
-            emp['left'], emp['satisfaction_level'], emp['last_evaluation'], emp['number_project'],
-            emp['average_monthly_hours'], emp['time_spend_company'], emp['Work_accident'],
-            emp['promotion_last_5years'], emp['hire_date'], emp['termination_date'],
-            emp['turnover_probability'], emp['last_updated']
-        ) for emp in employees_data]
-
         batch_size = 1000
-        for i in range(0, len(data_to_insert), batch_size):
-            cursor.executemany(insert_sql, data_to_insert[i:i+batch_size])
+        if isinstance(employees_data, EmployeeStore):
+            # 逐批转换列存储中的数据，不一次生成全部行的元组
+            batches = employees_data.iter_row_batches(batch_size=batch_size)
+        else:
+            batches = (
+                [tuple(emp[column] for column in EMPLOYEE_COLUMNS) for emp in employees_data[i:i+batch_size]]
+                for i in range(0, len(employees_data), batch_size)
+            )
+
+        imported = 0
+        for batch in batches:
+            backend.bulk_insert(conn, 'employees', EMPLOYEE_COLUMNS, batch,
+                                upsert_key='employee_id', batch_size=batch_size)
             conn.commit()
-            print(f"已导入 {min(i+batch_size, len(data_to_insert))}/{len(data_to_insert)} 条记录")
+            imported += len(batch)
+            print(f"已导入 {imported}/{len(employees_data)} 条记录")
+
+        # 使ID序列跳过已导入的ID，之后 daily_update 分配的新ID不会与其冲突
+        id_allocator.sync_sequence(conn)
+        conn.commit()
+
+        # 导入后校验数据完整性；生成的工作年限是模拟值，要等 daily_update 按入职日期修正，因此不检查工作年限
+        report = validation.validate_table(conn)
+        validation.print_report(report, "导入后的 employees 表")
+
+        # 重新导入后旧的草图和样本已失效，扫描一次员工表重建，之后由 daily_update 增量更新
+        quantile_sketch.rebuild_sketches(conn)
+        approx_query.rebuild_samples(conn)
+        conn.commit()
 
-        cursor.close()
         conn.close()
-        print(f"已成功导入 {len(employees_data)} 条员工数据到MySQL")
+        print(f"已成功导入 {len(employees_data)} 条员工数据到数据库")
         return True
-    except mysql.connector.Error as e:
-        print(f"MySQL操作失败: {e}")
+    except DB_ERRORS as e:
+        print(f"数据库操作失败: {e}")
         print("\n可能的解决方案:")
         print("1. 确认MySQL服务正在运行")
-        print("2. 检查DB_CONFIG中的信息是否正确")
+        print("2. 检查 config.py 中的 DB_CONFIG 是否正确")
         print("3. 确认用户拥有CREATE TABLE和INSERT权限")
         return False
 
 def save_to_csv(employees_data, filename='employee_data_turnover.csv'):
     """保存员工数据为CSV"""
     try:
-        df = pd.DataFrame(employees_data)
+        if isinstance(employees_data, EmployeeStore):
+            df = employees_data.to_pandas()
+        else:
+            df = pd.DataFrame(employees_data)
         df.to_csv(filename, index=False, encoding='utf-8-sig')
         print(f"数据已保存到 {filename}")
         return True
@@ -597,7 +586,18 @@ def display_sample_data(employees_data, sample_size=10):
         return
 
     sample = random.sample(employees_data, min(sample_size, len(employees_data)))
-    df = pd.DataFrame(sample)
+    df = pd.DataFrame([dict(emp) for emp in sample])
+    # 各项分布和离职率都由位图索引计算：每个取值、每个区间只建一次位图，之后的筛选都是位运算
+    if isinstance(employees_data, EmployeeStore):
+        index = BitmapIndex.from_store(employees_data)
+        satisfaction = employees_data.column('satisfaction_level').astype(np.float64)
+        sketches = quantile_sketch.SketchSet.from_store(employees_data)
+    else:
+        index = BitmapIndex.from_records(employees_data)
+        satisfaction = np.array([emp['satisfaction_level'] for emp in employees_data], dtype=np.float64)
+        sketches = quantile_sketch.SketchSet.from_records(employees_data)
+    total = len(employees_data)
+    left = index.bitmap('left', 1)
     display_columns = [
         'employee_id', 'name', 'department', 'salary_level', 
         'left', 'satisfaction_level', 'last_evaluation', 'number_project',
@@ -608,99 +608,78 @@ def display_sample_data(employees_data, sample_size=10):
     print(df[display_columns].to_string())
 
     print("\n===== 数据统计信息 =====")
-    print(f"总记录数: {len(employees_data)}")
-    turnover_count = sum(1 for emp in employees_data if emp['left'] == 1)
-    active_count = len(employees_data) - turnover_count
-    turnover_rate = turnover_count / len(employees_data)
+    print(f"总记录数: {total}")
+    turnover_count = left.count()
+    active_count = total - turnover_count
+    turnover_rate = turnover_count / total
     print(f"在职员工: {active_count}, 历史离职员工: {turnover_count}")
     print(f"总离职率: {turnover_rate:.2%}")
 
-    dept_counts = pd.Series([emp['department'] for emp in employees_data]).value_counts()
+    def counts_by_size(column):
+        counts = {value: entry['count'] for value, entry in index.breakdown(column).items() if entry['count']}
+        return sorted(counts.items(), key=lambda item: -item[1])
+
     print("\n部门分布:")
-    for dept, count in dept_counts.items():
-        print(f"  {dept}: {count}人 ({count/len(employees_data):.2%})")
+    for dept, count in counts_by_size('department'):
+        print(f"  {dept}: {count}人 ({count/total:.2%})")
 
-    salary_counts = pd.Series([emp['salary_level'] for emp in employees_data]).value_counts()
     print("\n薪资水平分布:")
-    for level, count in salary_counts.items():
-        print(f"  {level}: {count}人 ({count/len(employees_data):.2%})")
+    for level, count in counts_by_size('salary_level'):
+        print(f"  {level}: {count}人 ({count/total:.2%})")
 
-    all_satisfaction = [emp['satisfaction_level'] for emp in employees_data]
-    active_satisfaction = [emp['satisfaction_level'] for emp in employees_data if emp['left'] == 0]
-    leaving_satisfaction = [emp['satisfaction_level'] for emp in employees_data if emp['left'] == 1]
-    
+    left_mask = left.to_mask()
     print(f"\n满意度统计:")
-    print(f"  总体平均满意度: {np.mean(all_satisfaction):.3f}")
-    print(f"  在职员工平均满意度: {np.mean(active_satisfaction):.3f}")
-    print(f"  离职员工平均满意度: {np.mean(leaving_satisfaction):.3f}")
+    print(f"  总体平均满意度: {np.mean(satisfaction):.3f}")
+    print(f"  在职员工平均满意度: {np.mean(satisfaction[~left_mask]):.3f}")
+    print(f"  离职员工平均满意度: {np.mean(satisfaction[left_mask]):.3f}")
+
+    print("\n在职员工薪资分位数 (p10/p50/p90):")
+    for dept in sketches.groups('department'):
+        p10, p50, p90 = sketches.quantiles('actual_salary', department=dept).values()
+        print(f"  {dept}: {p10:.0f} / {p50:.0f} / {p90:.0f}")
 
-    project_counts = pd.Series([emp['number_project'] for emp in employees_data]).value_counts().sort_index()
+    project_turnover = index.breakdown('number_project', rate_of=left)
     print("\n项目数量分布:")
-    for projects, count in project_counts.items():
-        print(f"  {projects}个项目: {count}人 ({count/len(employees_data):.2%})")
+    for projects, entry in project_turnover.items():
+        print(f"  {projects}个项目: {entry['count']}人 ({entry['count']/total:.2%})")
     
-    years_counts = pd.Series([emp['time_spend_company'] for emp in employees_data]).value_counts().sort_index()
     print("\n工作年限分布:")
-    for years, count in years_counts.items():
-        print(f"  {years}年: {count}人 ({count/len(employees_data):.2%})")
+    for years, entry in index.breakdown('time_spend_company').items():
+        print(f"  {years}年: {entry['count']}人 ({entry['count']/total:.2%})")
 
     print("\n按项目数量的离职率:")
-    for project_count in sorted(set([emp['number_project'] for emp in employees_data])):
-        project_employees = [emp for emp in employees_data if emp['number_project'] == project_count]
-        if project_employees:
-            left_count = sum(1 for emp in project_employees if emp['left'] == 1)
-            project_turnover = left_count / len(project_employees)
-            print(f"  {project_count}个项目: {project_turnover:.2%} 离职率 ({left_count}/{len(project_employees)})")
-
-    hour_bins = [(0, 150, "低工时"), (150, 220, "正常工时"), (220, 350, "高工时")]
+    for project_count, entry in project_turnover.items():
+        print(f"  {project_count}个项目: {entry['rate']:.2%} 离职率 ({entry['matches']}/{entry['count']})")
+
     print("\n按工作时长的离职率:")
-    for low, high, label in hour_bins:
-        in_range = [emp for emp in employees_data if low <= emp['average_monthly_hours'] < high]
-        if in_range:
-            left_in_range = sum(1 for emp in in_range if emp['left'] == 1)
-            rate = left_in_range / len(in_range) * 100
-            print(f"  {label} ({low}-{high}小时): {rate:.1f}% 离职率 ({left_in_range}/{len(in_range)})")
-
-    satisfaction_bins = [(0, 0.3, "低满意度"), (0.3, 0.6, "中等满意度"), (0.6, 1.0, "高满意度")]
+    hour_turnover = index.breakdown('average_monthly_hours', rate_of=left)
+    for low, high, label in BIN_COLUMNS['average_monthly_hours']:
+        entry = hour_turnover[label]
+        if entry['count']:
+            print(f"  {label} ({low}-{high}小时): {entry['rate'] * 100:.1f}% 离职率 ({entry['matches']}/{entry['count']})")
+
     print("\n按满意度分层的离职率:")
-    for low, high, label in satisfaction_bins:
-        in_range = [emp for emp in employees_data if low <= emp['satisfaction_level'] < high]
-        if in_range:
-            left_in_range = sum(1 for emp in in_range if emp['left'] == 1)
-            rate = left_in_range / len(in_range) * 100
-            print(f"  {label} ({low}-{high}): {rate:.1f}% 离职率 ({left_in_range}/{len(in_range)})")
+    satisfaction_turnover = index.breakdown('satisfaction_level', rate_of=left)
+    for low, high, label in BIN_COLUMNS['satisfaction_level']:
+        entry = satisfaction_turnover[label]
+        if entry['count']:
+            print(f"  {label} ({low}-{high}): {entry['rate'] * 100:.1f}% 离职率 ({entry['matches']}/{entry['count']})")
 
-    accident_employees = [emp for emp in employees_data if emp['Work_accident'] == 1]
-    no_accident_employees = [emp for emp in employees_data if emp['Work_accident'] == 0]
-    
-    accident_turnover = sum(1 for emp in accident_employees if emp['left'] == 1) / len(accident_employees) if accident_employees else 0
-    no_accident_turnover = sum(1 for emp in no_accident_employees if emp['left'] == 1) / len(no_accident_employees) if no_accident_employees else 0
-    
+    accident_turnover = index.breakdown('Work_accident', rate_of=left)
     print("\n工作事故与离职率关系:")
-    print(f"  有工作事故: {accident_turnover:.2%} 离职率")
-    print(f"  无工作事故: {no_accident_turnover:.2%} 离职率")
+    print(f"  有工作事故: {accident_turnover.get(1, {'rate': 0})['rate']:.2%} 离职率")
+    print(f"  无工作事故: {accident_turnover.get(0, {'rate': 0})['rate']:.2%} 离职率")
 
-    promoted_employees = [emp for emp in employees_data if emp['promotion_last_5years'] == 1]
-    not_promoted_employees = [emp for emp in employees_data if emp['promotion_last_5years'] == 0]
-    
-    promoted_turnover = sum(1 for emp in promoted_employees if emp['left'] == 1) / len(promoted_employees) if promoted_employees else 0
-    not_promoted_turnover = sum(1 for emp in not_promoted_employees if emp['left'] == 1) / len(not_promoted_employees) if not_promoted_employees else 0
-    
+    promotion_turnover = index.breakdown('promotion_last_5years', rate_of=left)
     print("\n晋升与离职率关系:")
-    print(f"  有晋升: {promoted_turnover:.2%} 离职率")
-    print(f"  无晋升: {not_promoted_turnover:.2%} 离职率")
+    print(f"  有晋升: {promotion_turnover.get(1, {'rate': 0})['rate']:.2%} 离职率")
+    print(f"  无晋升: {promotion_turnover.get(0, {'rate': 0})['rate']:.2%} 离职率")
 
 def drop_table_if_exists():
     """删除表（如果存在）"""
     try:
         print("\n尝试删除现有表...")
-        conn = mysql.connector.connect(
-            host=DB_CONFIG['host'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            database=DB_CONFIG['database'],
-            port=DB_CONFIG['port']
-        )
+        conn = get_backend().connect()
         cursor = conn.cursor()
         cursor.execute("DROP TABLE IF EXISTS employees")
         conn.commit()
@@ -708,7 +687,7 @@ def drop_table_if_exists():
         conn.close()
         print("表已删除（如果存在）")
         return True
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         print(f"删除表失败: {e}")
         return False
 
@@ -717,6 +696,8 @@ if __name__ == "__main__":
     print("HR离职预测数据生成程序启动")
     print(f"目标：生成 {TOTAL_EMPLOYEES} 条员工记录，离职率 {TARGET_TURNOVER_RATE:.1%}")
     print("数据特征：基于真实HR离职数据集，包含满意度、评估、项目数等关键预测因子")
+    if load_generator_params():
+        print(f"使用拟合后的生成器参数: {GENERATOR_PARAMS_FILE}")
     
     employees_data = generate_employee_data()
     
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+紧凑的内存员工数据存储 (HR离职分析版)
+
+用按列存放的NumPy数组代替"每名员工一个17键字典"的列表：
+- 数值列使用满足取值范围的最小整数/浮点类型，日期使用 datetime64[s]（pandas可直接引用）
+- department、salary_level 以字典编码存储（每行只保存一个uint8编码），
+  name 以UTF-8拼接保存在一块连续内存中，每行只保存偏移量
+- EmployeeRow 是带 __slots__ 的只读行视图，支持 emp['left'] 等字典式访问，
+  现有按行处理的代码无需修改
+- to_pandas() 直接复用底层数组（分类列使用 pd.Categorical.from_codes），
+  iter_row_batches() 按批生成数据库写入需要的元组
+- 每行内存约80字节（原字典约2KB）
+- read_snapshot_frame() 读取员工快照CSV/Parquet，旧版快照的列名统一换成 employees 表的列名
+"""
+
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from storage import EMPLOYEE_COLUMNS
+
+# 各列的存储类型
+NUMERIC_DTYPES = {
+    'employee_id': np.int64,
+    'actual_salary': np.int32,
+    'left': np.int8,
+    'satisfaction_level': np.float32,
+    'last_evaluation': np.float32,
+    'number_project': np.int8,
+    'average_monthly_hours': np.int16,
+    'time_spend_company': np.int8,
+    'Work_accident': np.int8,
+    'promotion_last_5years': np.int8,
+    'turnover_probability': np.float32
+}
+DATE_DTYPES = {
+    'hire_date': 'datetime64[s]',
+    'termination_date': 'datetime64[s]',
+    'last_updated': 'datetime64[s]'
+}
+# 字典编码的列：编码类型及初始类别（与 data.py 中的分布定义顺序一致）
+CATEGORICAL_COLUMNS = {
+    'department': (np.uint8, ['sales', 'technical', 'support', 'IT', 'product_mng',
+                              'marketing', 'RandD', 'accounting', 'hr', 'management']),
+    'salary_level': (np.uint8, ['low', 'medium', 'high'])
+}
+# 浮点列在行视图和写库时保留的小数位数（与生成时的取整一致）
+FLOAT_DIGITS = {
+    'satisfaction_level': 2,
+    'last_evaluation': 2,
+    'turnover_probability': 3
+}
+DATE_FORMATS = {
+    'hire_date': 10,       # 'YYYY-MM-DD'
+    'termination_date': 10,
+    'last_updated': 19     # 'YYYY-MM-DD HH:MM:SS'
+}
+# 旧版快照（employee_data_backup.csv 等）的列名
+LEGACY_COLUMNS = {
+    'turnover': 'left',
+    'satisfaction': 'satisfaction_level',
+    'evaluation': 'last_evaluation',
+    'project_count': 'number_project',
+    'years_at_company': 'time_spend_company',
+    'work_accident': 'Work_accident',
+    'promotion': 'promotion_last_5years'
+}
+# 快照缺少 turnover_probability 时用于计算它的特征列（calculate_turnover_probability_batch 的参数顺序）
+PROBABILITY_INPUTS = [
+    'satisfaction_level', 'last_evaluation', 'number_project', 'average_monthly_hours',
+    'time_spend_company', 'Work_accident', 'promotion_last_5years'
+]
+
+
+def read_snapshot_frame(path, columns):
+    """读取员工快照（CSV或Parquet）中的 columns 列，旧版列名换成 employees 表的列名
+
+    快照没有 turnover_probability 时按特征列计算；仍缺少列时抛出 ValueError。
+    CSV只读取需要的列，Parquet整体读取后再选列。
+    """
+    import os
+
+    import pandas as pd
+
+    wanted = set(columns)
+    if 'turnover_probability' in wanted:
+        wanted.update(PROBABILITY_INPUTS)
+    if os.path.splitext(path)[1].lower() == '.parquet':
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, usecols=lambda name: LEGACY_COLUMNS.get(name, name) in wanted,
+                         encoding='utf-8-sig', low_memory=False)
+    df = df.rename(columns=LEGACY_COLUMNS)
+
+    if 'turnover_probability' in columns and 'turnover_probability' not in df \
+            and all(column in df for column in PROBABILITY_INPUTS):
+        from daily_update import calculate_turnover_probability_batch
+
+        df['turnover_probability'] = np.round(calculate_turnover_probability_batch(
+            *(df[column] for column in PROBABILITY_INPUTS)), 3)
+    missing = [column for column in columns if column not in df]
+    if missing:
+        raise ValueError(f"快照 {path} 缺少列: {', '.join(missing)}")
+    return df[list(columns)]
+
+
+class EmployeeRow(Mapping):
+    """员工存储中的一行，按需从列数组中取值"""
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._store.value(key, self._index)
+
+    def __iter__(self):
+        return iter(EMPLOYEE_COLUMNS)
+
+    def __len__(self):
+        return len(EMPLOYEE_COLUMNS)
+
+    def __repr__(self):
+        return f"EmployeeRow({dict(self)!r})"
+
+
+class EmployeeStore(Sequence):
+    """按列存储的员工数据，行为上等同于员工字典列表"""
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self._capacity = max(1, capacity)
+        self._columns = {}
+        for name, dtype in NUMERIC_DTYPES.items():
+            self._columns[name] = np.zeros(self._capacity, dtype=dtype)
+        for name, dtype in DATE_DTYPES.items():
+            self._columns[name] = np.full(self._capacity, np.datetime64('NaT'), dtype=dtype)
+        self._categories = {}
+        self._category_codes = {}
+        for name, (dtype, categories) in CATEGORICAL_COLUMNS.items():
+            self._columns[name] = np.zeros(self._capacity, dtype=dtype)
+            self._categories[name] = list(categories)
+            self._category_codes[name] = {value: code for code, value in enumerate(categories)}
+        # 名字：所有名字的UTF-8字节依次拼接，第i行的名字为 blob[offsets[i]:offsets[i+1]]
+        self._name_blob = bytearray()
+        self._name_offsets = np.zeros(self._capacity + 1, dtype=np.int64)
+
+    @classmethod
+    def from_records(cls, records):
+        """由员工字典（或行视图）列表创建"""
+        store = cls(capacity=len(records) if hasattr(records, '__len__') else 1024)
+        store.extend(records)
+        return store
+
+    # ---- 写入 ----
+
+    def _grow(self, minimum):
+        capacity = max(minimum, self._capacity * 2)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            if name in DATE_DTYPES:
+                grown[self._size:] = np.datetime64('NaT')
+            self._columns[name] = grown
+        offsets = np.zeros(capacity + 1, dtype=np.int64)
+        offsets[:self._size + 1] = self._name_offsets[:self._size + 1]
+        self._name_offsets = offsets
+        self._capacity = capacity
+
+    def _encode(self, name, value):
+        codes = self._category_codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = len(self._categories[name])
+            if code > np.iinfo(self._columns[name].dtype).max:
+                raise ValueError(f"{name} 的类别数超过编码上限")
+            self._categories[name].append(value)
+            codes[value] = code
+        return code
+
+    def append(self, record):
+        """追加一名员工"""
+        if self._size == self._capacity:
+            self._grow(self._size + 1)
+        i = self._size
+        columns = self._columns
+        for name in NUMERIC_DTYPES:
+            columns[name][i] = record[name]
+        for name in DATE_DTYPES:
+            value = record[name]
+            columns[name][i] = np.datetime64(value) if value is not None else np.datetime64('NaT')
+        for name in CATEGORICAL_COLUMNS:
+            columns[name][i] = self._encode(name, record[name])
+        self._name_blob += record['name'].encode('utf-8')
+        self._name_offsets[i + 1] = len(self._name_blob)
+        self._size += 1
+
+    def extend(self, records):
+        """追加多名员工"""
+        if hasattr(records, '__len__') and self._size + len(records) > self._capacity:
+            self._grow(self._size + len(records))
+        for record in records:
+            self.append(record)
+
+    def set_column(self, name, values):
+        """整列替换（值数组长度必须等于行数），分类列传入原始取值"""
+        if name in CATEGORICAL_COLUMNS:
+            values = [self._encode(name, value) for value in values]
+        self._columns[name][:self._size] = values
+
+    # ---- 读取 ----
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(self._size)[index])
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('员工存储索引越界')
+        return EmployeeRow(self, index)
+
+    def _name(self, index):
+        return self._name_blob[self._name_offsets[index]:self._name_offsets[index + 1]].decode('utf-8')
+
+    def names(self):
+        """返回全部名字组成的列表"""
+        return [self._name(i) for i in range(self._size)]
+
+    def value(self, name, index):
+        """按行视图的格式返回单个值（与原字典中的类型一致）"""
+        if name == 'name':
+            return self._name(index)
+        column = self._columns[name]
+        if name in CATEGORICAL_COLUMNS:
+            return self._categories[name][column[index]]
+        value = column[index]
+        if name in DATE_DTYPES:
+            if np.isnat(value):
+                return None
+            return str(value).replace('T', ' ')[:DATE_FORMATS[name]]
+        if name in FLOAT_DIGITS:
+            return round(float(value), FLOAT_DIGITS[name])
+        return int(value)
+
+    def column(self, name):
+        """返回列数组的视图（分类列为编码数组），name 列返回字符串数组"""
+        if name == 'name':
+            return np.array(self.names(), dtype=object)
+        return self._columns[name][:self._size]
+
+    def categories(self, name):
+        """返回分类列的类别列表，下标即编码"""
+        return list(self._categories[name])
+
+    def take(self, indices):
+        """按行号选取若干行，返回新的存储"""
+        indices = np.asarray(indices, dtype=np.int64)
+        store = EmployeeStore(capacity=len(indices))
+        for name, column in self._columns.items():
+            store._columns[name][:len(indices)] = column[:self._size][indices]
+        for name in CATEGORICAL_COLUMNS:
+            store._categories[name] = list(self._categories[name])
+            store._category_codes[name] = dict(self._category_codes[name])
+        starts = self._name_offsets[indices]
+        ends = self._name_offsets[indices + 1]
+        store._name_blob = bytearray(b''.join(self._name_blob[a:b] for a, b in zip(starts.tolist(), ends.tolist())))
+        store._name_offsets[1:len(indices) + 1] = np.cumsum(ends - starts)
+        store._size = len(indices)
+        return store
+
+    def to_pandas(self):
+        """转换为DataFrame，数值列和日期列直接引用底层数组，不复制（名字需要解码为字符串）"""
+        import pandas as pd
+
+        data = {}
+        for name in EMPLOYEE_COLUMNS:
+            column = self.column(name)
+            if name in CATEGORICAL_COLUMNS:
+                data[name] = pd.Categorical.from_codes(column, categories=self._categories[name])
+            else:
+                data[name] = column
+        return pd.DataFrame(data, copy=False)
+
+    def iter_row_batches(self, columns=EMPLOYEE_COLUMNS, batch_size=1000):
+        """按批生成数据库写入用的元组，每批只转换该批的列数据"""
+        for start in range(0, self._size, batch_size):
+            end = min(start + batch_size, self._size)
+            values = []
+            for name in columns:
+                if name == 'name':
+                    values.append([self._name(i) for i in range(start, end)])
+                    continue
+                column = self._columns[name][start:end]
+                if name in CATEGORICAL_COLUMNS:
+                    categories = self._categories[name]
+                    values.append([categories[code] for code in column.tolist()])
+                elif name in DATE_DTYPES:
+                    text = np.datetime_as_string(column, unit='D' if DATE_FORMATS[name] == 10 else 's')
+                    values.append([None if value == 'NaT' else value.replace('T', ' ') for value in text.tolist()])
+                elif name in FLOAT_DIGITS:
+                    values.append(np.round(column.astype(np.float64), FLOAT_DIGITS[name]).tolist())
+                else:
+                    values.append(column.tolist())
+            yield list(zip(*values))
+
+    def to_db_rows(self, columns=EMPLOYEE_COLUMNS):
+        """返回全部行的元组列表"""
+        rows = []
+        for batch in self.iter_row_batches(columns, batch_size=100000):
+            rows.extend(batch)
+        return rows
+
+    def nbytes(self):
+        """已用行占用的字节数（含名字）"""
+        total = sum(column.itemsize * self._size for column in self._columns.values())
+        return total + len(self._name_blob) + self._name_offsets.itemsize * (self._size + 1)
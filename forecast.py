@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工规模蒙特卡洛预测脚本 (HR离职分析版)
+
+此脚本复用 daily_update.calculate_daily_changes 的每日变动模型，在内存中一次性模拟
+成千上万条相互独立的未来路径：
+- 基础入职/离职率、公司规模因子、星期与月份因子
+- ±20%随机波动，以及12月底离职、1月初入职的特殊调整
+- 所有路径以NumPy数组并行推进，每天只做一次向量化计算
+- 按日或按月输出在职人数、入职人数、离职人数的分位数区间
+- 模型参数可以逐项覆盖，用于情景分析
+"""
+
+import argparse
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import storage
+from daily_update import (
+    MONTH_HIRE_FACTOR,
+    MONTH_TERM_FACTOR,
+    WEEKDAY_HIRE_FACTOR,
+    WEEKDAY_TERM_FACTOR,
+    get_current_employee_count,
+    get_last_update_date
+)
+
+# 默认模型参数，与 calculate_daily_changes 中的取值保持一致
+DEFAULT_PARAMS = {
+    'base_hire_rate': 1.8,          # 每天每1000名员工入职人数
+    'base_term_rate': 1.5,          # 每天每1000名员工离职人数
+    # 公司规模因子，按顺序匹配第一条规则（与原 if/elif 的判断顺序相同）
+    'company_size_factors': [['>', 5000, 0.9], ['>', 10000, 0.8], ['<', 1000, 1.2]],
+    'weekday_hire_factor': WEEKDAY_HIRE_FACTOR,
+    'weekday_term_factor': WEEKDAY_TERM_FACTOR,
+    'month_hire_factor': MONTH_HIRE_FACTOR,
+    'month_term_factor': MONTH_TERM_FACTOR,
+    'noise': 0.2,                   # 随机波动幅度（±20%）
+    'min_change_headcount': 500,    # 超过此规模时每天至少一人入职、一人离职
+    'year_end_term_multiplier': 1.5,   # 12月25日之后的离职倍数
+    'new_year_hire_multiplier': 1.3    # 1月5日之前的入职倍数
+}
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def build_params(overrides=None):
+    """合并默认参数和情景覆盖参数"""
+    params = {key: (list(value) if isinstance(value, list) else value) for key, value in DEFAULT_PARAMS.items()}
+    for key, value in (overrides or {}).items():
+        if key not in DEFAULT_PARAMS:
+            raise KeyError(f"未知的模型参数: {key}")
+        params[key] = value
+    return params
+
+
+def company_size_factor(headcount, rules):
+    """向量化计算公司规模因子"""
+    conditions = []
+    choices = []
+    for op, threshold, factor in rules:
+        conditions.append(headcount > threshold if op == '>' else headcount < threshold)
+        choices.append(factor)
+    return np.select(conditions, choices, default=1.0)
+
+
+def run_forecast(initial_headcount, start_date, horizon_days, n_paths=10000, params=None, seed=None):
+    """模拟多条未来路径
+
+    返回字典，包含日期数组以及形状为 (天数, 路径数) 的 headcount / hires / exits 数组，
+    headcount 为当天变动之后的在职人数。
+    """
+    params = build_params(params)
+    rng = np.random.default_rng(seed)
+
+    dates = [start_date + timedelta(days=i) for i in range(horizon_days)]
+    weekday_hire = np.asarray(params['weekday_hire_factor'], dtype=np.float64)
+    weekday_term = np.asarray(params['weekday_term_factor'], dtype=np.float64)
+    month_hire = np.asarray(params['month_hire_factor'], dtype=np.float64)
+    month_term = np.asarray(params['month_term_factor'], dtype=np.float64)
+    low, high = 1 - params['noise'], 1 + params['noise']
+
+    headcount = np.full(n_paths, initial_headcount, dtype=np.int64)
+    headcount_out = np.empty((horizon_days, n_paths), dtype=np.int32)
+    hires_out = np.empty((horizon_days, n_paths), dtype=np.int32)
+    exits_out = np.empty((horizon_days, n_paths), dtype=np.int32)
+
+    for day, current in enumerate(dates):
+        size_factor = company_size_factor(headcount, params['company_size_factors'])
+        noise = rng.uniform(low, high, size=(2, n_paths))
+        weekday = current.weekday()
+        month = current.month - 1
+
+        hires = np.floor(headcount * params['base_hire_rate'] / 1000 * size_factor *
+                         weekday_hire[weekday] * month_hire[month] * noise[0])
+        exits = np.floor(headcount * params['base_term_rate'] / 1000 * size_factor *
+                         weekday_term[weekday] * month_term[month] * noise[1])
+
+        busy = headcount > params['min_change_headcount']
+        hires = np.where(busy, np.maximum(hires, 1), hires)
+        exits = np.where(busy, np.maximum(exits, 1), exits)
+
+        if current.month == 12 and current.day > 25:
+            exits = np.floor(exits * params['year_end_term_multiplier'])
+        if current.month == 1 and current.day < 5:
+            hires = np.floor(hires * params['new_year_hire_multiplier'])
+
+        # 离职人数不能超过当天的在职人数
+        exits = np.minimum(exits, headcount)
+        headcount = headcount + hires.astype(np.int64) - exits.astype(np.int64)
+
+        headcount_out[day] = headcount
+        hires_out[day] = hires
+        exits_out[day] = exits
+
+    return {
+        'dates': np.array(dates, dtype='datetime64[D]'),
+        'headcount': headcount_out,
+        'hires': hires_out,
+        'exits': exits_out
+    }
+
+
+def summarize_bands(result, freq='day', percentiles=DEFAULT_PERCENTILES):
+    """计算每日或每月的分位数区间
+
+    按月汇总时，入职和离职为当月合计，在职人数取月末值。
+    """
+    dates = result['dates']
+    headcount, hires, exits = result['headcount'], result['hires'], result['exits']
+
+    if freq == 'month':
+        months = dates.astype('datetime64[M]')
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        ends = np.r_[starts[1:], len(dates)] - 1
+        index = months[starts].astype(str)
+        headcount = headcount[ends]
+        hires = np.add.reduceat(hires, starts, axis=0)
+        exits = np.add.reduceat(exits, starts, axis=0)
+    elif freq == 'day':
+        index = dates.astype(str)
+    else:
+        raise ValueError(f"不支持的汇总频率: {freq}")
+
+    columns = {}
+    for name, values in (('headcount', headcount), ('hires', hires), ('exits', exits)):
+        bands = np.percentile(values, percentiles, axis=1)
+        for p, band in zip(percentiles, bands):
+            columns[f'{name}_p{p}'] = band
+        columns[f'{name}_mean'] = values.mean(axis=1)
+
+    return pd.DataFrame(columns, index=pd.Index(index, name=freq))
+
+
+def parse_override(item):
+    """argparse 的 type：解析一个 key=value 覆盖参数，value 按JSON解析，返回 (key, value)"""
+    key, _, value = item.partition('=')
+    if key not in DEFAULT_PARAMS:
+        raise argparse.ArgumentTypeError(f"未知的模型参数: {key}，可选: {', '.join(DEFAULT_PARAMS)}")
+    try:
+        return key, json.loads(value)
+    except json.JSONDecodeError:
+        raise argparse.ArgumentTypeError(f"无法解析参数值: {item}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='员工规模蒙特卡洛预测')
+    parser.add_argument('--paths', type=int, default=10000, help='模拟路径数')
+    parser.add_argument('--years', type=float, default=3, help='预测年数')
+    parser.add_argument('--days', type=int, help='预测天数（优先于 --years）')
+    parser.add_argument('--start-date', type=str, help='预测起始日期 (YYYY-MM-DD 格式)，默认为最后更新日期的次日')
+    parser.add_argument('--headcount', type=int, help='初始在职人数，默认从数据库读取')
+    parser.add_argument('--freq', choices=['day', 'month'], default='month', help='结果汇总频率')
+    parser.add_argument('--seed', type=int, help='随机种子')
+    parser.add_argument('--set', action='append', type=parse_override, metavar='KEY=VALUE',
+                        help='覆盖模型参数，例如 --set base_term_rate=1.8')
+    parser.add_argument('--output', type=str, help='结果保存为CSV文件')
+    storage.add_cli_arguments(parser)
+
+    args = parser.parse_args()
+    storage.configure_from_args(args)
+
+    if args.headcount is not None:
+        initial_headcount = args.headcount
+    else:
+        initial_headcount = get_current_employee_count()[0]
+        if not initial_headcount:
+            parser.error("无法从数据库获取在职人数，请使用 --headcount 指定")
+
+    if args.start_date:
+        start_date = datetime.strptime(args.start_date, '%Y-%m-%d').date()
+    else:
+        last_update = get_last_update_date() if args.headcount is None else None
+        start_date = (last_update or datetime.now().date()) + timedelta(days=1)
+
+    horizon_days = args.days or int(round(args.years * 365))
+
+    started = datetime.now()
+    result = run_forecast(initial_headcount, start_date, horizon_days, n_paths=args.paths,
+                          params=dict(args.set or []), seed=args.seed)
+    bands = summarize_bands(result, freq=args.freq)
+    elapsed = (datetime.now() - started).total_seconds()
+
+    print(f"初始在职人数: {initial_headcount}, 起始日期: {start_date}, "
+          f"预测 {horizon_days} 天 × {args.paths} 条路径, 用时 {elapsed:.2f} 秒")
+    print(bands.round(1).to_string())
+
+    if args.output:
+        bands.to_csv(args.output, encoding='utf-8-sig')
+        print(f"预测结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工任职历史事件生成器 (HR离职分析版)
+
+data.generate_employee_data 只生成每名员工的最终状态；流动与留任仪表板需要任职期间的变化过程。
+此脚本为每名员工生成入职日期到离职日期（在职员工到截止日期）之间按时间排序的事件流：
+- 事件类型：hire（入职）、survey（季度满意度调查）、review（年度绩效评估）、
+  project_change（项目数与工时变化）、promotion（晋升，薪资等级上调一级）、termination（离职）
+- 每条事件记录事件发生后的完整状态（部门、薪资等级、满意度、绩效、项目数、工时、离职概率）
+- 入职状态按 daily_update 的新员工分布抽样；之后的变化是从入职状态到最终状态的随机桥，
+  每类事件的最后一次取值等于员工表中的最终值，因此事件流的终点与员工表一致
+- 近5年有晋升的员工在最近5年内产生一次晋升事件；每条事件的离职概率按当时的状态和
+  工作年限用 calculate_turnover_probability_batch 计算
+- 流水线按员工分块处理：读取一块员工（数据库按员工ID分页、快照CSV分块读取）→ NumPy向量化生成事件
+  → 追加写入CSV和/或 employee_history 表，内存占用只取决于块大小，可生成数千万条事件
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import storage
+from storage import get_backend
+
+DEFAULT_OUTPUT = 'employee_history.csv'
+DEFAULT_CHUNK_SIZE = 10000    # 每块员工数
+SURVEY_INTERVAL_DAYS = 91     # 季度满意度调查
+REVIEW_INTERVAL_DAYS = 365    # 年度绩效评估
+PROJECT_CHANGES_PER_YEAR = 0.5
+PROMOTION_WINDOW_DAYS = 5 * 365
+SALARY_ORDER = ['low', 'medium', 'high']
+
+# 同一天的多条事件按此顺序排列
+EVENT_TYPES = ['hire', 'survey', 'review', 'project_change', 'promotion', 'termination']
+# 随机桥中间点的波动幅度
+DRIFT = {
+    'satisfaction_level': 0.12,
+    'last_evaluation': 0.08,
+    'number_project': 1.0
+}
+
+# 输入：员工表中生成历史所需的列
+SOURCE_COLUMNS = [
+    'employee_id', 'department', 'salary_level', 'left', 'satisfaction_level', 'last_evaluation',
+    'number_project', 'average_monthly_hours', 'Work_accident', 'promotion_last_5years',
+    'hire_date', 'termination_date'
+]
+# 输出：每条事件及事件后的状态
+HISTORY_COLUMNS = [
+    'event_id', 'employee_id', 'event_date', 'event_type', 'department', 'salary_level',
+    'satisfaction_level', 'last_evaluation', 'number_project', 'average_monthly_hours',
+    'promotion_last_5years', 'turnover_probability'
+]
+STATE_COLUMNS = ['salary_code', 'satisfaction_level', 'last_evaluation', 'number_project',
+                 'average_monthly_hours', 'promotion_last_5years']
+
+
+def _to_days(values):
+    """日期（字符串/日期/datetime64）转为天数，缺失值为 -1"""
+    days = pd.to_datetime(pd.Series(values)).to_numpy().astype('datetime64[D]')
+    return np.where(np.isnat(days), -1, days.astype(np.int64))
+
+
+def _group_positions(counts):
+    """按组重复的序号：counts=[2, 3] -> owner=[0, 0, 1, 1, 1]，k=[1, 2, 1, 2, 3]"""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    return owner, k
+
+
+def _bridge(rng, start, end, fraction, drift, low, high, digits=None):
+    """从 start 到 end 的随机桥：fraction 为1时恰好等于 end"""
+    values = start + (end - start) * fraction + drift * np.sqrt(fraction * (1 - fraction)) * rng.standard_normal(len(fraction))
+    values = np.clip(values, low, high)
+    values = np.round(values, digits) if digits is not None else np.round(values)
+    # 最后一次取最终值本身（最终值可能超出生成范围，不裁剪）
+    return np.where(fraction >= 1, end, values)
+
+
+class _Events:
+    """一块员工的事件，各列为等长数组，未设置的状态为 NaN（之后按员工向前填充）"""
+
+    def __init__(self):
+        self.parts = []
+
+    def add(self, owner, days, event_type, **state):
+        part = {'owner': owner, 'day': days, 'type': np.full(len(owner), EVENT_TYPES.index(event_type))}
+        for column in STATE_COLUMNS:
+            part[column] = np.asarray(state[column], dtype=np.float64) if column in state else np.full(len(owner), np.nan)
+        self.parts.append(part)
+
+    def combine(self):
+        events = {key: np.concatenate([part[key] for part in self.parts]) for key in self.parts[0]}
+        order = np.lexsort((events['type'], events['day'], events['owner']))
+        events = {key: values[order] for key, values in events.items()}
+        # 每名员工的第一条事件是入职（各列都有值），向前填充不会跨员工
+        positions = np.arange(len(order))
+        for column in STATE_COLUMNS:
+            filled = np.where(np.isnan(events[column]), 0, positions)
+            events[column] = events[column][np.maximum.accumulate(filled)]
+        return events
+
+
+def generate_chunk(employees, as_of, rng):
+    """为一块员工生成事件，employees 为 {列名: 数组}，返回事件 DataFrame（不含 event_id）"""
+    from daily_update import calculate_turnover_probability_batch
+
+    n = len(employees['employee_id'])
+    hire = _to_days(employees['hire_date'])
+    termination = _to_days(employees['termination_date'])
+    left = np.asarray(employees['left']) == 1
+    end = np.where(left & (termination >= 0), termination, as_of.toordinal() - date(1970, 1, 1).toordinal())
+    span = np.maximum(end - hire, 0)
+
+    final = {
+        'satisfaction_level': np.asarray(employees['satisfaction_level'], dtype=np.float64),
+        'last_evaluation': np.asarray(employees['last_evaluation'], dtype=np.float64),
+        'number_project': np.asarray(employees['number_project'], dtype=np.float64),
+        'average_monthly_hours': np.asarray(employees['average_monthly_hours'], dtype=np.float64)
+    }
+    salary_final = np.array([SALARY_ORDER.index(level) for level in employees['salary_level']], dtype=np.float64)
+    promoted = np.asarray(employees['promotion_last_5years']) == 1
+    events = _Events()
+
+    # 季度满意度调查、年度绩效评估：从入职状态到最终值的随机桥，最后一次等于最终值
+    surveys = span // SURVEY_INTERVAL_DAYS
+    reviews = span // REVIEW_INTERVAL_DAYS
+    satisfaction_start = np.where(surveys > 0, np.clip(rng.beta(5, 2, n) * 0.85 + 0.15, 0.1, 1.0).round(2),
+                                  final['satisfaction_level'])
+    evaluation_start = np.where(reviews > 0, np.clip(rng.beta(7, 3, n) * 0.7 + 0.35, 0.36, 1.0).round(2),
+                                final['last_evaluation'])
+    owner, k = _group_positions(surveys)
+    events.add(owner, hire[owner] + k * SURVEY_INTERVAL_DAYS, 'survey', satisfaction_level=_bridge(
+        rng, satisfaction_start[owner], final['satisfaction_level'][owner], k / surveys[owner],
+        DRIFT['satisfaction_level'], 0.1, 1.0, digits=2))
+    owner, k = _group_positions(reviews)
+    events.add(owner, hire[owner] + k * REVIEW_INTERVAL_DAYS, 'review', last_evaluation=_bridge(
+        rng, evaluation_start[owner], final['last_evaluation'][owner], k / reviews[owner],
+        DRIFT['last_evaluation'], 0.36, 1.0, digits=2))
+
+    # 项目变化：次数服从泊松分布，日期在任职期间均匀分布；工时随项目数变化（与新员工的工时规则相同）
+    changes = rng.poisson(PROJECT_CHANGES_PER_YEAR * span / 365)
+    changes = np.where(span > 1, changes, 0)
+    projects_start = np.where(changes > 0, rng.choice([2, 3, 3, 3, 4], n), final['number_project'])
+    hours_start = np.where(changes > 0, np.clip(rng.normal(201, 25, n).astype(np.int64)
+                                                + (projects_start - 3) * 8, 150, 250), final['average_monthly_hours'])
+    owner, k = _group_positions(changes)
+    # 组内排序：加上按员工递增的偏移后整体排序一次，再减去偏移
+    offsets = np.sort(rng.integers(1, np.maximum(span[owner], 2)) + owner * 10**6) - owner * 10**6
+    projects = _bridge(rng, projects_start[owner], final['number_project'][owner], k / changes[owner],
+                       DRIFT['number_project'], 2, 7)
+    hours = np.clip(rng.normal(201, 25, len(owner)).astype(np.int64) + (projects - 3) * 8, 150, 250)
+    last = k == changes[owner]
+    events.add(owner, hire[owner] + offsets, 'project_change', number_project=projects,
+               average_monthly_hours=np.where(last, final['average_monthly_hours'][owner], hours))
+
+    # 晋升：最近5年内的某一天，入职时的薪资等级比最终等级低一级（最终为 low 时不变）
+    salary_start = np.where(promoted, np.maximum(salary_final - 1, 0), salary_final)
+    owner = np.flatnonzero(promoted)
+    window_start = np.maximum(hire[owner], end[owner] - PROMOTION_WINDOW_DAYS)
+    promotion_day = window_start + (rng.random(len(owner)) * np.maximum(end[owner] - window_start, 0)).astype(np.int64)
+    events.add(owner, promotion_day, 'promotion', salary_code=salary_final[owner], promotion_last_5years=np.ones(len(owner)))
+
+    # 入职与离职：离职事件记录员工表中的最终状态
+    owner = np.arange(n)
+    events.add(owner, hire, 'hire', salary_code=salary_start, satisfaction_level=satisfaction_start,
+               last_evaluation=evaluation_start, number_project=projects_start,
+               average_monthly_hours=hours_start, promotion_last_5years=np.zeros(n))
+    owner = np.flatnonzero(left & (termination >= 0))
+    events.add(owner, termination[owner], 'termination', salary_code=salary_final[owner],
+               promotion_last_5years=promoted[owner].astype(np.float64),
+               **{column: values[owner] for column, values in final.items()})
+
+    combined = events.combine()
+    owner = combined['owner']
+    years = np.maximum(combined['day'] - hire[owner], 0) // 365
+    score = calculate_turnover_probability_batch(
+        combined['satisfaction_level'], combined['last_evaluation'], combined['number_project'],
+        combined['average_monthly_hours'], years, np.asarray(employees['Work_accident'])[owner],
+        combined['promotion_last_5years'])
+    return pd.DataFrame({
+        'employee_id': np.asarray(employees['employee_id'], dtype=np.int64)[owner],
+        'event_date': np.datetime_as_string(combined['day'].astype('datetime64[D]')),
+        'event_type': np.array(EVENT_TYPES, dtype=object)[combined['type']],
+        'department': np.asarray(employees['department'], dtype=object)[owner],
+        'salary_level': np.array(SALARY_ORDER, dtype=object)[combined['salary_code'].astype(np.int64)],
+        'satisfaction_level': combined['satisfaction_level'],
+        'last_evaluation': combined['last_evaluation'],
+        'number_project': combined['number_project'].astype(np.int64),
+        'average_monthly_hours': combined['average_monthly_hours'].astype(np.int64),
+        'promotion_last_5years': combined['promotion_last_5years'].astype(np.int64),
+        'turnover_probability': np.round(score, 3)
+    })
+
+
+# ---- 输入 ----
+
+def iter_table_chunks(conn, chunk_size=DEFAULT_CHUNK_SIZE):
+    """按员工ID分页读取员工表，每次一块，不持有长时间打开的游标"""
+    backend = get_backend()
+    columns = ', '.join(backend.quote(column) for column in SOURCE_COLUMNS)
+    last_id = -1
+    while True:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {columns} FROM employees WHERE employee_id > %s "
+                           f"ORDER BY employee_id LIMIT %s", (last_id, chunk_size))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not rows:
+            return
+        yield dict(zip(SOURCE_COLUMNS, (np.array(values, dtype=object) for values in zip(*rows))))
+        last_id = rows[-1][0]
+
+
+def iter_snapshot_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """分块读取快照CSV"""
+    for frame in pd.read_csv(path, usecols=SOURCE_COLUMNS, chunksize=chunk_size, encoding='utf-8-sig'):
+        yield {column: frame[column].to_numpy() for column in SOURCE_COLUMNS}
+
+
+def iter_store_chunks(store, chunk_size=DEFAULT_CHUNK_SIZE):
+    """按块切分 EmployeeStore（分类列解码为标签）"""
+    for start in range(0, len(store), chunk_size):
+        chunk = {}
+        for column in SOURCE_COLUMNS:
+            values = store.column(column)[start:start + chunk_size]
+            if column in ('department', 'salary_level'):
+                values = np.asarray(store.categories(column), dtype=object)[values]
+            chunk[column] = values
+        yield chunk
+
+
+def latest_update_date(conn):
+    """last_update 中最近的更新日期，没有记录时为 None"""
+    if not get_backend().table_exists(conn, 'last_update'):
+        return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(update_date) FROM last_update")
+        value = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    return date.fromisoformat(str(value)[:10]) if value else None
+
+
+# ---- 流水线 ----
+
+def generate_history(chunks, as_of, seed=0):
+    """逐块生成事件，产出带全局递增 event_id 的 DataFrame"""
+    next_id = 1
+    for index, employees in enumerate(chunks):
+        if not len(employees['employee_id']):
+            continue
+        # 每块独立的随机数流：结果只取决于种子和分块，不受全局随机数状态影响
+        frame = generate_chunk(employees, as_of, np.random.default_rng([seed, index]))
+        frame.insert(0, 'event_id', np.arange(next_id, next_id + len(frame), dtype=np.int64))
+        next_id += len(frame)
+        yield frame
+
+
+def write_history(frames, output=None, conn=None, replace=True):
+    """把事件块追加写入CSV和/或 employee_history 表，返回 (事件数, 员工数)"""
+    backend = get_backend()
+    if conn is not None:
+        backend.ensure_table(conn, 'employee_history')
+        if replace:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("DELETE FROM employee_history")
+            finally:
+                cursor.close()
+            conn.commit()
+    if output and os.path.exists(output):
+        os.remove(output)
+
+    total_events = total_employees = 0
+    for frame in frames:
+        if output:
+            frame.to_csv(output, mode='a', header=not total_events, index=False, encoding='utf-8')
+        if conn is not None:
+            rows = list(frame.astype(object).itertuples(index=False, name=None))
+            backend.bulk_insert(conn, 'employee_history', HISTORY_COLUMNS, rows, batch_size=5000)
+            conn.commit()
+        total_events += len(frame)
+        total_employees += frame['employee_id'].nunique()
+        logging.info(f"已写入 {total_employees} 名员工的 {total_events} 条事件")
+    return total_events, total_employees
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='生成员工任职历史事件')
+    parser.add_argument('--snapshot', type=str, help='从员工快照CSV读取，默认从数据库读取')
+    parser.add_argument('--output', type=str, help=f'事件CSV文件（未指定 --to-db 时默认为 {DEFAULT_OUTPUT}）')
+    parser.add_argument('--to-db', action='store_true', help='写入 employee_history 表（替换原有内容）')
+    parser.add_argument('--as-of', type=date.fromisoformat,
+                        help='在职员工的截止日期 (YYYY-MM-DD)，默认为最近的更新日期或今天')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每块处理的员工数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    storage.add_cli_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage.configure_from_args(args)
+    output = args.output or (None if args.to_db else DEFAULT_OUTPUT)
+
+    conn = get_backend().connect() if (args.to_db or not args.snapshot) else None
+    try:
+        as_of = args.as_of or (latest_update_date(conn) if conn is not None and not args.snapshot else None) \
+            or date.today()
+        chunks = (iter_snapshot_chunks(args.snapshot, args.chunk_size) if args.snapshot
+                  else iter_table_chunks(conn, args.chunk_size))
+        start = time.perf_counter()
+        events, employees = write_history(generate_history(chunks, as_of, seed=args.seed), output=output,
+                                          conn=conn if args.to_db else None)
+    finally:
+        if conn is not None:
+            conn.close()
+    elapsed = time.perf_counter() - start
+    logging.info(f"完成：{employees} 名员工，{events} 条事件（截止 {as_of}），耗时 {elapsed:.1f} 秒"
+                 f"（{events / max(elapsed, 1e-9):,.0f} 条/秒）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
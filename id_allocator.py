@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工ID分配 (HR离职分析版)
+
+用数据库中的序列表 id_sequences 分配员工ID，取代 "先 SELECT MAX(employee_id) 再加一"：
+- 每次分配用一条原子 UPDATE 把序列前移一整块，多个写入进程并发运行时各自得到不重叠的区间
+- IdAllocator 在进程内缓存已预留的区间，一块用完才再访问数据库；预留的ID未使用时留下空缺，不会重复
+- ID为64位整数（employees.employee_id 为 BIGINT），可以容纳数百万以上的员工
+- sample_ids() 用NumPy一次生成大量不重复的随机ID，供 data.py 批量生成数据使用
+- 序列首次使用时从员工表的最大ID之后开始；data.py 导入数据后调用 sync_sequence() 使序列跳过已导入的ID
+
+注意：已有的MySQL员工表需要执行一次
+ALTER TABLE employees MODIFY employee_id BIGINT 才能使用超过 INT 范围的ID。
+"""
+
+import argparse
+import logging
+import random
+import sys
+import threading
+
+import numpy as np
+
+import storage
+from storage import get_backend
+
+DEFAULT_SEQUENCE = 'employee_id'
+ID_START = 1000
+LEGACY_ID_END = 100000       # data.py 原来的ID区间上限，员工数量不超过时保持原来的ID分布
+DEFAULT_BLOCK_SIZE = 1000
+MAX_ID = np.iinfo(np.int64).max
+
+# 序列对应的 (表, 列, 表为空时的初始值)，用于确定序列的初始值；event_seq 为变更事件的序号（change_log.py）
+SEQUENCE_COLUMNS = {
+    'employee_id': ('employees', 'employee_id', ID_START),
+    'event_seq': ('employee_events', 'seq', 1)
+}
+
+
+def sample_ids(count, low=ID_START, high=None, seed=None):
+    """一次生成 count 个 [low, high) 内不重复的随机ID（int64数组）
+
+    high 默认为 max(LEGACY_ID_END, low + count)；未指定 seed 时从 random 模块取种子，
+    使 random.seed() 仍能复现生成结果。
+    """
+    high = high if high is not None else max(LEGACY_ID_END, low + count)
+    if high - low < count:
+        raise ValueError(f"ID区间 [{low}, {high}) 不足 {count} 个")
+    if high - 1 > MAX_ID:
+        raise ValueError("ID超出64位整数范围")
+    rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+    return rng.choice(high - low, size=count, replace=False) + np.int64(low)
+
+
+def _max_column_value(conn, name):
+    table, column, _ = SEQUENCE_COLUMNS[name]
+    if not get_backend().table_exists(conn, table):
+        return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT MAX({column}) FROM {table}")
+        value = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    return int(value) if value is not None else None
+
+
+def ensure_sequence(conn, name=DEFAULT_SEQUENCE):
+    """序列不存在时创建，初始值为对应列的最大值加一（表为空时为该序列的初始值，员工ID为 ID_START）"""
+    backend = get_backend()
+    backend.ensure_table(conn, 'id_sequences')
+    start = SEQUENCE_COLUMNS[name][2]
+    max_value = _max_column_value(conn, name)
+    backend.init_sequence(conn, name, max(start, max_value + 1 if max_value is not None else start))
+
+
+def reserve_block(conn, count, name=DEFAULT_SEQUENCE):
+    """在调用方的事务中预留 count 个连续ID，返回第一个ID"""
+    backend = get_backend()
+    next_value = backend.reserve_sequence(conn, name, count) if backend.table_exists(conn, 'id_sequences') else None
+    if next_value is None:
+        ensure_sequence(conn, name)
+        next_value = backend.reserve_sequence(conn, name, count)
+    return next_value - count
+
+
+def sync_sequence(conn, name=DEFAULT_SEQUENCE):
+    """使序列的 next_value 大于对应列的最大值（在外部批量写入ID之后调用），返回 next_value"""
+    ensure_sequence(conn, name)
+    max_value = _max_column_value(conn, name)
+    cursor = conn.cursor()
+    try:
+        if max_value is not None:
+            cursor.execute("UPDATE id_sequences SET next_value = %s WHERE name = %s AND next_value <= %s",
+                           (max_value + 1, name, max_value))
+    finally:
+        cursor.close()
+    return current_value(conn, name)
+
+
+def current_value(conn, name=DEFAULT_SEQUENCE):
+    """返回序列的 next_value（不预留）"""
+    ensure_sequence(conn, name)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT next_value FROM id_sequences WHERE name = %s", (name,))
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+class IdAllocator:
+    """进程内的ID分配器：按块从序列预留ID，块内分配不访问数据库（线程安全）"""
+
+    def __init__(self, name=DEFAULT_SEQUENCE, block_size=DEFAULT_BLOCK_SIZE):
+        self.name = name
+        self.block_size = max(1, block_size)
+        self._next = 0
+        self._limit = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, count):
+        """用独立连接预留并立即提交，不把序列行锁带入调用方的事务"""
+        conn = get_backend().connect()
+        try:
+            first = reserve_block(conn, count, self.name)
+            conn.commit()
+        finally:
+            conn.close()
+        return first
+
+    def allocate(self, count):
+        """分配 count 个ID，返回 int64 数组（先用完缓存的区间，不足部分一次预留）"""
+        if count <= 0:
+            return np.empty(0, dtype=np.int64)
+        with self._lock:
+            cached = min(count, self._limit - self._next)
+            parts = [np.arange(self._next, self._next + cached, dtype=np.int64)]
+            self._next += cached
+            missing = count - cached
+            if missing:
+                size = max(self.block_size, missing)
+                first = self._reserve(size)
+                parts.append(np.arange(first, first + missing, dtype=np.int64))
+                self._next, self._limit = first + missing, first + size
+        return np.concatenate(parts) if cached else parts[-1]
+
+    def next_id(self):
+        """分配一个ID"""
+        return int(self.allocate(1)[0])
+
+
+def main():
+    """主函数：查看序列，或预留一批ID"""
+    parser = argparse.ArgumentParser(description='员工ID序列')
+    parser.add_argument('--reserve', type=int, help='预留指定数量的ID并输出区间')
+    parser.add_argument('--sync', action='store_true', help='使序列跳过员工表中已有的最大ID')
+    parser.add_argument('--name', type=str, default=DEFAULT_SEQUENCE, choices=sorted(SEQUENCE_COLUMNS),
+                        help='序列名')
+    storage.add_cli_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage.configure_from_args(args)
+
+    conn = get_backend().connect()
+    try:
+        if args.reserve:
+            first = reserve_block(conn, args.reserve, args.name)
+            conn.commit()
+            logging.info(f"已预留 {args.name}: {first} - {first + args.reserve - 1}")
+        else:
+            next_value = sync_sequence(conn, args.name) if args.sync else current_value(conn, args.name)
+            conn.commit()
+            logging.info(f"序列 {args.name} 的下一个ID: {next_value}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
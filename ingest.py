@@ -0,0 +1,520 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日内入职/离职小批量导入 (HR离职分析版)
+
+daily_update 每个日历日只生成一批模拟变动；上游HR系统导出的入职、离职文件则全天陆续到达。此脚本：
+- 监视本地投递目录（默认 hr_drop/）中的 .csv / .jsonl 文件（上游应先写临时文件再改名，
+  以 . 开头或以 .tmp/.part 结尾的文件会被忽略）
+- 认领文件（移入 processing/）后逐条解析和校验：事件类型、日期、部门和薪资等级、数值范围、
+  薪资区间；离职只能针对在职员工且晚于入职日期，重复的员工ID拒绝；不合格的记录写入
+  rejected/<文件名>.rejected.jsonl 并注明原因，其余记录照常导入
+- 组提交：多个文件的记录合并在一个事务中写入，记录数达到 --max-batch 或最早认领的文件
+  等待超过 --max-latency 秒时提交，不为每条记录单独开事务
+- 同一事务中更新员工表（含 last_updated）、写入变更事件、增量更新分位数草图和分层样本并记录文件校验和；
+  提交后文件移入 done/。不写 last_update：当晚的 daily_update 照常运行，分析副本的延迟水位也不受影响，
+  metrics_api 通过变更事件的最新序号发现导入的数据
+- 每批提交期间持有每日更新锁（daily_update.UPDATE_LOCK_NAME），与 daily_update、restore 等写入进程互斥；
+  锁被占用时保留已认领的文件，稍后重试
+- 按文件校验和去重：重复投递的文件不会重复导入；进程中断后重启，processing/ 中的文件重新处理，
+  已提交过的直接移入 done/
+- 新员工未给出ID时从ID序列（id_allocator.py）按块预留
+
+记录字段：event_type（hire/termination）、event_date、employee_id（离职必填，入职可选），
+入职另需 name、department、salary_level、actual_salary、satisfaction_level、last_evaluation、
+number_project、average_monthly_hours，可选 Work_accident、promotion_last_5years（默认0）。
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from datetime import date, datetime
+
+import approx_query
+import change_log
+import id_allocator
+import quantile_sketch
+import storage
+from storage import DB_ERRORS, EMPLOYEE_COLUMNS, get_backend
+from validation import CATEGORY_DOMAINS, VALUE_RANGES
+
+DEFAULT_DROP_DIR = 'hr_drop'
+PROCESSING_DIR = 'processing'
+DONE_DIR = 'done'
+REJECTED_DIR = 'rejected'
+DEFAULT_MAX_BATCH = 5000      # 每个事务最多的记录数（至少包含一个完整文件）
+DEFAULT_MAX_LATENCY = 2.0     # 秒，文件认领后最长等待多久提交
+DEFAULT_POLL_INTERVAL = 0.2   # 秒，扫描投递目录的间隔
+RETRY_INTERVAL = 5.0          # 秒，提交失败后重试的间隔
+LOOKUP_BATCH_SIZE = 1000      # IN (...) 查询每次的ID数
+FILE_SUFFIXES = ('.csv', '.jsonl')
+IGNORED_SUFFIXES = ('.tmp', '.part')
+
+# 入职记录的必填字段及类型
+HIRE_FIELDS = {
+    'name': str,
+    'department': str,
+    'salary_level': str,
+    'actual_salary': int,
+    'satisfaction_level': float,
+    'last_evaluation': float,
+    'number_project': int,
+    'average_monthly_hours': int
+}
+# 入职记录的可选字段及默认值
+OPTIONAL_FIELDS = {'Work_accident': 0, 'promotion_last_5years': 0}
+TYPE_NAMES = {str: '文本', int: '整数', float: '数值'}
+# 离职员工需要读取的列：校验状态、从分位数草图中移除
+EXIT_COLUMNS = ['employee_id', 'left', 'hire_date', 'department', 'salary_level', *quantile_sketch.SKETCH_COLUMNS]
+
+_stopping = False
+
+
+# ---- 解析与校验 ----
+
+def _value(raw, field):
+    value = raw.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value in (None, '') else value
+
+
+def _convert(raw, field, convert):
+    value = _value(raw, field)
+    if value is None:
+        raise ValueError(f"缺少字段 {field}")
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"字段 {field} 不是有效的{TYPE_NAMES[convert]}: {value!r}")
+
+
+def parse_record(raw):
+    """把一条原始记录转换为入职/离职记录，不合格时抛出 ValueError"""
+    event_type = str(_value(raw, 'event_type') or '').lower()
+    if event_type not in (change_log.EVENT_HIRE, change_log.EVENT_TERMINATION):
+        raise ValueError(f"未知的事件类型: {event_type!r}")
+    try:
+        event_date = date.fromisoformat(str(_value(raw, 'event_date'))[:10])
+    except ValueError:
+        raise ValueError(f"event_date 不是有效的日期: {_value(raw, 'event_date')!r}")
+    employee_id = _value(raw, 'employee_id')
+    record = {'event_type': event_type, 'event_date': event_date}
+    if event_type == change_log.EVENT_TERMINATION or employee_id is not None:
+        record['employee_id'] = _convert(raw, 'employee_id', int)
+    else:
+        record['employee_id'] = None
+    if event_type == change_log.EVENT_TERMINATION:
+        return record
+
+    for field, convert in HIRE_FIELDS.items():
+        record[field] = _convert(raw, field, convert)
+    for field, default in OPTIONAL_FIELDS.items():
+        record[field] = _convert(raw, field, int) if _value(raw, field) is not None else default
+        if record[field] not in (0, 1):
+            raise ValueError(f"{field} 只能为0或1: {record[field]}")
+    for field, domain in CATEGORY_DOMAINS.items():
+        if record[field] not in domain:
+            raise ValueError(f"{field} 不在预设类别内: {record[field]!r}")
+    for field in HIRE_FIELDS:
+        if field in VALUE_RANGES:
+            low, high = VALUE_RANGES[field]
+            if not low <= record[field] <= high:
+                raise ValueError(f"{field} 超出范围 [{low}, {high}]: {record[field]}")
+    from daily_update import SALARY_RANGES
+
+    salary_range = SALARY_RANGES[record['salary_level']]
+    if not salary_range['min'] * 1000 <= record['actual_salary'] <= salary_range['max'] * 1000:
+        raise ValueError(f"actual_salary 不在 {record['salary_level']} 的薪资区间内: {record['actual_salary']}")
+    record['satisfaction_level'] = round(record['satisfaction_level'], 2)
+    record['last_evaluation'] = round(record['last_evaluation'], 2)
+    return record
+
+
+def read_file(path):
+    """读取投递文件，返回 (合格记录 [(行号, 原始记录, 记录)], 拒绝记录 [(行号, 原始记录, 原因)])"""
+    records, rejects = [], []
+
+    def add(line, raw):
+        try:
+            records.append((line, raw, parse_record(raw)))
+        except ValueError as e:
+            rejects.append((line, raw, str(e)))
+
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if path.endswith('.csv'):
+            reader = csv.DictReader(f)
+            for raw in reader:
+                add(reader.line_num, raw)
+        else:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    raw = json.loads(text)
+                except json.JSONDecodeError as e:
+                    rejects.append((line, text.strip(), f"JSON格式错误: {e.msg}"))
+                    continue
+                if isinstance(raw, dict):
+                    add(line, raw)
+                else:
+                    rejects.append((line, raw, "记录应为JSON对象"))
+    return records, rejects
+
+
+class PendingFile:
+    """已认领、等待提交的投递文件"""
+
+    def __init__(self, path, claimed_at):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.claimed_at = claimed_at
+        with open(path, 'rb') as f:
+            self.checksum = hashlib.sha256(f.read()).hexdigest()
+        self.records, self.rejects = read_file(path)
+        self.total = len(self.records) + len(self.rejects)
+
+
+# ---- 写入数据库 ----
+
+def _years_between(start, end):
+    """整年数，与 TIMESTAMPDIFF(YEAR, ...) 一致，未来日期为0"""
+    years = end.year - start.year - ((end.month, end.day) < (start.month, start.day))
+    return max(0, years)
+
+
+def new_employee_row(record, employee_id, now):
+    """由入职记录生成员工表的一行（字典）"""
+    from daily_update import calculate_turnover_probability
+
+    years = _years_between(record['event_date'], date.today())
+    turnover_prob = calculate_turnover_probability(
+        record['satisfaction_level'], record['last_evaluation'], record['number_project'],
+        record['average_monthly_hours'], years, record['Work_accident'], record['promotion_last_5years']
+    )
+    return {
+        **{field: record[field] for field in [*HIRE_FIELDS, *OPTIONAL_FIELDS]},
+        'employee_id': employee_id,
+        'left': 0,
+        'time_spend_company': years,
+        'hire_date': record['event_date'].isoformat(),
+        'termination_date': None,
+        'turnover_probability': round(turnover_prob, 3),
+        'last_updated': now
+    }
+
+
+def _select_in(conn, table, columns, key, values):
+    """按 key IN (...) 分批查询，返回行的列表"""
+    backend = get_backend()
+    values = list(dict.fromkeys(values))
+    rows = []
+    cursor = conn.cursor()
+    try:
+        for i in range(0, len(values), LOOKUP_BATCH_SIZE):
+            chunk = values[i:i + LOOKUP_BATCH_SIZE]
+            cursor.execute(f"SELECT {', '.join(backend.quote(c) for c in columns)} FROM {table} "
+                           f"WHERE {backend.quote(key)} IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+            rows.extend(cursor.fetchall())
+    finally:
+        cursor.close()
+    return rows
+
+
+def apply_batch(conn, files, allocator):
+    """在一个事务中导入一批文件并提交，返回 {'hires', 'exits', 'rejected', 'skipped'}
+
+    已导入过的文件（按校验和）跳过；不合格的记录追加到对应文件的 rejects。
+    """
+    backend = get_backend()
+    hire_type, exit_type = change_log.EVENT_HIRE, change_log.EVENT_TERMINATION
+
+    # 1. 先为未给出ID的新员工预留ID：预留用独立连接提交，须在本事务写入之前完成
+    missing = sum(1 for f in files for _, _, r in f.records if r['event_type'] == hire_type and r['employee_id'] is None)
+    new_ids = iter(allocator.allocate(missing).tolist())
+
+    # 2. 已导入过的文件（重复投递，或上次提交后、移动文件前中断）
+    imported = {row[0] for row in _select_in(conn, 'ingested_files', ['file_checksum'], 'file_checksum',
+                                             [f.checksum for f in files])}
+    batch, skipped = [], []
+    for f in files:
+        (skipped if f.checksum in imported else batch).append(f)
+        imported.add(f.checksum)
+    if not batch:
+        conn.rollback()
+        return {'hires': 0, 'exits': 0, 'rejected': 0, 'skipped': skipped}
+
+    # 3. 查询离职员工的当前状态和已被占用的新员工ID
+    records = [(f, line, raw, r) for f in batch for line, raw, r in f.records]
+    current = {
+        int(row[0]): dict(zip(EXIT_COLUMNS, row))
+        for row in _select_in(conn, 'employees', EXIT_COLUMNS, 'employee_id',
+                              [r['employee_id'] for *_, r in records if r['event_type'] == exit_type])
+    }
+    taken = {int(row[0]) for row in _select_in(conn, 'employees', ['employee_id'], 'employee_id',
+                                               [r['employee_id'] for *_, r in records
+                                                if r['event_type'] == hire_type and r['employee_id'] is not None])}
+
+    # 4. 按记录顺序处理；同一批中先入职后离职的员工直接以离职状态插入
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    hires, exits, events = {}, {}, []
+    explicit_ids = False
+    for f, line, raw, r in records:
+        emp_id = r['employee_id']
+        date_str = r['event_date'].isoformat()
+        if r['event_type'] == hire_type:
+            if emp_id is None:
+                emp_id = next(new_ids)
+            if emp_id in taken or emp_id in hires:
+                f.rejects.append((line, raw, f"员工ID {emp_id} 已存在"))
+                continue
+            explicit_ids |= r['employee_id'] is not None
+            hires[emp_id] = new_employee_row(r, emp_id, now)
+            events.append((hire_type, emp_id, date_str,
+                           {column: hires[emp_id][column] for column in EMPLOYEE_COLUMNS if column != 'employee_id'}))
+            continue
+        row = hires.get(emp_id) or current.get(emp_id)
+        if row is None:
+            f.rejects.append((line, raw, f"员工 {emp_id} 不存在"))
+        elif row['left'] == 1 or emp_id in exits:
+            f.rejects.append((line, raw, f"员工 {emp_id} 已离职"))
+        elif date_str <= str(row['hire_date'])[:10]:
+            f.rejects.append((line, raw, "离职日期必须晚于入职日期"))
+        else:
+            exits[emp_id] = (dict(row), date_str)
+            if emp_id in hires:
+                hires[emp_id].update({'left': 1, 'termination_date': date_str, 'turnover_probability': 1.0})
+            events.append((exit_type, emp_id, date_str,
+                           {'left': 1, 'termination_date': date_str, 'turnover_probability': 1.0}))
+
+    # 5. 写入：员工表、变更事件、分位数草图、分层样本、文件登记，一次提交
+    backend.bulk_insert(conn, 'employees', EMPLOYEE_COLUMNS,
+                        [tuple(emp[column] for column in EMPLOYEE_COLUMNS) for emp in hires.values()])
+    backend.bulk_update(
+        conn, 'employees', 'employee_id', ['left', 'termination_date', 'last_updated', 'turnover_probability'],
+        [(emp_id, 1, date_str, now, 1.0) for emp_id, (_, date_str) in exits.items() if emp_id not in hires]
+    )
+    if explicit_ids:
+        id_allocator.sync_sequence(conn)
+    change_log.record_events(conn, events)
+    quantile_sketch.update_sketches(conn, list(hires.values()), [row for row, _ in exits.values()])
+    approx_query.update_samples(conn, list(hires.values()), [row for row, _ in exits.values()])
+    backend.bulk_insert(conn, 'ingested_files', ['file_checksum', 'file_name', 'record_count', 'rejected_count',
+                                                 'ingested_at'],
+                        [(f.checksum, f.name, f.total, len(f.rejects), now) for f in batch])
+    conn.commit()
+    return {
+        'hires': len(hires),
+        'exits': len(exits),
+        'rejected': sum(len(f.rejects) for f in batch),
+        'skipped': skipped
+    }
+
+
+# ---- 投递目录 ----
+
+class Ingestor:
+    """监视投递目录，按组提交导入"""
+
+    def __init__(self, drop_dir=DEFAULT_DROP_DIR, max_batch=DEFAULT_MAX_BATCH, max_latency=DEFAULT_MAX_LATENCY,
+                 lock_timeout=0):
+        self.drop_dir = drop_dir
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.lock_timeout = lock_timeout
+        self.allocator = id_allocator.IdAllocator()
+        self.pending = []
+        self.conn = None
+        self.totals = {'files': 0, 'hires': 0, 'exits': 0, 'rejected': 0, 'batches': 0}
+        for sub in (PROCESSING_DIR, DONE_DIR, REJECTED_DIR):
+            os.makedirs(os.path.join(drop_dir, sub), exist_ok=True)
+
+    def _move(self, path, sub):
+        """移动到子目录，重名时加上时间后缀"""
+        target = os.path.join(self.drop_dir, sub, os.path.basename(path))
+        if os.path.exists(target):
+            stem, suffix = os.path.splitext(target)
+            target = f"{stem}.{datetime.now().strftime('%Y%m%d%H%M%S%f')}{suffix}"
+        os.replace(path, target)
+        return target
+
+    def _load(self, path):
+        try:
+            self.pending.append(PendingFile(path, time.monotonic()))
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            logging.error(f"无法读取文件 {os.path.basename(path)}，已移入 {REJECTED_DIR}/: {e}")
+            self._move(path, REJECTED_DIR)
+
+    def recover(self):
+        """重新处理上次中断时留在 processing/ 中的文件"""
+        directory = os.path.join(self.drop_dir, PROCESSING_DIR)
+        names = sorted(os.listdir(directory))
+        for name in names:
+            self._load(os.path.join(directory, name))
+        if names:
+            logging.info(f"恢复 {len(names)} 个未完成的文件")
+
+    def claim_new(self):
+        """认领投递目录中新到达的文件（按修改时间顺序）"""
+        entries = [
+            entry for entry in os.scandir(self.drop_dir)
+            if entry.is_file() and not entry.name.startswith('.')
+            and entry.name.endswith(FILE_SUFFIXES) and not entry.name.endswith(IGNORED_SUFFIXES)
+        ]
+        for entry in sorted(entries, key=lambda entry: (entry.stat().st_mtime, entry.name)):
+            self._load(self._move(entry.path, PROCESSING_DIR))
+
+    def due(self):
+        """是否应提交：记录数达到上限，或最早认领的文件已等待 max_latency 秒"""
+        if not self.pending:
+            return False
+        waiting = sum(len(f.records) for f in self.pending)
+        return waiting >= self.max_batch or time.monotonic() - self.pending[0].claimed_at >= self.max_latency
+
+    def flush(self):
+        """提交一批（至多 max_batch 条记录，至少一个文件），失败时保留文件待重试"""
+        files, count = [], 0
+        for f in self.pending:
+            if files and count + len(f.records) > self.max_batch:
+                break
+            files.append(f)
+            count += len(f.records)
+        from daily_update import UPDATE_LOCK_NAME
+
+        backend = get_backend()
+        try:
+            lock = backend.acquire_lock(UPDATE_LOCK_NAME, self.lock_timeout)
+        except (OSError, *DB_ERRORS) as e:
+            logging.error(f"获取更新锁失败，{len(files)} 个文件将重试: {e}")
+            return False
+        if lock is None:
+            logging.warning(f"另一个进程正在更新此数据库，{len(files)} 个文件将重试")
+            return False
+        try:
+            if self.conn is None:
+                self.conn = backend.connect()
+            result = apply_batch(self.conn, files, self.allocator)
+        except DB_ERRORS as e:
+            logging.error(f"提交失败，{len(files)} 个文件将重试: {e}")
+            if self.conn is not None:
+                try:
+                    self.conn.rollback()
+                    self.conn.close()
+                except DB_ERRORS:
+                    pass
+                self.conn = None
+            for f in files:
+                f.records, f.rejects = read_file(f.path)
+            return False
+        finally:
+            backend.release_lock(lock)
+
+        latency = time.monotonic() - files[0].claimed_at
+        del self.pending[:len(files)]
+        for f in files:
+            if f in result['skipped']:
+                logging.info(f"文件 {f.name} 已导入过，跳过")
+            elif f.rejects:
+                with open(os.path.join(self.drop_dir, REJECTED_DIR, f"{f.name}.rejected.jsonl"), 'a', encoding='utf-8') as out:
+                    for line, raw, reason in f.rejects:
+                        out.write(json.dumps({'line': line, 'reason': reason, 'record': raw},
+                                             ensure_ascii=False, default=str) + '\n')
+            self._move(f.path, DONE_DIR)
+
+        self.totals['batches'] += 1
+        self.totals['files'] += len(files) - len(result['skipped'])
+        for key in ('hires', 'exits', 'rejected'):
+            self.totals[key] += result[key]
+        logging.info(f"已提交 {len(files)} 个文件: {result['hires']} 名入职, {result['exits']} 名离职, "
+                     f"{result['rejected']} 条记录被拒绝，延迟 {latency:.2f} 秒")
+
+        # 提交后追加到本地二进制事件日志，失败时下次提交会补齐
+        try:
+            change_log.sync_event_log(self.conn)
+        except (OSError, ValueError, *DB_ERRORS) as e:
+            logging.warning(f"事件日志同步失败，将在下次提交时补齐: {e}")
+        return True
+
+    def prepare(self):
+        """建好导入用到的表（建表会提交，不能在导入事务中途进行）"""
+        backend = get_backend()
+        conn = backend.connect()
+        try:
+            if not backend.table_exists(conn, 'employees'):
+                raise RuntimeError("employees 表不存在，请先运行 data.py 导入数据")
+            change_log.ensure_tables(conn)
+            for table in ('quantile_sketches', 'sample_strata', 'employee_samples', 'ingested_files'):
+                backend.ensure_table(conn, table)
+        finally:
+            conn.close()
+
+    def run(self, once=False, poll_interval=DEFAULT_POLL_INTERVAL):
+        """主循环：认领文件、按组提交；once 为真时处理完当前文件后退出。返回未能提交的文件数"""
+        self.prepare()
+        self.recover()
+        try:
+            while not _stopping:
+                self.claim_new()
+                if once and not self.pending:
+                    break
+                if once or self.due():
+                    if not self.flush():
+                        if once:
+                            break
+                        time.sleep(RETRY_INTERVAL)
+                    continue
+                time.sleep(poll_interval)
+            # 停止前提交已认领的文件
+            while self.pending and self.flush():
+                pass
+        finally:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        logging.info(f"导入结束: {self.totals['batches']} 个批次, {self.totals['files']} 个文件, "
+                     f"{self.totals['hires']} 名入职, {self.totals['exits']} 名离职, {self.totals['rejected']} 条记录被拒绝")
+        return len(self.pending)
+
+
+def _request_stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='监视投递目录，小批量导入入职/离职记录')
+    parser.add_argument('--drop-dir', type=str, default=DEFAULT_DROP_DIR, help='投递目录')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help='每个事务最多的记录数')
+    parser.add_argument('--max-latency', type=float, default=DEFAULT_MAX_LATENCY, help='文件认领后最长等待多少秒提交')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help='扫描投递目录的间隔（秒）')
+    parser.add_argument('--once', action='store_true', help='处理完目录中现有的文件后退出')
+    parser.add_argument('--lock-timeout', type=float, default=0,
+                        help='其他进程正在更新此数据库时每批最多等待的秒数，超时后稍后重试')
+    storage.add_cli_arguments(parser)
+    args = parser.parse_args()
+
+    # daily_update 在首次导入时才配置写入 employee_updates.log 的日志，此时根日志已有处理器，不再生效
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage.configure_from_args(args)
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    ingestor = Ingestor(args.drop_dir, args.max_batch, args.max_latency, args.lock_timeout)
+    try:
+        remaining = ingestor.run(once=args.once, poll_interval=args.poll_interval)
+    except (RuntimeError, *DB_ERRORS) as e:
+        logging.error(f"导入失败: {e}")
+        return 1
+    return 1 if remaining else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
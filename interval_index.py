@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工在职区间索引 (HR离职分析版)
+
+把每名员工的在职区间 [hire_date, termination_date) 建成内存中的居中区间树，
+回答"某天谁在职""某段时间内谁在职过"这类问题，不必每次全表扫描
+hire_date <= d AND (termination_date IS NULL OR termination_date > d)：
+- 每个树节点保存跨过中心日期的区间，分别按开始日期和结束日期排序，
+  查询时每个节点的命中结果是排序数组中的一段连续切片
+- 时点查询和区间重叠查询只访问 O(log n) 个节点，总耗时 O(log² n + k)，
+  只统计人数时不需要取出员工ID
+- 按部门、薪资等级（或两者组合）筛选时使用各自的子索引，首次使用时建立并缓存
+- 可由数据库、EmployeeStore 或 DataFrame 建立；入职当天离职（区间为空）的员工不在任何一天在职
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import storage
+from storage import connect_for_analytics
+
+# 在职员工的区间结束日期（天数），大于任何实际日期
+OPEN_END = np.iinfo(np.int64).max
+
+INDEX_COLUMNS = ['employee_id', 'department', 'salary_level', 'hire_date', 'termination_date']
+
+
+def to_day(value):
+    """把日期（date、字符串或 datetime64）转换为自1970-01-01起的天数"""
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+
+
+def _date_days(values):
+    """日期数组转换为天数数组，缺失值为 OPEN_END"""
+    days = np.asarray(values).astype('datetime64[D]')
+    result = days.astype(np.int64)
+    result[np.isnat(days)] = OPEN_END
+    return result
+
+
+class IntervalTree:
+    """半开区间 [start, end) 的静态居中区间树
+
+    节点信息以并列列表保存；每个节点的区间在 starts/ends 全局数组中占一段连续位置，
+    starts 段内按开始日期升序，ends 段内按结束日期升序。
+    """
+
+    def __init__(self, starts, ends):
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        self.size = len(starts)
+        self.centers = []
+        self.children = []      # (左子节点, 右子节点)，-1 表示没有
+        self.bounds = []        # 节点在全局数组中的 (起始位置, 结束位置)
+        start_order = []
+        end_order = []
+        position = 0
+
+        root = np.flatnonzero(starts < ends)  # 空区间不包含任何一天
+        stack = [(root, None, None)] if len(root) else []
+        while stack:
+            indices, parent, side = stack.pop()
+            node = len(self.centers)
+            if parent is not None:
+                left, right = self.children[parent]
+                self.children[parent] = (node, right) if side == 0 else (left, node)
+
+            # 以开始日期的中位数为中心：该区间必然跨过中心，左右两侧各不超过一半
+            node_starts = starts[indices]
+            center = int(np.partition(node_starts, len(node_starts) // 2)[len(node_starts) // 2])
+            node_ends = ends[indices]
+            left_mask = node_ends <= center
+            right_mask = node_starts > center
+            here = indices[~(left_mask | right_mask)]
+
+            self.centers.append(center)
+            self.children.append((-1, -1))
+            self.bounds.append((position, position + len(here)))
+            position += len(here)
+            start_order.append(here[np.argsort(starts[here], kind='stable')])
+            end_order.append(here[np.argsort(ends[here], kind='stable')])
+
+            if right_mask.any():
+                stack.append((indices[right_mask], node, 1))
+            if left_mask.any():
+                stack.append((indices[left_mask], node, 0))
+
+        empty = np.empty(0, dtype=np.int64)
+        self.by_start = np.concatenate(start_order) if start_order else empty   # 行号
+        self.by_end = np.concatenate(end_order) if end_order else empty
+        self.sorted_starts = starts[self.by_start]
+        self.sorted_ends = ends[self.by_end]
+
+    def _point_slices(self, day):
+        """包含 day 的区间所在的 (数组, 起始位置, 结束位置) 切片"""
+        node = 0 if self.centers else -1
+        while node >= 0:
+            center = self.centers[node]
+            lo, hi = self.bounds[node]
+            left, right = self.children[node]
+            if day < center:
+                # 节点区间都满足 end > center > day，只需 start <= day
+                yield self.by_start, lo, lo + int(np.searchsorted(self.sorted_starts[lo:hi], day, side='right'))
+                node = left
+            else:
+                # 节点区间都满足 start <= center <= day，只需 end > day
+                yield self.by_end, lo + int(np.searchsorted(self.sorted_ends[lo:hi], day, side='right')), hi
+                node = right
+
+    def _range_slices(self, first, last):
+        """与 [first, last) 重叠（start < last 且 end > first）的区间切片"""
+        stack = [0] if self.centers else []
+        while stack:
+            node = stack.pop()
+            center = self.centers[node]
+            lo, hi = self.bounds[node]
+            left, right = self.children[node]
+            if last <= center:
+                yield self.by_start, lo, lo + int(np.searchsorted(self.sorted_starts[lo:hi], last, side='left'))
+            elif first > center:
+                yield self.by_end, lo + int(np.searchsorted(self.sorted_ends[lo:hi], first, side='right')), hi
+            else:
+                # 中心日期在查询范围内，节点的全部区间都重叠
+                yield self.by_start, lo, hi
+            if left >= 0 and first < center:
+                stack.append(left)
+            if right >= 0 and last > center:
+                stack.append(right)
+
+    @staticmethod
+    def _collect(slices):
+        parts = [array[lo:hi] for array, lo, hi in slices if hi > lo]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def stab(self, day):
+        """返回包含 day 的区间行号"""
+        return self._collect(self._point_slices(day))
+
+    def stab_count(self, day):
+        """返回包含 day 的区间数量"""
+        return sum(hi - lo for _, lo, hi in self._point_slices(day) if hi > lo)
+
+    def overlap(self, first, last):
+        """返回与 [first, last) 重叠的区间行号"""
+        if first >= last:
+            return np.empty(0, dtype=np.int64)
+        return self._collect(self._range_slices(first, last))
+
+    def overlap_count(self, first, last):
+        """返回与 [first, last) 重叠的区间数量"""
+        if first >= last:
+            return 0
+        return sum(hi - lo for _, lo, hi in self._range_slices(first, last) if hi > lo)
+
+
+class EmploymentIndex:
+    """员工在职区间索引，支持按部门和薪资等级筛选"""
+
+    def __init__(self, employee_ids, departments, salary_levels, hire_dates, termination_dates):
+        self.employee_ids = np.asarray(employee_ids, dtype=np.int64)
+        self.starts = _date_days(hire_dates)
+        self.ends = _date_days(termination_dates)
+        # 部门、薪资等级以编码保存，子索引通过编码筛选行号
+        self.departments, self.department_codes = np.unique(np.asarray(departments, dtype=object).astype(str),
+                                                            return_inverse=True)
+        self.salary_levels, self.salary_codes = np.unique(np.asarray(salary_levels, dtype=object).astype(str),
+                                                          return_inverse=True)
+        self._trees = {}
+
+    @classmethod
+    def from_connection(cls, conn):
+        """从数据库的员工表建立索引"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(INDEX_COLUMNS)} FROM employees")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not rows:
+            return cls([], [], [], [], [])
+        employee_ids, departments, salary_levels, hire_dates, termination_dates = zip(*rows)
+        to_date = np.vectorize(lambda value: str(value)[:10] if value is not None else 'NaT', otypes=[object])
+        return cls(employee_ids, departments, salary_levels,
+                   to_date(hire_dates).astype('datetime64[D]'), to_date(termination_dates).astype('datetime64[D]'))
+
+    @classmethod
+    def from_store(cls, store):
+        """从 EmployeeStore 建立索引（日期列直接使用底层数组）"""
+        categorical = {}
+        for name in ('department', 'salary_level'):
+            categorical[name] = np.asarray(store.categories(name), dtype=object)[store.column(name)]
+        return cls(store.column('employee_id'), categorical['department'], categorical['salary_level'],
+                   store.column('hire_date'), store.column('termination_date'))
+
+    @classmethod
+    def from_frame(cls, df):
+        """从 DataFrame（如员工快照CSV）建立索引"""
+        import pandas as pd
+
+        return cls(df['employee_id'].to_numpy(), df['department'].to_numpy(), df['salary_level'].to_numpy(),
+                   pd.to_datetime(df['hire_date'], errors='coerce').to_numpy(),
+                   pd.to_datetime(df['termination_date'], errors='coerce').to_numpy())
+
+    def __len__(self):
+        return len(self.employee_ids)
+
+    def _tree(self, department=None, salary_level=None):
+        """返回 (区间树, 子索引行号到全表行号的映射)，首次使用时建立"""
+        key = (department, salary_level)
+        if key not in self._trees:
+            rows = np.arange(len(self.employee_ids))
+            for value, values, codes in ((department, self.departments, self.department_codes),
+                                         (salary_level, self.salary_levels, self.salary_codes)):
+                if value is None:
+                    continue
+                position = np.searchsorted(values, value)
+                if position == len(values) or values[position] != value:
+                    rows = rows[:0]
+                else:
+                    rows = rows[codes[rows] == position]
+            self._trees[key] = (IntervalTree(self.starts[rows], self.ends[rows]), rows)
+        return self._trees[key]
+
+    def employed_on(self, day, department=None, salary_level=None):
+        """返回 day 当天在职的员工ID（升序）"""
+        tree, rows = self._tree(department, salary_level)
+        return np.sort(self.employee_ids[rows[tree.stab(to_day(day))]])
+
+    def headcount_on(self, day, department=None, salary_level=None):
+        """返回 day 当天的在职人数"""
+        tree, _ = self._tree(department, salary_level)
+        return tree.stab_count(to_day(day))
+
+    def employed_between(self, start, end, department=None, salary_level=None):
+        """返回 [start, end]（含两端）期间任意一天在职过的员工ID（升序）"""
+        tree, rows = self._tree(department, salary_level)
+        return np.sort(self.employee_ids[rows[tree.overlap(to_day(start), to_day(end) + 1)]])
+
+    def headcount_between(self, start, end, department=None, salary_level=None):
+        """返回 [start, end]（含两端）期间在职过的人数"""
+        tree, _ = self._tree(department, salary_level)
+        return tree.overlap_count(to_day(start), to_day(end) + 1)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='员工在职区间查询')
+    parser.add_argument('--date', type=str, help='查询当天在职的员工 (YYYY-MM-DD)')
+    parser.add_argument('--start', type=str, help='区间查询的开始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, help='区间查询的结束日期 (YYYY-MM-DD)，默认为今天')
+    parser.add_argument('--department', type=str, help='只查询此部门')
+    parser.add_argument('--salary-level', type=str, help='只查询此薪资等级')
+    parser.add_argument('--show-ids', type=int, default=20, help='最多显示的员工ID数量')
+    storage.add_cli_arguments(parser, replica=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not args.date and not args.start:
+        parser.error('需要指定 --date 或 --start')
+    storage.configure_from_args(args)
+
+    conn, source = connect_for_analytics()
+    try:
+        started = time.perf_counter()
+        index = EmploymentIndex.from_connection(conn)
+    finally:
+        conn.close()
+    logging.info(f"已从{'分析副本' if source == 'replica' else '主库'}加载 {len(index)} 名员工的在职区间，"
+                 f"耗时 {time.perf_counter() - started:.2f} 秒")
+
+    filters = {'department': args.department, 'salary_level': args.salary_level}
+    started = time.perf_counter()
+    if args.date:
+        employee_ids = index.employed_on(args.date, **filters)
+        label = f"{args.date} 在职"
+    else:
+        end = args.end or datetime.now().strftime('%Y-%m-%d')
+        employee_ids = index.employed_between(args.start, end, **filters)
+        label = f"{args.start} 至 {end} 期间在职过"
+    elapsed = (time.perf_counter() - started) * 1000
+
+    scope = ' '.join(f"{name}={value}" for name, value in filters.items() if value)
+    print(f"{label}的员工{f' ({scope})' if scope else ''}: {len(employee_ids)} 人（查询含建立子索引耗时 {elapsed:.1f} 毫秒）")
+    if args.show_ids and len(employee_ids):
+        shown = ', '.join(str(emp_id) for emp_id in employee_ids[:args.show_ids])
+        print(f"员工ID: {shown}{' ...' if len(employee_ids) > args.show_ids else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
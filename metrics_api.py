@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工指标本地API服务 (HR离职分析版)
+
+此脚本在本地提供只读HTTP接口，供仪表板和Notebook获取预计算的员工指标：
+- 在职人数、离职率、按月/按年的入职与离职人数、部门明细
+- 薪资、工时、满意度、绩效按部门和薪资等级的 p10/p50/p90（读取 quantile_sketch.py 维护的草图）
+- 所有指标由少量分组聚合查询预先计算并保存在内存中，请求本身不访问数据库
+- 后台线程轮询 last_update 表和变更事件的最新序号，每次 daily_update 完成或 ingest 提交一批后才重新加载一次
+- 配置了分析副本时从副本读取，副本落后于主库时回退到主库
+- 支持 ETag / If-None-Match（返回304）和 gzip 压缩的JSON响应
+- 多个并发请求共享同一份快照，不会对生产库产生重复的全表查询
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import change_log
+import quantile_sketch
+import storage
+from storage import DB_ERRORS, connect_for_analytics, fetch_update_watermark, get_backend
+
+# 服务默认配置
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8050
+DEFAULT_POLL_INTERVAL = 60  # 秒，检查数据是否更新的间隔
+
+
+def compute_metrics(conn):
+    """用少量分组聚合查询计算所有接口需要的指标"""
+    backend = get_backend()
+    by_department = backend.aggregate(conn, group_by=('department',))
+    by_salary = backend.aggregate(conn, group_by=('salary_level',))
+    by_department_salary = backend.aggregate(conn, group_by=('department', 'salary_level'))
+
+    def counts(row):
+        return {
+            'headcount': row['headcount'],
+            'leavers': row['leavers'],
+            'total': row['total'],
+            'turnover_rate': round(row['turnover_rate'], 4)
+        }
+
+    def periods(period):
+        headcount = 0
+        series = []
+        for key, (new_hires, terminations) in backend.period_counts(conn, period).items():
+            headcount += new_hires - terminations
+            series.append({
+                'period': key,
+                'new_hires': new_hires,
+                'terminations': terminations,
+                'headcount': headcount
+            })
+        return series
+
+    # 草图表为空（尚未运行过 daily_update 或 --rebuild）时扫描一次在职员工临时建立
+    sketches = quantile_sketch.load_sketches(conn)
+    if not sketches.cells:
+        sketches = quantile_sketch.SketchSet.from_connection(conn)
+
+    departments = {row['department']: counts(row) for row in by_department}
+    for row in by_department_salary:
+        if row['headcount']:
+            departments[row['department']].setdefault('headcount_by_salary_level', {})[row['salary_level']] = row['headcount']
+
+    headcount = sum(row['headcount'] for row in by_department)
+    leavers = sum(row['leavers'] for row in by_department)
+    total = headcount + leavers
+
+    return {
+        'headcount': {
+            'headcount': headcount,
+            'by_department': {dept: value['headcount'] for dept, value in departments.items()}
+        },
+        'turnover': {
+            'total_employees': total,
+            'leavers': leavers,
+            'turnover_rate': round(leavers / total, 4) if total else 0.0,
+            'by_department': {dept: value['turnover_rate'] for dept, value in departments.items()},
+            'by_salary_level': {row['salary_level']: counts(row) for row in by_salary}
+        },
+        'hires_exits_month': periods('month'),
+        'hires_exits_year': periods('year'),
+        'departments': departments,
+        'percentiles': {
+            'by_department': sketches.summary(by='department'),
+            'by_salary_level': sketches.summary(by='salary_level')
+        }
+    }
+
+
+class CachedResponse:
+    """预先序列化并压缩好的JSON响应
+
+    gzip 和未压缩的响应体字节不同，各用一个强ETag（gzip的加 -gz 后缀）。
+    """
+
+    __slots__ = ('body', 'gzip_body', 'etag', 'gzip_etag')
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=6)
+        digest = hashlib.sha1(self.body).hexdigest()
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+class MetricsCache:
+    """内存中的指标快照，在 last_update 或最新事件序号变化时整体替换"""
+
+    def __init__(self, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.responses = {}
+        self.watermark = None
+        self.loaded_at = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def refresh(self, force=False):
+        """检查 last_update 和最新事件序号，如有新的更新则重新计算全部指标
+
+        同一时间只有一个线程会访问数据库，其余线程直接继续使用旧快照。
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            try:
+                conn, source = connect_for_analytics()
+            except DB_ERRORS as e:
+                logging.error(f"数据库连接失败: {e}")
+                return False
+            try:
+                watermark = fetch_update_watermark(conn)
+                last_seq = change_log.latest_seq(conn)
+                if not force and self.responses and (watermark, last_seq) == self.watermark:
+                    return False
+                metrics = compute_metrics(conn)
+            except DB_ERRORS as e:
+                logging.error(f"刷新指标失败: {e}")
+                return False
+            finally:
+                conn.close()
+
+            loaded_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            meta = {
+                'last_update_id': watermark[0] if watermark else None,
+                'last_update_date': watermark[1] if watermark else None,
+                'last_event_seq': last_seq,
+                'loaded_at': loaded_at
+            }
+            responses = {}
+            for name, payload in metrics.items():
+                responses[name] = CachedResponse({'meta': meta, 'data': payload})
+            responses['health'] = CachedResponse(meta)
+
+            # 字典整体替换是原子的，读线程总能拿到一致的快照
+            self.responses = responses
+            self.watermark = (watermark, last_seq)
+            self.loaded_at = loaded_at
+            logging.info(f"指标已刷新: last_update={meta['last_update_date']} ({source})")
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def get(self, name):
+        """获取指定接口的缓存响应"""
+        return self.responses.get(name)
+
+    def start_polling(self):
+        """启动后台线程，定期检查数据库是否已更新"""
+        def poll():
+            while not self._stop.wait(self.poll_interval):
+                self.refresh()
+
+        thread = threading.Thread(target=poll, name='metrics-poller', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """停止后台轮询"""
+        self._stop.set()
+
+
+# URL路径到缓存键的映射
+ROUTES = {
+    '/health': 'health',
+    '/metrics/headcount': 'headcount',
+    '/metrics/turnover': 'turnover',
+    '/metrics/departments': 'departments',
+    '/metrics/percentiles': 'percentiles'
+}
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """处理指标请求，只读取内存中的快照"""
+
+    cache = None
+    protocol_version = 'HTTP/1.1'
+
+    def _resolve(self):
+        url = urlparse(self.path)
+        if url.path == '/metrics/hires-exits':
+            period = parse_qs(url.query).get('period', ['month'])[0]
+            if period not in ('month', 'year'):
+                return None
+            return f'hires_exits_{period}'
+        return ROUTES.get(url.path)
+
+    def _send_empty(self, code):
+        self.send_response(code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        name = self._resolve()
+        if name is None:
+            self._send_empty(404)
+            return
+
+        response = self.cache.get(name)
+        if response is None:
+            self._send_empty(503)
+            return
+
+        # 按本次要发送的编码选择ETag，客户端缓存的另一种编码的ETag不算匹配
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        body, etag = (response.gzip_body, response.gzip_etag) if use_gzip else (response.body, response.etag)
+        if_none_match = self.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/refresh':
+            self._send_empty(404)
+            return
+        # 由 daily_update 完成后调用，立即检查而不必等待下一次轮询
+        threading.Thread(target=self.cache.refresh, daemon=True).start()
+        self._send_empty(202)
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='员工指标本地API服务')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--poll-interval', type=int, default=DEFAULT_POLL_INTERVAL,
+                        help='检查数据是否更新的间隔（秒）')
+    storage.add_cli_arguments(parser, replica=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage.configure_from_args(args)
+
+    cache = MetricsCache(poll_interval=args.poll_interval)
+    if not cache.refresh(force=True):
+        logging.warning("初次加载指标失败，将在下一次轮询时重试")
+    cache.start_polling()
+
+    MetricsRequestHandler.cache = cache
+    server = ThreadingHTTPServer((args.host, args.port), MetricsRequestHandler)
+    logging.info(f"指标服务已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("指标服务已停止")
+    finally:
+        cache.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
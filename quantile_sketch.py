@@ -0,0 +1,473 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+薪资与工作量分布的流式分位数草图 (HR离职分析版)
+
+为仪表板提供按部门、薪资等级的 p10/p50/p90，无需每次对全表排序：
+- 每个 (指标列, 部门, 薪资等级) 维护一个KLL分位数草图，内存有界（每个草图约 3k 个值）
+- 在职员工是"入职减离职"：每个单元保存入职和离职两个草图，秩可以相减，
+  查询时用两者的差得到在职员工的分位数；误差相对于入职与离职人数之和，定期用 --rebuild 从员工表重建
+- daily_update 在同一事务中用当天的入职和离职员工增量更新草图，只读写受影响的单元
+- 草图可合并：部门、薪资等级的汇总由单元合并得到，不同分库（分片）导出的草图文件也可以合并后查询
+- 合并后的草图和排序后的累计权重会被缓存，单次分位数查询只需一次二分查找（微秒级）
+- 持久化在 quantile_sketches 表中（每个单元一行二进制数据）
+"""
+
+import argparse
+import base64
+import json
+import logging
+import math
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import storage
+from employee_store import CATEGORICAL_COLUMNS
+from storage import connect_for_analytics, get_backend
+
+# 维护草图的指标列
+SKETCH_COLUMNS = ['actual_salary', 'average_monthly_hours', 'satisfaction_level', 'last_evaluation']
+GROUP_COLUMNS = list(CATEGORICAL_COLUMNS)  # department、salary_level
+DEFAULT_K = 200                   # 最高层的容量，越大越精确
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+CAPACITY_DECAY = 2 / 3            # 每往下一层容量乘以该系数
+KEY_SEPARATOR = '|'
+
+
+class KLLSketch:
+    """KLL分位数草图：第 h 层的每个值代表 2**h 个原始值，某层超出容量时两两合并一半升到上一层"""
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+
+    def _capacity(self, level):
+        return max(2, int(math.ceil(self.k * CAPACITY_DECAY ** (len(self.levels) - 1 - level))))
+
+    def _compress(self):
+        # 随机数只取决于已插入的数量：结果可复现，也不消耗全局随机数生成器（补数据续跑依赖其状态）
+        rng = np.random.default_rng(self.n)
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # 奇数个时随机留下最小或最大的一个，其余相邻两两取一个升层
+                kept = items[:0]
+                if len(items) % 2:
+                    kept, items = (items[:1], items[1:]) if rng.integers(2) else (items[-1:], items[:-1])
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[rng.integers(2)::2]])
+            level += 1
+
+    def update(self, values):
+        """批量插入（NaN 被忽略）"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.n += len(values)
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """合并另一个草图（结果与把两边的值插入同一个草图等价）"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def weighted_items(self):
+        """返回 (值, 权重) 数组"""
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(values), 2 ** level, dtype=np.int64)
+                                  for level, values in enumerate(self.levels)])
+        return items, weights
+
+    def copy(self):
+        sketch = KLLSketch(self.k)
+        sketch.n = self.n
+        sketch.levels = [items.copy() for items in self.levels]
+        return sketch
+
+    def to_bytes(self):
+        """序列化：int64 头部 (k, n, 层数, 各层长度) + float64 值"""
+        header = np.array([self.k, self.n, len(self.levels), *(len(items) for items in self.levels)], dtype='<i8')
+        return header.tobytes() + np.concatenate(self.levels).astype('<f8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """反序列化，返回 (草图, 结束位置)"""
+        k, n, count = np.frombuffer(data, dtype='<i8', count=3, offset=offset)
+        lengths = np.frombuffer(data, dtype='<i8', count=int(count), offset=offset + 24)
+        offset += 8 * (3 + int(count))
+        values = np.frombuffer(data, dtype='<f8', count=int(lengths.sum()), offset=offset)
+        sketch = cls(int(k))
+        sketch.n = int(n)
+        sketch.levels = [items.copy() for items in np.split(values, np.cumsum(lengths)[:-1])]
+        return sketch, offset + 8 * int(lengths.sum())
+
+
+class ActiveSketch:
+    """在职员工的分位数：入职草图减离职草图"""
+
+    def __init__(self, k=DEFAULT_K, added=None, removed=None):
+        self.added = added or KLLSketch(k)
+        self.removed = removed or KLLSketch(k)
+        self._view = None
+
+    @property
+    def count(self):
+        return self.added.n - self.removed.n
+
+    def add(self, values):
+        self.added.update(values)
+        self._view = None
+
+    def remove(self, values):
+        self.removed.update(values)
+        self._view = None
+
+    def merge(self, other):
+        self.added.merge(other.added)
+        self.removed.merge(other.removed)
+        self._view = None
+        return self
+
+    def copy(self):
+        return ActiveSketch(added=self.added.copy(), removed=self.removed.copy())
+
+    def _sorted_view(self):
+        # 入职的值计正权重、离职的值计负权重，排序后累加即为在职员工的近似秩
+        if self._view is None:
+            added_items, added_weights = self.added.weighted_items()
+            removed_items, removed_weights = self.removed.weighted_items()
+            items = np.concatenate([added_items, removed_items])
+            weights = np.concatenate([added_weights, -removed_weights])
+            order = np.argsort(items, kind='stable')
+            # 近似误差可能使累计值局部下降，取前缀最大值保证单调，以便二分查找
+            self._view = (items[order], np.maximum.accumulate(np.cumsum(weights[order])))
+        return self._view
+
+    def quantiles(self, qs=DEFAULT_QUANTILES):
+        """返回各分位点的近似值（没有在职员工时为 None）"""
+        if self.count <= 0:
+            return [None] * len(qs)
+        items, cumulative = self._sorted_view()
+        positions = np.searchsorted(cumulative, np.asarray(qs, dtype=np.float64) * self.count, side='left')
+        return [float(value) for value in items[np.minimum(positions, len(items) - 1)]]
+
+    def rank(self, value):
+        """小于等于 value 的在职员工数量（近似）"""
+        items, cumulative = self._sorted_view()
+        position = np.searchsorted(items, value, side='right')
+        return int(cumulative[position - 1]) if position else 0
+
+    def to_bytes(self):
+        return self.added.to_bytes() + self.removed.to_bytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        added, offset = KLLSketch.from_bytes(data)
+        removed, _ = KLLSketch.from_bytes(data, offset)
+        return cls(added=added, removed=removed)
+
+
+def make_key(column, department, salary_level):
+    return KEY_SEPARATOR.join((column, department, salary_level))
+
+
+def split_key(key):
+    return tuple(key.split(KEY_SEPARATOR))
+
+
+class SketchSet:
+    """所有 (指标列, 部门, 薪资等级) 单元的草图，汇总查询由单元合并并缓存"""
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.cells = {}
+        self.dirty = set()    # 修改过、需要写回的单元
+        self._merged = {}
+
+    def _cell(self, key):
+        if key not in self.cells:
+            self.cells[key] = ActiveSketch(self.k)
+        return self.cells[key]
+
+    def _apply(self, departments, salary_levels, columns, remove=False):
+        departments = np.asarray(departments, dtype=object).astype(str)
+        salary_levels = np.asarray(salary_levels, dtype=object).astype(str)
+        if not len(departments):
+            return
+        groups, codes = np.unique(np.char.add(np.char.add(departments, KEY_SEPARATOR), salary_levels),
+                                  return_inverse=True)
+        for code, group in enumerate(groups):
+            mask = codes == code
+            department, salary_level = group.split(KEY_SEPARATOR)
+            for column in SKETCH_COLUMNS:
+                key = make_key(column, department, salary_level)
+                values = np.asarray(columns[column], dtype=np.float64)[mask]
+                if remove:
+                    self._cell(key).remove(values)
+                else:
+                    self._cell(key).add(values)
+                self.dirty.add(key)
+        self._merged.clear()
+
+    def add_rows(self, rows):
+        """加入员工（字典列表，如当天的新员工）"""
+        if rows:
+            self._apply(*_rows_to_columns(rows))
+
+    def remove_rows(self, rows):
+        """移除员工（字典列表，如当天的离职员工）"""
+        if rows:
+            self._apply(*_rows_to_columns(rows), remove=True)
+
+    def merge(self, other):
+        """合并另一组草图（如另一个分片导出的草图）"""
+        for key, sketch in other.cells.items():
+            if key in self.cells:
+                self.cells[key].merge(sketch)
+            else:
+                self.cells[key] = sketch.copy()
+            self.dirty.add(key)
+        self._merged.clear()
+        return self
+
+    def sketch(self, column, department=None, salary_level=None):
+        """返回指定范围的草图：部门、薪资等级都指定时为单元本身，否则为匹配单元的合并结果（缓存）"""
+        if department is not None and salary_level is not None:
+            return self.cells.get(make_key(column, department, salary_level)) or ActiveSketch(self.k)
+        cache_key = (column, department, salary_level)
+        if cache_key not in self._merged:
+            merged = ActiveSketch(self.k)
+            for key, sketch in self.cells.items():
+                cell_column, cell_department, cell_salary = split_key(key)
+                if (cell_column == column and department in (None, cell_department)
+                        and salary_level in (None, cell_salary)):
+                    merged.merge(sketch)
+            self._merged[cache_key] = merged
+        return self._merged[cache_key]
+
+    def quantiles(self, column, qs=DEFAULT_QUANTILES, department=None, salary_level=None):
+        """近似分位数，返回 {分位点: 值}"""
+        return dict(zip(qs, self.sketch(column, department, salary_level).quantiles(qs)))
+
+    def groups(self, by):
+        """出现过的部门或薪资等级"""
+        position = 1 + GROUP_COLUMNS.index(by)
+        return sorted({split_key(key)[position] for key in self.cells})
+
+    def summary(self, qs=DEFAULT_QUANTILES, by='department'):
+        """各指标列按部门（或薪资等级）的分位数，{列: {组: {'p10': 值, ...}}}"""
+        summary = {}
+        for column in SKETCH_COLUMNS:
+            summary[column] = {}
+            for group in self.groups(by):
+                values = self.quantiles(column, qs, **{by: group})
+                summary[column][group] = {f'p{round(q * 100):g}': value for q, value in values.items()}
+        return summary
+
+    def nbytes(self):
+        return sum(len(sketch.to_bytes()) for sketch in self.cells.values())
+
+    @classmethod
+    def from_columns(cls, departments, salary_levels, columns, k=DEFAULT_K):
+        sketches = cls(k)
+        sketches._apply(departments, salary_levels, columns)
+        return sketches
+
+    @classmethod
+    def from_store(cls, store, k=DEFAULT_K):
+        """由 EmployeeStore 的在职员工建立"""
+        active = store.column('left') == 0
+        groups = [np.asarray(store.categories(column), dtype=object)[store.column(column)[active]]
+                  for column in GROUP_COLUMNS]
+        return cls.from_columns(*groups, {column: store.column(column)[active] for column in SKETCH_COLUMNS}, k=k)
+
+    @classmethod
+    def from_records(cls, records, k=DEFAULT_K):
+        """由员工字典列表的在职员工建立"""
+        return cls.from_columns(*_rows_to_columns([emp for emp in records if emp['left'] == 0]), k=k)
+
+    @classmethod
+    def from_connection(cls, conn, k=DEFAULT_K):
+        """扫描员工表的在职员工建立"""
+        columns = [*GROUP_COLUMNS, *SKETCH_COLUMNS]
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM employees WHERE {get_backend().quote('left')} = 0")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        return cls.from_columns(values[0], values[1], dict(zip(SKETCH_COLUMNS, values[2:])), k=k)
+
+    def to_file(self, path):
+        """导出为JSON文件（供其他分片合并）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'k': self.k, 'cells': {key: base64.b64encode(sketch.to_bytes()).decode('ascii')
+                                              for key, sketch in self.cells.items()}}, f)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        sketches = cls(payload['k'])
+        sketches.cells = {key: ActiveSketch.from_bytes(base64.b64decode(data))
+                          for key, data in payload['cells'].items()}
+        return sketches
+
+
+def _rows_to_columns(rows):
+    return ([emp['department'] for emp in rows], [emp['salary_level'] for emp in rows],
+            {column: [emp[column] for emp in rows] for column in SKETCH_COLUMNS})
+
+
+# ---- 持久化 ----
+
+def load_sketches(conn, keys=None):
+    """从 quantile_sketches 表读取草图，keys 为 None 时读取全部单元"""
+    sketches = SketchSet()
+    if not get_backend().table_exists(conn, 'quantile_sketches'):
+        return sketches
+    cursor = conn.cursor()
+    try:
+        if keys is None:
+            cursor.execute("SELECT sketch_key, payload FROM quantile_sketches")
+        elif keys:
+            keys = sorted(keys)
+            cursor.execute(f"SELECT sketch_key, payload FROM quantile_sketches "
+                           f"WHERE sketch_key IN ({', '.join(['%s'] * len(keys))})", keys)
+        else:
+            return sketches
+        for key, payload in cursor.fetchall():
+            sketches.cells[key] = ActiveSketch.from_bytes(bytes(payload))
+    finally:
+        cursor.close()
+    return sketches
+
+
+def save_sketches(conn, sketches):
+    """在调用方的事务中写回修改过的单元，返回写回的单元数"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = [(key, sketches.cells[key].count, sketches.cells[key].to_bytes(), now) for key in sorted(sketches.dirty)]
+    get_backend().bulk_insert(conn, 'quantile_sketches', ['sketch_key', 'item_count', 'payload', 'updated_at'],
+                              rows, upsert_key='sketch_key')
+    sketches.dirty.clear()
+    return len(rows)
+
+
+def rebuild_sketches(conn):
+    """扫描员工表重建全部草图（清除增量更新累积的误差），不提交"""
+    get_backend().ensure_table(conn, 'quantile_sketches')
+    sketches = SketchSet.from_connection(conn)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM quantile_sketches")
+    finally:
+        cursor.close()
+    save_sketches(conn, sketches)
+    return sketches
+
+
+def update_sketches(conn, hires, exits):
+    """在调用方的事务中用当天的入职、离职员工增量更新草图，返回更新的单元数
+
+    表为空（首次运行）时改为扫描员工表完整建立。调用前应先确保表已存在
+    （ensure_table 会提交，不能在更新事务中途调用）。
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM quantile_sketches")
+        empty = cursor.fetchone()[0] == 0
+    finally:
+        cursor.close()
+    if empty:
+        return len(rebuild_sketches(conn).cells)
+    keys = {make_key(column, emp['department'], emp['salary_level'])
+            for emp in [*hires, *exits] for column in SKETCH_COLUMNS}
+    sketches = load_sketches(conn, keys)
+    sketches.add_rows(hires)
+    sketches.remove_rows(exits)
+    return save_sketches(conn, sketches)
+
+
+def print_summary(sketches, qs, column=None, department=None, salary_level=None):
+    """打印分位数表"""
+    labels = [f'p{round(q * 100):g}' for q in qs]
+    for name in [column] if column else SKETCH_COLUMNS:
+        print(f"\n===== {name} ({'/'.join(labels)}) =====")
+        if department or salary_level:
+            groups = [(f"{department or '全部'} / {salary_level or '全部'}",
+                       {'department': department, 'salary_level': salary_level})]
+        else:
+            groups = [('全部', {})] + [(group, {'department': group}) for group in sketches.groups('department')]
+        for label, scope in groups:
+            values = sketches.quantiles(name, qs, **scope)
+            count = sketches.sketch(name, **scope).count
+            print(f"  {label:<14} " + '  '.join(f"{value:>10.2f}" if value is not None else f"{'-':>10}"
+                                                for value in values.values()) + f"   ({count} 人)")
+
+
+def main():
+    """主函数：查询分位数，或重建/导出/合并草图"""
+    parser = argparse.ArgumentParser(description='薪资与工作量分布的分位数草图')
+    parser.add_argument('--rebuild', action='store_true', help='扫描员工表重建草图')
+    parser.add_argument('--column', choices=SKETCH_COLUMNS, help='只显示指定指标列')
+    parser.add_argument('--department', type=str, help='只查询指定部门')
+    parser.add_argument('--salary-level', type=str, help='只查询指定薪资等级')
+    parser.add_argument('--quantiles', type=float, nargs='+', default=list(DEFAULT_QUANTILES), help='分位点')
+    parser.add_argument('--export', type=str, help='把草图导出为JSON文件')
+    parser.add_argument('--merge', type=str, action='append', default=[],
+                        help='合并其他分片导出的草图文件后再查询（可重复）')
+    storage.add_cli_arguments(parser, replica=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage.configure_from_args(args)
+
+    if args.rebuild:
+        conn = get_backend().connect()
+        try:
+            start = time.perf_counter()
+            sketches = rebuild_sketches(conn)
+            conn.commit()
+            logging.info(f"已重建 {len(sketches.cells)} 个草图单元，共 {sketches.nbytes() / 1024:.0f} KB，"
+                         f"耗时 {time.perf_counter() - start:.2f} 秒")
+        finally:
+            conn.close()
+    else:
+        conn, _ = connect_for_analytics()
+        try:
+            sketches = load_sketches(conn)
+        finally:
+            conn.close()
+        if not sketches.cells and not args.merge:
+            logging.error("quantile_sketches 表为空，请先运行 --rebuild 或 daily_update.py")
+            return 1
+
+    for path in args.merge:
+        sketches.merge(SketchSet.from_file(path))
+    if args.export:
+        sketches.to_file(args.export)
+        logging.info(f"已导出 {len(sketches.cells)} 个草图单元到 {args.export}")
+
+    print_summary(sketches, args.quantiles, args.column, args.department, args.salary_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离职分析报告生成器 (HR离职分析版)
+
+原先的 "A Deep Dive into Turnover-report.pdf" 由仪表板截图手工拼成。此脚本自动生成同类报告：
+- 从数据库（配置了分析副本时读副本）或员工快照CSV读取员工数据，计算报告各章节的表格
+  （年度入职/离职/在职人数、按部门/薪资/项目数/年限/工时/满意度的离职率、满意度分布），
+  分组统计由位图索引（bitmap_index.py）完成
+- 图表用 matplotlib 的 Agg 后端无界面绘制，需要重绘的图表分给多个工作进程并行渲染
+- 每张图按 (章节, 图表版本, 图表数据) 的哈希缓存为PNG（离职率按显示精度取整）：数据未变化的章节
+  直接复用，daily_update 之后重新生成只重绘数据有变化的图表；各页的数据表在合成时按最新数据填写
+- 最后把封面（总体指标）和各章节（图表 + 表格）合成为一个PDF
+"""
+
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import storage
+from bitmap_index import BIN_COLUMNS, BitmapIndex
+from employee_store import read_snapshot_frame
+from storage import connect_for_analytics, get_backend
+
+DEFAULT_OUTPUT = 'turnover_report.pdf'
+DEFAULT_CACHE_DIR = 'report_cache'
+REPORT_TITLE = 'A Deep Dive into Turnover'
+# 修改绘图代码后加一，使旧的缓存图表失效
+CHART_VERSION = 1
+PAGE_SIZE = (8.27, 11.69)    # A4，英寸
+SATISFACTION_BIN_WIDTH = 0.05
+
+REPORT_COLUMNS = [
+    'department', 'salary_level', 'left', 'satisfaction_level', 'number_project',
+    'average_monthly_hours', 'time_spend_company', 'hire_date', 'termination_date'
+]
+SALARY_ORDER = ['low', 'medium', 'high']
+
+
+# ---- 读取数据 ----
+
+def load_frame(conn):
+    """从员工表读取报告需要的列"""
+    backend = get_backend()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(backend.quote(c) for c in REPORT_COLUMNS)} FROM employees")
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+def load_snapshot(path):
+    """从员工快照（CSV或Parquet，支持旧版列名）读取报告需要的列，缺少列时抛出 ValueError"""
+    return read_snapshot_frame(path, REPORT_COLUMNS)
+
+
+# ---- 各章节的表格 ----
+
+def overview(df):
+    """封面上的总体指标"""
+    total = len(df)
+    leavers = int((df['left'] == 1).sum())
+    return {
+        'Employees': f"{total:,}",
+        'Active': f"{total - leavers:,}",
+        'Leavers': f"{leavers:,}",
+        'Turnover rate': f"{leavers / total:.2%}" if total else '-',
+        'Average satisfaction': f"{df['satisfaction_level'].mean():.3f}"
+    }
+
+
+def yearly_table(df, index):
+    """按年的入职、离职和年末在职人数"""
+    hires = pd.to_datetime(df['hire_date']).dt.year.value_counts()
+    exits = pd.to_datetime(df.loc[df['left'] == 1, 'termination_date']).dt.year.value_counts()
+    years = sorted(set(hires.index) | set(exits.index))
+    table = pd.DataFrame({
+        'year': years,
+        'new_hires': [int(hires.get(year, 0)) for year in years],
+        'terminations': [int(exits.get(year, 0)) for year in years]
+    })
+    table['headcount'] = (table['new_hires'] - table['terminations']).cumsum()
+    return table
+
+
+def rate_table(column, order=None, by_rate=False):
+    """按某一维度分组的人数、离职人数和离职率"""
+    def build(df, index):
+        rows = [
+            {column: value, 'employees': entry['count'], 'leavers': entry['matches'], 'turnover_rate': round(entry['rate'], 4)}
+            for value, entry in index.breakdown(column, rate_of=index.bitmap('left', 1)).items()
+            if entry['count']
+        ]
+        table = pd.DataFrame(rows, columns=[column, 'employees', 'leavers', 'turnover_rate'])
+        if order:
+            table = table.set_index(column).reindex([value for value in order if value in set(table[column])]).reset_index()
+        if by_rate:
+            table = table.sort_values('turnover_rate', ascending=False, kind='stable')
+        if column in BIN_COLUMNS:
+            # 图表使用英文，区间标签换成数值范围
+            ranges = {label: f"{low}-{high}" for low, high, label in BIN_COLUMNS[column]}
+            table[column] = table[column].map(ranges)
+        return table.reset_index(drop=True)
+    return build
+
+
+def satisfaction_table(df, index):
+    """满意度分布（在职 / 离职）"""
+    edges = np.round(np.arange(0, 1 + SATISFACTION_BIN_WIDTH, SATISFACTION_BIN_WIDTH), 2)
+    left = df['left'].to_numpy() == 1
+    satisfaction = df['satisfaction_level'].to_numpy(dtype=np.float64)
+    active, _ = np.histogram(satisfaction[~left], bins=edges)
+    leavers, _ = np.histogram(satisfaction[left], bins=edges)
+    return pd.DataFrame({
+        'satisfaction': [f"{low:.2f}-{high:.2f}" for low, high in zip(edges[:-1], edges[1:])],
+        'active': active,
+        'leavers': leavers
+    })
+
+
+# 章节：(名称, 标题, 表格函数, 图表类型)
+SECTIONS = [
+    ('hires_exits', 'Hires, terminations and headcount by year', yearly_table, 'yearly'),
+    ('department', 'Turnover rate by department', rate_table('department', by_rate=True), 'rate_bars'),
+    ('salary_level', 'Turnover rate by salary level', rate_table('salary_level', order=SALARY_ORDER), 'rate_bars'),
+    ('number_project', 'Turnover rate by number of projects', rate_table('number_project'), 'rate_bars'),
+    ('time_spend_company', 'Turnover rate by years at company', rate_table('time_spend_company'), 'rate_bars'),
+    ('average_monthly_hours', 'Turnover rate by average monthly hours', rate_table('average_monthly_hours'), 'rate_bars'),
+    ('satisfaction_level', 'Turnover rate by satisfaction level', rate_table('satisfaction_level'), 'rate_bars'),
+    ('satisfaction_distribution', 'Satisfaction distribution: active vs. leavers', satisfaction_table, 'histogram')
+]
+
+
+def compute_tables(df):
+    """计算全部章节的表格，{名称: DataFrame}"""
+    index = BitmapIndex.from_frame(df)
+    return {name: build(df, index) for name, _, build, _ in SECTIONS}
+
+
+# ---- 绘图（在工作进程中执行） ----
+
+def _pyplot():
+    try:
+        import matplotlib
+    except ImportError:
+        raise RuntimeError("未安装 matplotlib，请先运行 pip install matplotlib")
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _plot_yearly(ax, table):
+    years = table['year'].to_numpy()
+    ax.bar(years - 0.2, table['new_hires'], width=0.4, label='New hires', color='#4c72b0')
+    ax.bar(years + 0.2, table['terminations'], width=0.4, label='Terminations', color='#dd8452')
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Employees')
+    line_ax = ax.twinx()
+    line_ax.plot(years, table['headcount'], color='#55a868', marker='o', label='Headcount')
+    line_ax.set_ylabel('Headcount')
+    handles, labels = ax.get_legend_handles_labels()
+    line_handles, line_labels = line_ax.get_legend_handles_labels()
+    ax.legend(handles + line_handles, labels + line_labels, loc='upper left')
+
+
+def _plot_rate_bars(ax, table):
+    positions = np.arange(len(table))
+    bars = ax.bar(positions, table['turnover_rate'] * 100, color='#c44e52')
+    ax.bar_label(bars, labels=[f"{rate:.1%}" for rate in table['turnover_rate']], fontsize=8)
+    ax.set_xticks(positions, table.iloc[:, 0].astype(str), rotation=30 if len(table) > 5 else 0)
+    ax.set_xlabel(table.columns[0])
+    ax.set_ylabel('Turnover rate (%)')
+
+
+def _plot_histogram(ax, table):
+    positions = np.arange(len(table))
+    ax.bar(positions, table['active'], label='Active', color='#4c72b0')
+    ax.bar(positions, table['leavers'], bottom=table['active'], label='Leavers', color='#c44e52')
+    ax.set_xticks(positions[::2], table['satisfaction'][::2], rotation=45, fontsize=8)
+    ax.set_xlabel('Satisfaction level')
+    ax.set_ylabel('Employees')
+    ax.legend()
+
+
+def _rate_chart_data(table):
+    # 离职率按图上显示的精度（0.1%）取整：人数变化但显示的离职率不变时不重绘
+    return pd.DataFrame({table.columns[0]: table.iloc[:, 0], 'turnover_rate': table['turnover_rate'].round(3)})
+
+
+# 图表类型：(绘图函数, 从章节表格取出图表实际使用的数据)，缓存键只取决于后者
+CHARTS = {
+    'yearly': (_plot_yearly, None),
+    'rate_bars': (_plot_rate_bars, _rate_chart_data),
+    'histogram': (_plot_histogram, None)
+}
+
+
+def chart_data(kind, table):
+    select = CHARTS[kind][1]
+    return select(table) if select else table
+
+
+def render_chart(kind, title, table, path):
+    """绘制一张图表并保存为PNG（先写临时文件再改名，中断时不会留下残缺的缓存）"""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(8, 4.5))
+    CHARTS[kind][0](ax, table)
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(path + '.tmp', dpi=150, format='png')
+    plt.close(fig)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def chart_key(name, kind, table):
+    """图表缓存键：章节、图表类型、图表版本和图表数据的哈希"""
+    digest = hashlib.sha1(f"{name}|{kind}|{CHART_VERSION}\n".encode('utf-8'))
+    digest.update(table.to_csv(index=False).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def render_charts(tables, cache_dir=DEFAULT_CACHE_DIR, workers=None, force=False):
+    """只重绘缓存中没有的图表，返回 ({章节: PNG路径}, 重绘的章节)"""
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = {}
+    stale = []
+    for name, title, _, kind in SECTIONS:
+        data = chart_data(kind, tables[name])
+        path = os.path.join(cache_dir, f"{name}-{chart_key(name, kind, data)}.png")
+        paths[name] = path
+        if force or not os.path.exists(path):
+            stale.append((kind, title, data, path, name))
+
+    if len(stale) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render_chart, *zip(*[item[:4] for item in stale])))
+    else:
+        for kind, title, table, path, _ in stale:
+            render_chart(kind, title, table, path)
+
+    # 删除同一章节的旧版本图表
+    for name, path in paths.items():
+        for old in glob.glob(os.path.join(cache_dir, f"{name}-*.png")):
+            if old != path:
+                os.remove(old)
+    return paths, [item[4] for item in stale]
+
+
+# ---- 合成PDF ----
+
+def _table_rows(table):
+    rows = []
+    for record in table.itertuples(index=False):
+        rows.append([f"{value:.2%}" if column == 'turnover_rate' else str(value)
+                     for column, value in zip(table.columns, record)])
+    return rows
+
+
+def assemble_pdf(output, summary, tables, paths, source):
+    """封面 + 每章一页（图表和数据表），先写临时文件再改名"""
+    plt = _pyplot()
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    with PdfPages(output + '.tmp', metadata={'Title': REPORT_TITLE}) as pdf:
+        fig = plt.figure(figsize=PAGE_SIZE)
+        fig.text(0.5, 0.8, REPORT_TITLE, ha='center', fontsize=24, weight='bold')
+        fig.text(0.5, 0.75, f"Generated {generated_at} from {source}", ha='center', fontsize=10, color='gray')
+        for i, (label, value) in enumerate(summary.items()):
+            fig.text(0.3, 0.62 - i * 0.04, label, fontsize=13)
+            fig.text(0.7, 0.62 - i * 0.04, value, fontsize=13, ha='right', weight='bold')
+        for i, (_, title, _, _) in enumerate(SECTIONS, start=1):
+            fig.text(0.3, 0.36 - i * 0.025, f"{i}. {title}", fontsize=10)
+        pdf.savefig(fig)
+        plt.close(fig)
+
+        # 章节标题已在图表中
+        for name, _, _, _ in SECTIONS:
+            fig = plt.figure(figsize=PAGE_SIZE)
+            image_ax = fig.add_axes([0.05, 0.52, 0.9, 0.44])
+            image_ax.imshow(plt.imread(paths[name]))
+            image_ax.axis('off')
+            table = tables[name]
+            table_ax = fig.add_axes([0.1, 0.04, 0.8, 0.42])
+            table_ax.axis('off')
+            cells = table_ax.table(cellText=_table_rows(table), colLabels=list(table.columns), loc='upper center')
+            cells.auto_set_font_size(False)
+            cells.set_fontsize(8 if len(table) <= 15 else 6.5)
+            cells.scale(1, 1.2 if len(table) <= 15 else 0.9)
+            pdf.savefig(fig)
+            plt.close(fig)
+    os.replace(output + '.tmp', output)
+
+
+def build_report(df, output=DEFAULT_OUTPUT, cache_dir=DEFAULT_CACHE_DIR, workers=None, force=False, source='database'):
+    """计算表格、渲染有变化的图表并合成PDF，返回重绘的章节"""
+    start = time.perf_counter()
+    tables = compute_tables(df)
+    logging.info(f"已计算 {len(tables)} 个章节的表格（{len(df)} 名员工），耗时 {time.perf_counter() - start:.2f} 秒")
+
+    start = time.perf_counter()
+    paths, rendered = render_charts(tables, cache_dir, workers=workers, force=force)
+    logging.info(f"重绘 {len(rendered)} 张图表，复用缓存 {len(paths) - len(rendered)} 张，"
+                 f"耗时 {time.perf_counter() - start:.2f} 秒" + (f"：{', '.join(rendered)}" if rendered else ''))
+
+    start = time.perf_counter()
+    assemble_pdf(output, overview(df), tables, paths, source)
+    logging.info(f"报告已保存到 {output}，合成耗时 {time.perf_counter() - start:.2f} 秒")
+    return rendered
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='生成离职分析PDF报告')
+    parser.add_argument('--snapshot', type=str, help='从员工快照CSV读取，默认从数据库读取')
+    parser.add_argument('--output', type=str, default=DEFAULT_OUTPUT, help='报告PDF文件')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='图表缓存目录')
+    parser.add_argument('--workers', type=int, help='渲染图表的进程数，默认为CPU核数')
+    parser.add_argument('--force', action='store_true', help='忽略缓存，重绘全部图表')
+    storage.add_cli_arguments(parser, replica=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.snapshot:
+        try:
+            df = load_snapshot(args.snapshot)
+        except ValueError as e:
+            logging.error(str(e))
+            return 1
+        source = os.path.basename(args.snapshot)
+    else:
+        storage.configure_from_args(args)
+        conn, role = connect_for_analytics()
+        source = f"database ({role})"
+        try:
+            df = load_frame(conn)
+        finally:
+            conn.close()
+    if df.empty:
+        logging.error("没有员工数据，无法生成报告")
+        return 1
+
+    try:
+        build_report(df, args.output, args.cache_dir, workers=args.workers, force=args.force, source=source)
+    except RuntimeError as e:
+        logging.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工快照原子恢复 (HR离职分析版)
+
+从员工数据快照（employee_data_backup.csv、employee_data_initial.csv、data.py 导出的CSV或Parquet）
+恢复 employees 表，取代"先删表再 import_to_mysql 重新导入"，恢复期间原表始终完整可读，仪表板不会中断：
+- 快照先批量写入影子表 employees_restore；MySQL 按块用多个连接并行写入，嵌入式后端单连接写入
+- 写入后核对行数、员工ID唯一性和各列校验和（整数列之和、小数列按存储精度取整后之和），
+  不一致时放弃恢复，原表不受影响
+- 核对通过后原子交换（MySQL RENAME TABLE；SQLite/DuckDB 在一个事务中两次 ALTER TABLE），
+  交换成功后删除 last_update 中晚于快照日期的记录，daily_update 会从快照日期之后继续
+- 快照日期默认取快照中最晚的 last_updated，该列为空时取文件名中的导出时间
+  （employee_data_YYYYmmddHHMMSS.csv），都无法确定时要求用 --as-of 指定
+- 写入影子表到交换完成期间持有每日更新锁（daily_update.UPDATE_LOCK_NAME），
+  恢复期间 daily_update、ingest 等写入进程不会写入即将被替换的旧表
+- 旧表默认在交换后删除，--keep-old 保留为 employees_old，便于再次回退
+- 恢复后同步ID序列、重建分位数草图和分层样本并运行数据完整性校验
+- 兼容旧版快照的列名（turnover、satisfaction 等），快照没有离职概率时按当前规则重新计算；
+  重复的员工ID与 import_to_mysql 一样保留最后一条
+
+注意：employee_events 中快照日期之后的变更事件不会删除。
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import approx_query
+import id_allocator
+import quantile_sketch
+import storage
+import validation
+from employee_store import read_snapshot_frame
+from storage import DB_ERRORS, EMPLOYEE_COLUMNS, get_backend
+
+SHADOW_TABLE = 'employees_restore'
+RETIRED_TABLE = 'employees_old'
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_WORKERS = 4
+# data.py 导出的快照文件名中的导出时间
+SNAPSHOT_TIMESTAMP = re.compile(r'(\d{14})')
+
+INTEGER_COLUMNS = [
+    'employee_id', 'actual_salary', 'left', 'number_project', 'average_monthly_hours',
+    'time_spend_company', 'Work_accident', 'promotion_last_5years'
+]
+# 小数列的存储精度，校验和按此精度取整后求和（FLOAT 列存储时有舍入误差）
+DECIMAL_DIGITS = {
+    'satisfaction_level': 2,
+    'last_evaluation': 2,
+    'turnover_probability': 3
+}
+DATE_FORMATS = {
+    'hire_date': '%Y-%m-%d',
+    'termination_date': '%Y-%m-%d',
+    'last_updated': '%Y-%m-%d %H:%M:%S'
+}
+
+
+def read_snapshot(path):
+    """读取快照并整理为 employees 表的列，按员工ID排序"""
+    df = read_snapshot_frame(path, EMPLOYEE_COLUMNS)
+
+    # 与 import_to_mysql 按员工ID覆盖写入的结果一致：重复的ID保留最后一条
+    duplicates = df.duplicated('employee_id', keep='last')
+    if duplicates.any():
+        logging.warning(f"快照中有 {int(duplicates.sum())} 条重复的员工ID，保留每个ID的最后一条记录")
+        df = df[~duplicates]
+    df = df[EMPLOYEE_COLUMNS].sort_values('employee_id', kind='stable').reset_index(drop=True)
+    for column in INTEGER_COLUMNS:
+        df[column] = df[column].round().astype(np.int64)
+    for column, fmt in DATE_FORMATS.items():
+        df[column] = pd.to_datetime(df[column]).dt.strftime(fmt)
+    return df
+
+
+def snapshot_as_of(df, path=None):
+    """快照对应的更新日期：最晚的 last_updated，该列为空时取文件名中的导出时间，都没有时返回 None
+
+    不能用最晚的入职或离职日期：快照中的员工可能有晚于导出日期的入职日期。
+    """
+    last_updated = df['last_updated'].dropna()
+    if len(last_updated):
+        return date.fromisoformat(last_updated.max()[:10])
+    match = SNAPSHOT_TIMESTAMP.search(os.path.basename(path or ''))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), '%Y%m%d%H%M%S').date()
+        except ValueError:
+            return None
+    return None
+
+
+def frame_rows(df):
+    """DataFrame 转为写库的元组（Python 原生类型，缺失值为 None）"""
+    values = df.astype(object).where(df.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def frame_checksum(df):
+    """快照的行数与各列校验和"""
+    checksum = {
+        'rows': len(df),
+        'distinct_ids': int(df['employee_id'].nunique()),
+        'terminated': int(df['termination_date'].notna().sum())
+    }
+    for column in INTEGER_COLUMNS:
+        checksum[column] = int(df[column].sum())
+    for column, digits in DECIMAL_DIGITS.items():
+        checksum[column] = int(np.round(df[column].to_numpy(dtype=np.float64) * 10 ** digits).sum())
+    return checksum
+
+
+def table_checksum(conn, table):
+    """一条聚合查询计算表的行数与各列校验和，口径与 frame_checksum 相同"""
+    backend = get_backend()
+    expressions = [
+        ('rows', 'COUNT(*)'),
+        ('distinct_ids', 'COUNT(DISTINCT employee_id)'),
+        ('terminated', 'COUNT(termination_date)')
+    ]
+    expressions += [(column, f"SUM({backend.quote(column)})") for column in INTEGER_COLUMNS]
+    expressions += [(column, f"SUM(ROUND({backend.quote(column)} * {10 ** digits}))")
+                    for column, digits in DECIMAL_DIGITS.items()]
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(sql for _, sql in expressions)} FROM {table}")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return {name: int(value or 0) for (name, _), value in zip(expressions, row)}
+
+
+def _insert_chunk(rows):
+    """用独立连接写入一块并提交（并行写入时每个线程一个连接）"""
+    backend = get_backend()
+    conn = backend.connect()
+    try:
+        backend.bulk_insert(conn, SHADOW_TABLE, EMPLOYEE_COLUMNS, rows, batch_size=len(rows))
+        conn.commit()
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def load_shadow(conn, rows, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS):
+    """重建影子表并批量写入快照，返回写入的行数"""
+    backend = get_backend()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+        cursor.execute(backend.create_table_sql('employees', name=SHADOW_TABLE))
+        conn.commit()
+    finally:
+        cursor.close()
+
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    if workers > 1 and backend.concurrent_writes and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(_insert_chunk, chunks))
+    # 嵌入式数据库只允许一个写入者，在一个事务中依次写入
+    for chunk in chunks:
+        backend.bulk_insert(conn, SHADOW_TABLE, EMPLOYEE_COLUMNS, chunk, batch_size=chunk_size)
+    conn.commit()
+    return len(rows)
+
+
+def swap_in(conn, as_of, keep_old=False):
+    """把影子表原子交换为 employees，交换成功后删除 last_update 中晚于 as_of 的记录
+
+    MySQL 的 RENAME TABLE 会在执行前隐式提交，因此先交换再删除：交换失败时 last_update 保持不变；
+    嵌入式后端的交换与删除在同一事务中一起提交。
+    """
+    backend = get_backend()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {RETIRED_TABLE}")
+        conn.commit()
+        if backend.table_exists(conn, 'employees'):
+            backend.swap_tables(conn, 'employees', SHADOW_TABLE, RETIRED_TABLE)
+        else:
+            cursor.execute(f"ALTER TABLE {SHADOW_TABLE} RENAME TO employees")
+        rolled_back = 0
+        if backend.table_exists(conn, 'last_update'):
+            cursor.execute("SELECT COUNT(*) FROM last_update WHERE update_date > %s", (as_of.strftime('%Y-%m-%d'),))
+            rolled_back = cursor.fetchone()[0]
+            cursor.execute("DELETE FROM last_update WHERE update_date > %s", (as_of.strftime('%Y-%m-%d'),))
+        conn.commit()
+        if not keep_old:
+            cursor.execute(f"DROP TABLE IF EXISTS {RETIRED_TABLE}")
+            conn.commit()
+    finally:
+        cursor.close()
+    return rolled_back
+
+
+def restore_snapshot(path, as_of=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS, keep_old=False,
+                     lock_timeout=0):
+    """从快照恢复 employees 表，成功返回 True"""
+    from daily_update import UPDATE_LOCK_NAME
+
+    start = time.perf_counter()
+    try:
+        df = read_snapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        logging.error(f"读取快照失败: {e}")
+        return False
+    as_of = as_of or snapshot_as_of(df, path)
+    if as_of is None:
+        logging.error("无法从快照的 last_updated 列或文件名确定快照日期，请用 --as-of 指定")
+        return False
+    expected = frame_checksum(df)
+    rows = frame_rows(df)
+    logging.info(f"已读取快照 {path}: {len(rows)} 条记录，快照日期 {as_of}，"
+                 f"耗时 {time.perf_counter() - start:.2f} 秒")
+
+    backend = get_backend()
+    # 持有更新锁直到交换和重建完成，其间其他写入进程不会修改即将被替换的旧表
+    try:
+        lock = backend.acquire_lock(UPDATE_LOCK_NAME, lock_timeout)
+    except (OSError, *DB_ERRORS) as e:
+        logging.error(f"获取更新锁失败: {e}")
+        return False
+    if lock is None:
+        logging.error("另一个进程正在更新此数据库，本次不恢复")
+        return False
+    conn = None
+    try:
+        conn = backend.connect()
+        phase = time.perf_counter()
+        load_shadow(conn, rows, chunk_size=chunk_size,
+                    workers=workers if backend.concurrent_writes else 1)
+        logging.info(f"已写入影子表 {SHADOW_TABLE}，耗时 {time.perf_counter() - phase:.2f} 秒")
+
+        actual = table_checksum(conn, SHADOW_TABLE)
+        mismatches = {name: (expected[name], actual[name]) for name in expected if expected[name] != actual[name]}
+        if mismatches:
+            for name, (want, got) in mismatches.items():
+                logging.error(f"校验不一致 {name}: 快照 {want}，影子表 {got}")
+            logging.error("影子表校验失败，已放弃恢复，employees 表未修改")
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+                conn.commit()
+            finally:
+                cursor.close()
+            return False
+        logging.info(f"影子表校验通过: {actual['rows']} 行，{len(actual)} 项校验和一致")
+
+        rolled_back = swap_in(conn, as_of, keep_old=keep_old)
+        logging.info(f"已交换为 employees 表，删除 {rolled_back} 条晚于 {as_of} 的 last_update 记录"
+                     + (f"，旧表保留为 {RETIRED_TABLE}" if keep_old else ""))
+
+        # 新表的ID、分布都变了：同步ID序列并重建分位数草图和分层样本
+        id_allocator.sync_sequence(conn)
+        quantile_sketch.rebuild_sketches(conn)
+        approx_query.rebuild_samples(conn)
+        conn.commit()
+        validation.log_report(validation.validate_table(conn, as_of), f"恢复 {os.path.basename(path)} 后")
+    except DB_ERRORS as e:
+        logging.error(f"恢复失败: {e}")
+        if conn is not None:
+            conn.rollback()
+        return False
+    finally:
+        if conn is not None:
+            conn.close()
+        backend.release_lock(lock)
+
+    logging.info(f"恢复完成，总耗时 {time.perf_counter() - start:.2f} 秒")
+    return True
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='从员工快照原子恢复 employees 表')
+    parser.add_argument('snapshot', type=str, help='快照文件（CSV或Parquet）')
+    parser.add_argument('--as-of', type=date.fromisoformat,
+                        help='快照对应的更新日期 (YYYY-MM-DD)，默认为快照中最晚的 last_updated 或文件名中的导出时间')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='并行写入的连接数（仅MySQL）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每块写入的行数')
+    parser.add_argument('--keep-old', action='store_true', help=f'保留原表为 {RETIRED_TABLE}')
+    parser.add_argument('--lock-timeout', type=float, default=0, help='其他进程正在更新此数据库时最多等待的秒数')
+    storage.add_cli_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage.configure_from_args(args)
+
+    ok = restore_snapshot(args.snapshot, as_of=args.as_of, chunk_size=args.chunk_size,
+                          workers=args.workers, keep_old=args.keep_old, lock_timeout=args.lock_timeout)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+规模档位数据集与报表SQL压力测试 (HR离职分析版)
+
+按TPC风格的规模因子生成并导入员工数据集，再在每个档位下计时生产环境使用的报表SQL，
+用来提前知道员工规模增长到多少时数据库端的查询会变得不可用：
+- 档位：SF1 = 1.5万名员工（与 data.py 默认一致）、SF10、SF100，直到 SF1000 = 1500万名员工，
+  规模越大入职年份跨度越长
+- 每个档位使用独立的数据库（MySQL为 employee_db_sf<N>，嵌入式后端为工作目录中的独立文件），
+  不会触及生产库
+- 数据集分块生成并按批写入，内存占用与总规模无关；--reuse 时已导入且行数一致的档位不再重新生成
+- 计时的SQL来自 headcount cal.sql（当前在职人数、逐年在职人数）、total_leavers.sql（逐年及总离职人数）
+  和 employees_view（全表读取），结果逐批取回，计入传输耗时
+- 某条SQL超过 --budget-seconds 或执行出错后，更大的档位不再运行该SQL
+- 每次运行的结果（含git提交号）追加到 load_test_results.jsonl
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import data
+import id_allocator
+import storage
+from config import DB_CONFIG
+from storage import DB_ERRORS, EMPLOYEE_COLUMNS
+
+# 规模档位：员工总数及入职年份范围
+SCALE_PROFILES = {
+    'SF1': {'employees': 15000, 'start_year': 2005, 'end_year': 2025},
+    'SF10': {'employees': 150000, 'start_year': 2000, 'end_year': 2025},
+    'SF100': {'employees': 1500000, 'start_year': 1990, 'end_year': 2025},
+    'SF1000': {'employees': 15000000, 'start_year': 1975, 'end_year': 2025}
+}
+DEFAULT_PROFILES = ['SF1', 'SF10']
+DEFAULT_RESULTS_FILE = 'load_test_results.jsonl'
+DEFAULT_BUDGET_SECONDS = 30.0   # 报表查询可接受的最长耗时
+GENERATION_CHUNK = 500000       # 每次生成的员工数，决定生成阶段的内存上限
+LOAD_BATCH_SIZE = 10000
+FETCH_BATCH_SIZE = 10000
+SEED = 42
+
+# headcount cal.sql 中的 employees_view
+EMPLOYEES_VIEW_SQL = """
+CREATE VIEW employees_view AS
+SELECT
+    employee_id,
+    name,
+    department,
+    salary_level,
+    actual_salary,
+    `left` AS turnover,
+    satisfaction_level AS satisfaction,
+    last_evaluation AS evaluation,
+    number_project,
+    average_monthly_hours,
+    time_spend_company AS years_at_company,
+    Work_accident,
+    promotion_last_5years,
+    hire_date,
+    termination_date,
+    turnover_probability,
+    last_updated
+FROM
+    employees
+"""
+
+
+def current_headcount_sql(backend, profile):
+    """headcount cal.sql：当前在职人数"""
+    return """
+    SELECT COUNT(*) AS current_employees_count
+    FROM employees
+    WHERE (hire_date <= CURDATE())
+      AND (termination_date IS NULL OR termination_date > CURDATE())
+    """
+
+
+def yearly_headcount_sql(backend, profile):
+    """headcount cal.sql：yearly_headcount 视图的查询，年份列表覆盖档位的全部年份"""
+    years = '\n        UNION '.join(
+        f"SELECT {year}" + (" AS year" if year == profile['start_year'] else '')
+        for year in range(profile['start_year'], profile['end_year'] + 1)
+    )
+    year_end = backend.text_to_date_sql("CONCAT(y.year, '-12-31')")
+    return f"""
+    WITH years AS (
+        {years}
+    ),
+    yearly_stats AS (
+        SELECT
+            y.year,
+            SUM(CASE
+                WHEN e.hire_date <= {year_end}
+                AND (e.termination_date IS NULL OR e.termination_date > {year_end})
+                THEN 1 ELSE 0
+            END) AS headcount,
+            SUM(CASE WHEN YEAR(e.hire_date) = y.year THEN 1 ELSE 0 END) AS new_hires,
+            SUM(CASE WHEN YEAR(e.termination_date) = y.year THEN 1 ELSE 0 END) AS terminations,
+            MAX(e.last_updated) AS last_updated
+        FROM years y
+        CROSS JOIN employees e
+        GROUP BY y.year
+    )
+    SELECT year, headcount, new_hires, terminations, last_updated
+    FROM yearly_stats
+    ORDER BY year
+    """
+
+
+def leavers_by_year_sql(backend, profile):
+    """total_leavers.sql：逐年离职人数（turnover 列来自 employees_view）"""
+    return """
+    SELECT YEAR(termination_date) AS year, COUNT(*) AS leavers
+    FROM employees_view
+    WHERE turnover = 1
+      AND termination_date >= '2013-01-01'
+      AND termination_date <= '2025-12-31'
+    GROUP BY YEAR(termination_date)
+    ORDER BY year
+    """
+
+
+def total_leavers_sql(backend, profile):
+    """total_leavers.sql：离职总人数"""
+    return """
+    SELECT COUNT(*) AS total_leavers
+    FROM employees_view
+    WHERE turnover = 1
+      AND termination_date >= '2013-01-01'
+      AND termination_date <= '2025-12-31'
+    """
+
+
+def employees_view_scan_sql(backend, profile):
+    """employees_view 全表读取（仪表板数据源刷新）"""
+    return "SELECT * FROM employees_view"
+
+
+# 压力测试的SQL：名称 -> 生成SQL的函数 (backend, profile)
+LOAD_TEST_QUERIES = {
+    'current_headcount': current_headcount_sql,
+    'yearly_headcount': yearly_headcount_sql,
+    'leavers_by_year': leavers_by_year_sql,
+    'total_leavers': total_leavers_sql,
+    'employees_view_scan': employees_view_scan_sql
+}
+
+
+def configure_profile(backend_name, profile_name, workdir):
+    """为档位选择独立的数据库，返回后端对象"""
+    suffix = profile_name.lower()
+    if backend_name == 'mysql':
+        return storage.configure('mysql', db_config=dict(DB_CONFIG, database=f"{DB_CONFIG['database']}_{suffix}"))
+    return storage.configure(backend_name, path=os.path.join(workdir, f'employee_db_{suffix}.{backend_name}'))
+
+
+def count_employees(backend, conn):
+    if not backend.table_exists(conn, 'employees'):
+        return 0
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM employees")
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def load_profile(backend, conn, profile_name, reuse=False):
+    """生成并导入档位的数据集，返回 {'generate_seconds', 'load_seconds', 'reused'}"""
+    profile = SCALE_PROFILES[profile_name]
+    total = profile['employees']
+    if reuse and count_employees(backend, conn) == total:
+        logging.info(f"{profile_name}: 复用已导入的 {total} 名员工")
+        return {'generate_seconds': 0.0, 'load_seconds': 0.0, 'reused': True}
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DROP VIEW IF EXISTS employees_view")
+        cursor.execute("DROP TABLE IF EXISTS employees")
+        conn.commit()
+    finally:
+        cursor.close()
+    backend.ensure_table(conn, 'employees')
+
+    random.seed(SEED)
+    np.random.seed(SEED)
+    employee_ids = id_allocator.sample_ids(total)
+    generate_seconds = load_seconds = 0.0
+    for start in range(0, total, GENERATION_CHUNK):
+        chunk_ids = employee_ids[start:start + GENERATION_CHUNK].tolist()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = data.generate_employee_data(len(chunk_ids), profile['start_year'], profile['end_year'],
+                                                employee_ids=chunk_ids)
+        generate_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for batch in store.iter_row_batches(batch_size=LOAD_BATCH_SIZE):
+            backend.bulk_insert(conn, 'employees', EMPLOYEE_COLUMNS, batch, batch_size=LOAD_BATCH_SIZE)
+            conn.commit()
+        load_seconds += time.perf_counter() - started
+        logging.info(f"{profile_name}: 已导入 {start + len(chunk_ids)}/{total} 名员工")
+        del store
+
+    return {'generate_seconds': generate_seconds, 'load_seconds': load_seconds, 'reused': False}
+
+
+def create_views(conn):
+    """创建 employees_view（各后端都支持 DROP VIEW IF EXISTS + CREATE VIEW）"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DROP VIEW IF EXISTS employees_view")
+        cursor.execute(EMPLOYEES_VIEW_SQL)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def time_query(conn, sql):
+    """执行查询并逐批取回全部结果，返回 (耗时秒数, 行数)"""
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    rows = 0
+    try:
+        cursor.execute(sql)
+        while True:
+            batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not batch:
+                break
+            rows += len(batch)
+    finally:
+        cursor.close()
+    return time.perf_counter() - started, rows
+
+
+def run_profiles(profile_names, backend_name, workdir, budget, queries=None, reuse=False):
+    """依次运行各档位，返回结果记录列表"""
+    queries = queries or list(LOAD_TEST_QUERIES)
+    exhausted = {}  # 已超时或出错的SQL -> 首次失败的档位
+    records = []
+    for profile_name in profile_names:
+        profile = SCALE_PROFILES[profile_name]
+        backend = configure_profile(backend_name, profile_name, workdir)
+        base = {'backend': backend_name, 'profile': profile_name, 'employees': profile['employees']}
+
+        backend.create_database()
+        conn = backend.connect()
+        try:
+            load = load_profile(backend, conn, profile_name, reuse=reuse)
+            create_views(conn)
+            records.append(dict(base, query='load', status='ok', **load))
+            logging.info(f"{profile_name}: 生成 {load['generate_seconds']:.1f}s, 导入 {load['load_seconds']:.1f}s")
+
+            for name in queries:
+                if name in exhausted:
+                    records.append(dict(base, query=name, status='skipped', seconds=None, rows=None))
+                    continue
+                try:
+                    seconds, rows = time_query(conn, LOAD_TEST_QUERIES[name](backend, profile))
+                except DB_ERRORS as e:
+                    conn.rollback()
+                    exhausted[name] = profile_name
+                    records.append(dict(base, query=name, status='error', seconds=None, rows=None, error=str(e)))
+                    logging.error(f"{profile_name} {name}: 执行失败: {e}")
+                    continue
+                status = 'ok' if seconds <= budget else 'over_budget'
+                if status != 'ok':
+                    exhausted[name] = profile_name
+                records.append(dict(base, query=name, status=status, seconds=seconds, rows=rows))
+                logging.info(f"{profile_name} {name}: {seconds:.3f}s, {rows} 行"
+                             + ('  <-- 超出预算' if status != 'ok' else ''))
+        finally:
+            conn.close()
+    return records
+
+
+def print_summary(records, budget):
+    """按SQL汇总：预算内的最大档位，以及首次超出预算或出错的档位"""
+    print(f"\n===== 压力测试汇总（预算 {budget:.0f}s）=====")
+    profiles = list(dict.fromkeys(record['profile'] for record in records))
+    print(f"{'query':<22}" + ''.join(f"{profile:>12}" for profile in profiles))
+    results = {(record['query'], record['profile']): record for record in records}
+    for name in dict.fromkeys(record['query'] for record in records):
+        cells = []
+        for profile in profiles:
+            record = results.get((name, profile))
+            if record is None:
+                cells.append('-')
+            elif name == 'load':
+                cells.append('reused' if record['reused']
+                             else f"{record['generate_seconds'] + record['load_seconds']:.1f}s")
+            elif record['seconds'] is None:
+                cells.append(record['status'])
+            else:
+                cells.append(f"{record['seconds']:.3f}s" + ('!' if record['status'] == 'over_budget' else ''))
+        print(f"{name:<22}" + ''.join(f"{cell:>12}" for cell in cells))
+
+    for name in LOAD_TEST_QUERIES:
+        failed = [record for record in records if record['query'] == name and record['status'] in ('over_budget', 'error')]
+        if failed:
+            print(f"{name}: 在 {failed[0]['profile']} ({failed[0]['employees']} 名员工) 时{'超出预算' if failed[0]['status'] == 'over_budget' else '执行失败'}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='规模档位数据集与报表SQL压力测试')
+    parser.add_argument('--profiles', type=str, default=','.join(DEFAULT_PROFILES),
+                        help=f"逗号分隔的档位，可选 {', '.join(SCALE_PROFILES)}")
+    parser.add_argument('--queries', type=str, help=f"逗号分隔的SQL名称，默认全部: {', '.join(LOAD_TEST_QUERIES)}")
+    storage.add_cli_arguments(parser, db_path=False)
+    parser.add_argument('--workdir', type=str, default='.', help='嵌入式后端的档位数据库文件目录')
+    parser.add_argument('--budget-seconds', type=float, default=DEFAULT_BUDGET_SECONDS, help='单条SQL可接受的最长耗时')
+    parser.add_argument('--reuse', action='store_true', help='复用已导入且行数一致的档位数据库')
+    parser.add_argument('--results', type=str, default=DEFAULT_RESULTS_FILE, help='结果文件路径')
+    parser.add_argument('--no-save', action='store_true', help='不保存本次结果')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # 在配置日志之后导入，benchmark 间接导入 daily_update 时不会把日志写入每日更新日志文件
+    from benchmark import get_git_revision
+
+    profile_names = [name for name in args.profiles.split(',') if name]
+    unknown = [name for name in profile_names if name not in SCALE_PROFILES]
+    if unknown:
+        parser.error(f"未知的档位: {', '.join(unknown)}")
+    queries = [name for name in args.queries.split(',') if name] if args.queries else None
+    if queries and any(name not in LOAD_TEST_QUERIES for name in queries):
+        parser.error(f"未知的SQL名称: {args.queries}")
+
+    records = run_profiles(profile_names, args.backend or storage.STORAGE_BACKEND, args.workdir, args.budget_seconds,
+                           queries=queries, reuse=args.reuse)
+    print_summary(records, args.budget_seconds)
+
+    if not args.no_save:
+        revision = get_git_revision()
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(args.results, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(dict(record, revision=revision, timestamp=timestamp), ensure_ascii=False) + '\n')
+        print(f"\n结果已追加到 {args.results}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工快照对比工具 (HR离职分析版)
+
+按 employee_id 对比两个员工数据快照（如 employee_data_20250516130112.csv 和
+employee_data_20250516165455.csv），报告新增、删除和变化的员工：
+- 两个快照都以流式方式逐批读取，不需要把文件整体载入pandas
+- 使用分区哈希连接（grace hash join）：快照较大时先按 employee_id 的哈希值
+  分区写入临时文件（按批marshal序列化），再逐个分区建哈希表对比，内存占用由 --memory-mb 限制
+- 同一快照中重复的 employee_id 以最后一次出现的行为准，报告中只计一次
+- 统计每一列发生变化的行数；数值按数值比较（198.0 与 198 视为相同）
+- 支持CSV和Parquet（Parquet通过duckdb流式读取），新格式只需在 SNAPSHOT_READERS 中注册读取函数
+- --details 把每一处变化逐行写入CSV，便于审计
+"""
+
+import argparse
+import csv
+import gc
+import math
+import os
+import marshal
+import struct
+import sys
+import tempfile
+from itertools import compress, islice
+from operator import itemgetter, ne
+
+DEFAULT_KEY = 'employee_id'
+DEFAULT_IGNORE_COLUMNS = ['last_updated']  # 每次导出都会变化，默认不参与对比
+DEFAULT_MEMORY_MB = 512
+READ_BATCH_SIZE = 10000
+# 每个快照字节在内存哈希表中大约占用的字节数（Python字符串和元组的开销）
+MEMORY_PER_FILE_BYTE = 6
+SAMPLE_SIZE = 10
+BATCH_LENGTH = struct.Struct('<Q')  # 分区文件中每批数据的长度前缀
+_MISSING = object()
+
+
+def read_csv_rows(path, batch_size=READ_BATCH_SIZE):
+    """流式读取CSV快照，先返回表头，之后逐批返回行（字符串列表）的列表"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        yield next(reader, [])
+        while True:
+            batch = list(islice(reader, batch_size))
+            if not batch:
+                break
+            yield batch
+
+
+def read_parquet_rows(path, batch_size=READ_BATCH_SIZE):
+    """通过duckdb流式读取Parquet快照，值统一转换为字符串"""
+    try:
+        import duckdb
+    except ImportError:
+        raise RuntimeError("未安装 duckdb，无法读取Parquet快照")
+
+    conn = duckdb.connect()
+    try:
+        cursor = conn.execute("SELECT * FROM read_parquet(?)", [path])
+        yield [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [['' if value is None else str(value) for value in row] for row in rows]
+    finally:
+        conn.close()
+
+
+# 按文件扩展名选择快照读取函数
+SNAPSHOT_READERS = {
+    '.csv': read_csv_rows,
+    '.parquet': read_parquet_rows
+}
+
+
+def open_snapshot(path):
+    """返回 (表头, 行批次迭代器)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SNAPSHOT_READERS:
+        raise ValueError(f"不支持的快照格式: {path}")
+    batches = SNAPSHOT_READERS[extension](path)
+    return next(batches), batches
+
+
+def normalize_value(value):
+    """规范化单个值：空值为 None，数值转换为浮点数，其余保持字符串"""
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return number if math.isfinite(number) else value
+
+
+def choose_partitions(old_path, new_path, memory_mb):
+    """根据两个快照的大小和内存上限确定分区数（每个分区两侧的哈希表同时在内存中）"""
+    size = (os.path.getsize(old_path) + os.path.getsize(new_path)) * MEMORY_PER_FILE_BYTE
+    return max(1, math.ceil(size / (memory_mb * 1024 * 1024)))
+
+
+def spill_partitions(batches, getter, partitions, directory, prefix):
+    """把快照按 employee_id 的哈希值分区，每批追加到各分区的临时文件，返回文件路径
+
+    临时文件只在本进程内读写，因此直接使用内置 hash() 分区，
+    并用比pickle快得多的 marshal 序列化字符串元组（每批前写入8字节长度）。
+    """
+    paths = [os.path.join(directory, f'{prefix}_{i}.bin') for i in range(partitions)]
+    files = [open(path, 'wb') for path in paths]
+    try:
+        for batch in batches:
+            buckets = [[] for _ in range(partitions)]
+            for row in map(getter, batch):
+                buckets[hash(row[0]) % partitions].append(row)
+            for f, bucket in zip(files, buckets):
+                if bucket:
+                    payload = marshal.dumps(bucket)
+                    f.write(BATCH_LENGTH.pack(len(payload)))
+                    f.write(payload)
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def iter_partition(path):
+    """读取分区文件，逐行返回 (employee_id, 列值...) 元组"""
+    with open(path, 'rb') as f:
+        while True:
+            length = f.read(BATCH_LENGTH.size)
+            if not length:
+                return
+            yield from marshal.loads(f.read(BATCH_LENGTH.unpack(length)[0]))
+
+
+def iter_keyed_rows(batches, getter):
+    for batch in batches:
+        yield from map(getter, batch)
+
+
+class DiffResult:
+    """快照对比结果"""
+
+    def __init__(self, columns, only_old_columns, only_new_columns):
+        self.columns = columns
+        self.only_old_columns = only_old_columns
+        self.only_new_columns = only_new_columns
+        self.added = 0
+        self.removed = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.duplicate_keys = 0
+        self.column_changes = {column: 0 for column in columns}
+        self.samples = {'added': [], 'removed': [], 'changed': []}
+
+    def _sample(self, kind, key):
+        if len(self.samples[kind]) < SAMPLE_SIZE:
+            self.samples[kind].append(key)
+
+    def as_dict(self):
+        return {
+            'added': self.added,
+            'removed': self.removed,
+            'changed': self.changed,
+            'unchanged': self.unchanged,
+            'duplicate_keys': self.duplicate_keys,
+            'column_changes': {column: count for column, count in self.column_changes.items() if count},
+            'only_old_columns': self.only_old_columns,
+            'only_new_columns': self.only_new_columns,
+            'samples': self.samples
+        }
+
+
+def _last_wins(rows, duplicates):
+    """按 employee_id 建哈希表，重复的键以最后一次出现为准，并把它记入 duplicates"""
+    table = {}
+    for values in rows:
+        key = values[0]
+        if key in table:
+            duplicates.add(key)
+        table[key] = values
+    return table
+
+
+def _join_partition(old_rows, new_rows, result, details):
+    """对一个分区做哈希连接：两侧各自建哈希表（重复的键以最后一次出现为准），再用新快照探测
+
+    行为 (employee_id, 列值...) 元组，两个快照的列顺序一致。
+    每个重复的键只计一次，无论它在哪一侧重复、重复了几次。
+    """
+    duplicates = set()
+    table = _last_wins(old_rows, duplicates)
+    new_table = _last_wins(new_rows, duplicates)
+    result.duplicate_keys += len(duplicates)
+
+    # 已匹配的键在哈希表中标记为 None，最后仍有旧值的键即为删除的员工
+    columns = result.columns
+    for key, values in new_table.items():
+        old_values = table.get(key, _MISSING)
+        table[key] = None
+        if old_values is _MISSING:
+            result.added += 1
+            result._sample('added', key)
+            if details:
+                details.writerow((key, 'added', '', '', ''))
+            continue
+        if old_values == values:
+            result.unchanged += 1
+            continue
+        # 先用C实现的 map(ne) 找出原始文本不同的列，只对这些列做数值规范化
+        # （主键位于第0列，两侧相同，不会出现在结果中）
+        changed_columns = [
+            i for i in compress(range(len(values)), map(ne, old_values, values))
+            if normalize_value(old_values[i]) != normalize_value(values[i])
+        ]
+        if not changed_columns:
+            result.unchanged += 1
+            continue
+        result.changed += 1
+        result._sample('changed', key)
+        for i in changed_columns:
+            result.column_changes[columns[i - 1]] += 1
+            if details:
+                details.writerow((key, 'changed', columns[i - 1], old_values[i], values[i]))
+
+    for key, old_values in table.items():
+        if old_values is None:
+            continue
+        result.removed += 1
+        result._sample('removed', key)
+        if details:
+            details.writerow((key, 'removed', '', '', ''))
+
+
+def diff_snapshots(old_path, new_path, key=DEFAULT_KEY, ignore_columns=DEFAULT_IGNORE_COLUMNS,
+                   memory_mb=DEFAULT_MEMORY_MB, partitions=None, details_path=None):
+    """按 key 列对比两个快照，返回 DiffResult"""
+    old_header, old_batches = open_snapshot(old_path)
+    new_header, new_batches = open_snapshot(new_path)
+    for header, path in ((old_header, old_path), (new_header, new_path)):
+        if key not in header:
+            raise ValueError(f"快照 {path} 中没有 {key} 列")
+
+    ignored = set(ignore_columns or []) | {key}
+    columns = [column for column in old_header if column in new_header and column not in ignored]
+    result = DiffResult(
+        columns,
+        [column for column in old_header if column not in new_header],
+        [column for column in new_header if column not in old_header]
+    )
+    # 每行投影为 (主键, 对比列...) 元组
+    old_getter = itemgetter(old_header.index(key), *[old_header.index(column) for column in columns])
+    new_getter = itemgetter(new_header.index(key), *[new_header.index(column) for column in columns])
+
+    details_file = open(details_path, 'w', newline='', encoding='utf-8-sig') if details_path else None
+    details = None
+    if details_file:
+        details = csv.writer(details_file)
+        details.writerow((key, 'change_type', 'column', 'old_value', 'new_value'))
+
+    # 哈希表中有数百万个字符串元组，不会形成循环引用，对比期间暂停循环垃圾回收以免反复扫描
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        partitions = partitions or choose_partitions(old_path, new_path, memory_mb)
+        if partitions == 1:
+            # 两个快照可以整体放入内存：不分区，直接建哈希表对比
+            _join_partition(iter_keyed_rows(old_batches, old_getter),
+                            iter_keyed_rows(new_batches, new_getter), result, details)
+        else:
+            with tempfile.TemporaryDirectory(prefix='snapshot_diff_') as directory:
+                old_paths = spill_partitions(old_batches, old_getter, partitions, directory, 'old')
+                new_paths = spill_partitions(new_batches, new_getter, partitions, directory, 'new')
+                for old_partition, new_partition in zip(old_paths, new_paths):
+                    _join_partition(iter_partition(old_partition), iter_partition(new_partition), result, details)
+    finally:
+        if gc_enabled:
+            gc.enable()
+        if details_file:
+            details_file.close()
+    return result
+
+
+def print_report(result, old_path, new_path):
+    """打印对比报告"""
+    print(f"\n===== 快照对比: {old_path} -> {new_path} =====")
+    print(f"新增员工: {result.added}")
+    print(f"删除员工: {result.removed}")
+    print(f"变化员工: {result.changed}")
+    print(f"未变化员工: {result.unchanged}")
+    if result.duplicate_keys:
+        print(f"重复的员工ID: {result.duplicate_keys}（以最后一次出现为准）")
+    if result.only_old_columns or result.only_new_columns:
+        print(f"仅旧快照有的列: {result.only_old_columns}")
+        print(f"仅新快照有的列: {result.only_new_columns}")
+
+    changed_columns = [(column, count) for column, count in result.column_changes.items() if count]
+    if changed_columns:
+        print("\n各列变化行数:")
+        for column, count in sorted(changed_columns, key=lambda item: item[1], reverse=True):
+            print(f"  {column}: {count}")
+
+    for kind, label in (('added', '新增'), ('removed', '删除'), ('changed', '变化')):
+        if result.samples[kind]:
+            print(f"\n{label}员工示例: {', '.join(result.samples[kind])}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='按 employee_id 对比两个员工数据快照')
+    parser.add_argument('old', help='旧快照路径（CSV或Parquet）')
+    parser.add_argument('new', help='新快照路径（CSV或Parquet）')
+    parser.add_argument('--key', default=DEFAULT_KEY, help='主键列')
+    parser.add_argument('--ignore', type=str, default=','.join(DEFAULT_IGNORE_COLUMNS),
+                        help='逗号分隔的不参与对比的列，传入空字符串则对比全部列')
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_MB, help='哈希表的内存上限（MB）')
+    parser.add_argument('--partitions', type=int, help='分区数，默认根据文件大小和内存上限计算')
+    parser.add_argument('--details', type=str, help='把每一处变化写入此CSV文件')
+    args = parser.parse_args()
+
+    ignore_columns = [column for column in args.ignore.split(',') if column]
+    result = diff_snapshots(args.old, args.new, key=args.key, ignore_columns=ignore_columns,
+                            memory_mb=args.memory_mb, partitions=args.partitions, details_path=args.details)
+    print_report(result, args.old, args.new)
+    if args.details:
+        print(f"\n变化明细已保存到 {args.details}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+MySQL 的 SQLite 替身 (HR离职分析版)
+
+在没有MySQL服务的环境（基准测试、本地调试、CI）中，用嵌入式SQLite数据库代替
+mysql.connector，由 storage.SQLiteBackend 使用：
+- 提供与 mysql.connector 连接相同的 cursor() / commit() / rollback() 接口
+- 自动把 %s 占位符、ON DUPLICATE KEY UPDATE、UPDATE ... JOIN、TIMESTAMPDIFF、
+  RAND()、SHOW TABLES LIKE 等MySQL语法改写为SQLite语法
+- 注册 YEAR()、CONCAT()、CURDATE() 等报表SQL用到的MySQL函数
+- 支持 cursor(dictionary=True)，DATE/DATETIME 列返回 date/datetime 对象
+"""
+
+import random
+import re
+import sqlite3
+from datetime import date, datetime
+
+Error = sqlite3.Error
+
+# SQLite 默认的日期适配器在新版本中已弃用，这里显式注册
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()[:10]))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+
+_SKIPPED_STATEMENT = re.compile(r'^\s*(CREATE\s+DATABASE|USE\s)', re.IGNORECASE)
+_SHOW_TABLES = re.compile(r"^\s*SHOW\s+TABLES(?:\s+LIKE\s+('[^']*'))?\s*$", re.IGNORECASE)
+_UPSERT = re.compile(r'ON\s+DUPLICATE\s+KEY\s+UPDATE', re.IGNORECASE)
+_VALUES_REF = re.compile(r'VALUES\((`?\w+`?)\)', re.IGNORECASE)
+_UPDATE_JOIN = re.compile(
+    r'^\s*UPDATE\s+(\w+)\s+(\w+)\s+JOIN\s+(\w+)\s+(\w+)\s+ON\s+(.+?)\s+SET\s+(.+?)\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+_DROP_TEMPORARY = re.compile(r'DROP\s+TEMPORARY\s+TABLE', re.IGNORECASE)
+_TIMESTAMPDIFF_YEAR = re.compile(r'TIMESTAMPDIFF\(\s*YEAR\s*,', re.IGNORECASE)
+_AUTO_INCREMENT = re.compile(r'\bINT\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b', re.IGNORECASE)
+
+
+def _timestampdiff_year(start, end):
+    """与MySQL TIMESTAMPDIFF(YEAR, start, end) 相同：两个日期之间的整年数"""
+    if start is None or end is None:
+        return None
+    start = date.fromisoformat(str(start)[:10])
+    end = date.fromisoformat(str(end)[:10])
+    if end < start:
+        # 结束日期早于开始日期时与MySQL一样向零取整
+        return -_timestampdiff_year(end, start)
+    years = end.year - start.year
+    if (end.month, end.day) < (start.month, start.day):
+        years -= 1
+    return years
+
+
+def _year(value):
+    """与MySQL YEAR() 相同"""
+    return int(str(value)[:4]) if value is not None else None
+
+
+def _concat(*values):
+    """与MySQL CONCAT() 相同：任一参数为 NULL 时结果为 NULL"""
+    if any(value is None for value in values):
+        return None
+    return ''.join(str(value) for value in values)
+
+
+def translate(sql):
+    """把MySQL语句改写为等价的SQLite语句，无需执行时返回 None"""
+    if _SKIPPED_STATEMENT.match(sql):
+        return None
+
+    show_tables = _SHOW_TABLES.match(sql)
+    if show_tables:
+        query = "SELECT name FROM sqlite_master WHERE type = 'table'"
+        if show_tables.group(1):
+            query += f" AND name LIKE {show_tables.group(1)}"
+        return query
+
+    update_join = _UPDATE_JOIN.match(sql)
+    if update_join:
+        table, alias, other, other_alias, condition, assignments = update_join.groups()
+        # SQLite 的 UPDATE ... FROM 中，SET 左侧不能带表别名
+        assignments = re.sub(rf'\b{alias}\.(`?\w+`?)\s*=', r'\1 =', assignments)
+        sql = (f"UPDATE {table} AS {alias} SET {assignments} "
+               f"FROM {other} AS {other_alias} WHERE {condition}")
+
+    if _UPSERT.search(sql):
+        sql = _UPSERT.sub('ON CONFLICT(employee_id) DO UPDATE SET', sql)
+        sql = _VALUES_REF.sub(r'excluded.\1', sql)
+
+    sql = _DROP_TEMPORARY.sub('DROP TABLE', sql)
+    sql = _TIMESTAMPDIFF_YEAR.sub('TIMESTAMPDIFF_YEAR(', sql)
+    sql = _AUTO_INCREMENT.sub('INTEGER PRIMARY KEY AUTOINCREMENT', sql)
+    return sql.replace('%s', '?')
+
+
+class Cursor:
+    """模拟 mysql.connector 游标的SQLite游标"""
+
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+
+    def _convert(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def translate(self, sql):
+        return translate(sql)
+
+    def execute(self, sql, params=()):
+        sql = self.translate(sql)
+        if sql is not None:
+            self._cursor.execute(sql, tuple(params or ()))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        sql = self.translate(sql)
+        if sql is not None:
+            self._cursor.executemany(sql, [tuple(params) for params in seq_of_params])
+        return self
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._convert(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._convert(row) for row in self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    """模拟 mysql.connector 连接的SQLite连接"""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._connection.create_function('RAND', 0, random.random)
+        # RAND(N)：同样取自Python全局随机数生成器，可复现性由调用方设置的随机数状态保证
+        self._connection.create_function('RAND', 1, lambda seed: random.random())
+        self._connection.create_function('TIMESTAMPDIFF_YEAR', 2, _timestampdiff_year, deterministic=True)
+        # 报表SQL（headcount cal.sql 等）中用到的MySQL函数
+        self._connection.create_function('YEAR', 1, _year, deterministic=True)
+        self._connection.create_function('CONCAT', -1, _concat, deterministic=True)
+        self._connection.create_function('CURDATE', 0, lambda: date.today().isoformat())
+
+    def cursor(self, dictionary=False, buffered=None):
+        return Cursor(self._connection, dictionary=dictionary)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+    def is_connected(self):
+        return True
+
@@ -0,0 +1,980 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+存储后端抽象 (HR离职分析版)
+
+data.py、daily_update.py 及其他脚本通过此模块访问数据库，不再直接依赖 mysql.connector：
+- MySQLBackend：生产环境使用的MySQL数据库
+- SQLiteBackend / DuckDBBackend：嵌入式数据库，无需服务端，适合本地分析、模拟和CI
+- 统一提供连接、批量插入、批量更新、ID序列预留、离职候选人查询和聚合查询
+- 所有连接都使用 mysql.connector 风格的接口（%s 占位符、cursor(dictionary=True)）
+- 后端由 config.py 中的 STORAGE_BACKEND 或 configure() 选择
+- 命令行脚本通过 add_cli_arguments()/configure_from_args() 统一提供 --backend、--db-path、--replica-dsn 参数
+- 只读分析查询通过 connect_for_analytics() 路由到分析副本（config.REPLICA_DSN），
+  副本的 last_update 水位落后主库时自动回退到主库
+- 跨进程建议锁（acquire_lock/release_lock）：MySQL 使用 GET_LOCK，嵌入式数据库使用文件锁
+- 数据库驱动按需导入：嵌入式后端下不加载 mysql.connector，duckdb 只在使用DuckDB后端时加载
+"""
+
+import contextlib
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from urllib.parse import unquote, urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import sqlite_standin
+from config import DB_CONFIG, EMBEDDED_DB_PATH, REPLICA_DSN, REPLICA_MAX_LAG, STORAGE_BACKEND
+
+# 数据库驱动模块，由 _load_driver() 按需导入
+mysql = None
+duckdb = None
+
+
+def _load_driver(name):
+    """导入指定后端的数据库驱动并返回驱动模块，未安装时返回 None"""
+    global mysql, duckdb
+    try:
+        if name == 'mysql':
+            if mysql is None:
+                import mysql.connector
+            return mysql
+        if duckdb is None:
+            import duckdb
+        return duckdb
+    except ImportError:
+        return None
+
+
+class DuckDBError(sqlite3.DatabaseError):
+    """DuckDB 执行出错，由DuckDB连接包装层转换而来，因此 DB_ERRORS 无需在导入时加载 duckdb"""
+
+
+# MySQL是生产环境的默认后端，此时在导入时加载驱动，使 DB_ERRORS 包含其异常类型；
+# 使用嵌入式后端（cron、CI）时不加载，省去导入驱动的耗时
+if STORAGE_BACKEND == 'mysql':
+    _load_driver('mysql')
+
+# 所有后端可能抛出的数据库异常
+DB_ERRORS = tuple(
+    error for error in (
+        mysql.connector.Error if mysql else None,
+        sqlite3.Error
+    ) if error is not None
+)
+
+# 表结构定义：列名 -> 通用类型，各后端在建表时映射为自己的类型
+TABLE_SCHEMAS = {
+    'employees': {
+        'columns': [
+            ('employee_id', 'BIGINT'),
+            ('name', 'VARCHAR(100)'),
+            ('department', 'VARCHAR(50)'),
+            ('salary_level', 'VARCHAR(20)'),
+            ('actual_salary', 'INT'),
+            ('left', 'TINYINT'),
+            ('satisfaction_level', 'FLOAT'),
+            ('last_evaluation', 'FLOAT'),
+            ('number_project', 'INT'),
+            ('average_monthly_hours', 'INT'),
+            ('time_spend_company', 'INT'),
+            ('Work_accident', 'TINYINT'),
+            ('promotion_last_5years', 'TINYINT'),
+            ('hire_date', 'DATE'),
+            ('termination_date', 'DATE'),
+            ('turnover_probability', 'FLOAT'),
+            ('last_updated', 'DATETIME')
+        ],
+        'primary_key': 'employee_id'
+    },
+    'last_update': {
+        'columns': [
+            ('id', 'INT'),
+            ('update_date', 'DATE NOT NULL'),
+            ('updated_at', 'DATETIME NOT NULL')
+        ],
+        'primary_key': 'id',
+        'auto_increment': True
+    },
+    'employee_events': {
+        'columns': [
+            ('seq', 'BIGINT'),
+            ('event_type', 'VARCHAR(20) NOT NULL'),
+            ('employee_id', 'BIGINT NOT NULL'),
+            ('event_date', 'DATE NOT NULL'),
+            ('changes', 'TEXT'),
+            ('recorded_at', 'DATETIME NOT NULL')
+        ],
+        'primary_key': 'seq'
+    },
+    'backfill_checkpoint': {
+        'columns': [
+            ('range_id', 'VARCHAR(64)'),
+            ('start_date', 'DATE NOT NULL'),
+            ('end_date', 'DATE NOT NULL'),
+            ('last_committed_date', 'DATE'),
+            ('rng_state', 'TEXT'),
+            ('status', 'VARCHAR(20) NOT NULL'),
+            ('updated_at', 'DATETIME NOT NULL')
+        ],
+        'primary_key': 'range_id'
+    },
+    'id_sequences': {
+        'columns': [
+            ('name', 'VARCHAR(64)'),
+            ('next_value', 'BIGINT NOT NULL'),
+            ('updated_at', 'DATETIME NOT NULL')
+        ],
+        'primary_key': 'name'
+    },
+    'quantile_sketches': {
+        'columns': [
+            ('sketch_key', 'VARCHAR(200)'),
+            ('item_count', 'BIGINT NOT NULL'),
+            ('payload', 'BLOB NOT NULL'),
+            ('updated_at', 'DATETIME NOT NULL')
+        ],
+        'primary_key': 'sketch_key'
+    },
+    'employee_history': {
+        'columns': [
+            ('event_id', 'BIGINT'),
+            ('employee_id', 'BIGINT NOT NULL'),
+            ('event_date', 'DATE NOT NULL'),
+            ('event_type', 'VARCHAR(20) NOT NULL'),
+            ('department', 'VARCHAR(50)'),
+            ('salary_level', 'VARCHAR(20)'),
+            ('satisfaction_level', 'FLOAT'),
+            ('last_evaluation', 'FLOAT'),
+            ('number_project', 'INT'),
+            ('average_monthly_hours', 'INT'),
+            ('promotion_last_5years', 'TINYINT'),
+            ('turnover_probability', 'FLOAT')
+        ],
+        'primary_key': 'event_id'
+    },
+    'ingested_files': {
+        'columns': [
+            ('file_checksum', 'VARCHAR(64)'),
+            ('file_name', 'VARCHAR(255) NOT NULL'),
+            ('record_count', 'INT NOT NULL'),
+            ('rejected_count', 'INT NOT NULL'),
+            ('ingested_at', 'DATETIME NOT NULL')
+        ],
+        'primary_key': 'file_checksum'
+    },
+    'sample_strata': {
+        'columns': [
+            ('stratum_key', 'VARCHAR(100)'),
+            ('population', 'BIGINT NOT NULL'),
+            ('sample_count', 'BIGINT NOT NULL'),
+            ('capacity', 'INT NOT NULL'),
+            ('threshold', 'BIGINT NOT NULL'),
+            ('updated_at', 'DATETIME NOT NULL')
+        ],
+        'primary_key': 'stratum_key'
+    },
+    'employee_samples': {
+        'columns': [
+            ('employee_id', 'BIGINT'),
+            ('stratum_key', 'VARCHAR(100) NOT NULL'),
+            ('sample_key', 'BIGINT NOT NULL')
+        ],
+        'primary_key': 'employee_id'
+    }
+}
+
+# 员工表的全部列，顺序与 INSERT 语句一致
+EMPLOYEE_COLUMNS = [name for name, _ in TABLE_SCHEMAS['employees']['columns']]
+
+# 离职候选人的查询列与加权排序（满意度低、项目多、工时长的员工排在前面）
+TERMINATION_CANDIDATE_COLUMNS = [
+    'employee_id', 'name', 'department', 'salary_level', 'actual_salary', 'satisfaction_level',
+    'last_evaluation', 'number_project', 'average_monthly_hours', 'time_spend_company',
+    'Work_accident', 'promotion_last_5years', 'hire_date'
+]
+TERMINATION_WEIGHT_SQL = """
+    CASE
+        WHEN satisfaction_level < 0.3 THEN 5
+        WHEN satisfaction_level < 0.5 THEN 3
+        WHEN satisfaction_level > 0.8 THEN 0.5
+        ELSE 1
+    END +
+    CASE
+        WHEN number_project > 5 THEN 3
+        WHEN number_project < 3 THEN 1.5
+        ELSE 1
+    END +
+    CASE
+        WHEN average_monthly_hours > 250 THEN 2
+        WHEN average_monthly_hours < 150 THEN 1.5
+        ELSE 1
+    END +
+    CASE
+        WHEN time_spend_company > 5 THEN 1.5
+        WHEN time_spend_company < 1 THEN 0.8
+        ELSE 1
+    END +
+    CASE
+        WHEN promotion_last_5years = 1 THEN 0.5
+        ELSE 1
+    END +
+    CASE
+        WHEN Work_accident = 1 THEN 0.7
+        ELSE 1
+    END
+"""
+
+
+# 等待文件锁时的轮询间隔（秒）
+LOCK_POLL_INTERVAL = 0.1
+
+
+def _try_file_lock(handle):
+    """非阻塞地对已打开的文件加排他锁，返回是否成功"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StorageBackend:
+    """存储后端基类，子类实现各数据库的方言差异"""
+
+    name = None
+    type_map = {}
+    concurrent_writes = True  # 多个连接能否同时向同一张表批量写入
+
+    def connect(self):
+        """返回 mysql.connector 风格的数据库连接"""
+        raise NotImplementedError
+
+    def driver_errors(self):
+        """此后端可能抛出的数据库异常（DB_ERRORS 在导入时按 config.STORAGE_BACKEND 确定，不一定包含本后端的驱动）"""
+        return DB_ERRORS
+
+    def create_database(self):
+        """创建数据库（嵌入式后端在连接时自动创建文件）"""
+        return True
+
+    def quote(self, identifier):
+        """引用列名或表名（`left` 是保留字）"""
+        return f'`{identifier}`'
+
+    def column_type(self, generic_type):
+        base, _, rest = generic_type.partition(' ')
+        return ' '.join(part for part in (self.type_map.get(base, base), rest) if part)
+
+    def auto_increment_column(self, table, column):
+        return f"{self.quote(column)} INT PRIMARY KEY AUTO_INCREMENT"
+
+    def create_table_sql(self, table, name=None, temporary=False):
+        """根据 TABLE_SCHEMAS 生成建表语句"""
+        schema = TABLE_SCHEMAS[table]
+        definitions = []
+        for column, generic_type in schema['columns']:
+            if column == schema['primary_key'] and schema.get('auto_increment'):
+                definitions.append(self.auto_increment_column(name or table, column))
+            elif column == schema['primary_key']:
+                definitions.append(f"{self.quote(column)} {self.column_type(generic_type)} PRIMARY KEY")
+            else:
+                definitions.append(f"{self.quote(column)} {self.column_type(generic_type)}")
+        kind = 'TEMPORARY TABLE' if temporary else 'TABLE'
+        return f"CREATE {kind} IF NOT EXISTS {name or table} (\n    " + ",\n    ".join(definitions) + "\n)"
+
+    def table_exists(self, conn, table):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s", (table,))
+            return cursor.fetchone()[0] > 0
+        finally:
+            cursor.close()
+
+    def ensure_table(self, conn, table):
+        """表不存在时创建，返回是否新建"""
+        if self.table_exists(conn, table):
+            return False
+        cursor = conn.cursor()
+        try:
+            cursor.execute(self.create_table_sql(table))
+            conn.commit()
+        finally:
+            cursor.close()
+        return True
+
+    def years_between_sql(self, start, end):
+        """两个日期之间整年数的SQL表达式"""
+        return f"TIMESTAMPDIFF(YEAR, {start}, {end})"
+
+    def random_sql(self, seed=None):
+        """[0, 1) 随机数的SQL表达式，指定 seed 时同一种子得到相同的序列"""
+        return f"RAND({int(seed)})" if seed is not None else "RAND()"
+
+    def text_to_date_sql(self, expression):
+        """把 'YYYY-MM-DD' 字符串表达式用于与日期列比较（MySQL 会自动转换）"""
+        return expression
+
+    def period_sql(self, column, period):
+        """把日期列格式化为 'YYYY' 或 'YYYY-MM' 的SQL表达式"""
+        fmt = '%Y-%m' if period == 'month' else '%Y'
+        return f"DATE_FORMAT({column}, '{fmt}')"
+
+    def upsert_clause(self, key, columns):
+        updates = ', '.join(f"{self.quote(c)} = VALUES({self.quote(c)})" for c in columns if c != key)
+        return f"ON DUPLICATE KEY UPDATE {updates}"
+
+    def bulk_insert(self, conn, table, columns, rows, upsert_key=None, batch_size=1000):
+        """批量插入，指定 upsert_key 时遇到重复主键则更新其余列
+
+        在调用方的事务中执行，不提交。返回插入的行数。
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        column_sql = ', '.join(self.quote(c) for c in columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        query = f"INSERT INTO {table} ({column_sql}) VALUES ({placeholders})"
+        if upsert_key:
+            query += ' ' + self.upsert_clause(upsert_key, columns)
+        cursor = conn.cursor()
+        try:
+            for i in range(0, len(rows), batch_size):
+                cursor.executemany(query, rows[i:i + batch_size])
+        finally:
+            cursor.close()
+        return len(rows)
+
+    def update_join_sql(self, table, staging, key, columns):
+        assignments = ', '.join(f"t.{self.quote(c)} = s.{self.quote(c)}" for c in columns)
+        return f"UPDATE {table} t JOIN {staging} s ON t.{key} = s.{key} SET {assignments}"
+
+    def bulk_update(self, conn, table, key, columns, rows, batch_size=5000):
+        """按主键批量更新指定列：先写入临时表，再用一条 UPDATE ... JOIN 完成
+
+        rows 为 (key, column1, column2, ...) 元组。在调用方的事务中执行，不提交。
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return 0
+        schema_types = dict(TABLE_SCHEMAS[table]['columns'])
+        staging = f"{table}_staging"
+        definitions = [f"{self.quote(key)} {self.column_type(schema_types[key])} PRIMARY KEY"]
+        definitions += [f"{self.quote(c)} {self.column_type(schema_types[c])}" for c in columns]
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ({', '.join(definitions)})")
+            cursor.execute(f"DELETE FROM {staging}")
+            self.bulk_insert(conn, staging, [key] + list(columns), rows, batch_size=batch_size)
+            cursor.execute(self.update_join_sql(table, staging, key, columns))
+            cursor.execute(self.drop_temporary_sql(staging))
+        finally:
+            cursor.close()
+        return len(rows)
+
+    def drop_temporary_sql(self, table):
+        return f"DROP TEMPORARY TABLE {table}"
+
+    def init_sequence(self, conn, name, start):
+        """创建ID序列，已存在时不做任何修改（并发创建时只有一个生效）"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT IGNORE INTO id_sequences (name, next_value, updated_at) VALUES (%s, %s, %s)",
+                (name, start, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        finally:
+            cursor.close()
+
+    def reserve_sequence(self, conn, name, count):
+        """把序列一次前移 count，返回前移后的 next_value，序列不存在时返回 None
+
+        LAST_INSERT_ID(expr) 使新值只对当前连接可见，行锁只在这一条 UPDATE 内持有。
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE id_sequences SET next_value = LAST_INSERT_ID(next_value + %s), updated_at = %s "
+                "WHERE name = %s", (count, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), name))
+            if cursor.rowcount == 0:
+                return None
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            return int(cursor.fetchone()[0])
+        finally:
+            cursor.close()
+
+    def acquire_lock(self, name, timeout=0):
+        """获取当前数据库上以 name 命名的跨进程建议锁，最多等待 timeout 秒
+
+        返回锁句柄（交给 release_lock 释放），锁被其他进程持有时返回 None。
+        """
+        raise NotImplementedError
+
+    def release_lock(self, handle):
+        """释放 acquire_lock 获得的锁"""
+        raise NotImplementedError
+
+    def swap_tables(self, conn, table, shadow, retired):
+        """把 table 改名为 retired、shadow 改名为 table
+
+        RENAME TABLE 一次完成两个改名，其他会话不会看到表不存在的中间状态；
+        该语句会隐式提交，调用方事务中之前的修改随之一起提交。
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"RENAME TABLE {table} TO {retired}, {shadow} TO {table}")
+        finally:
+            cursor.close()
+
+    def fetch_termination_candidates(self, conn, limit, seed=None):
+        """按离职风险加权随机排序，返回前 limit 名在职员工（字典列表）
+
+        seed 由调用方的随机数生成器产生，使排序可以随其状态一起复现（补数据续跑时需要）。
+        """
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"""
+            SELECT {', '.join(TERMINATION_CANDIDATE_COLUMNS)}
+            FROM employees
+            WHERE {self.quote('left')} = 0
+            ORDER BY ({TERMINATION_WEIGHT_SQL}) * {self.random_sql(seed)} DESC
+            LIMIT %s
+            """, (limit,))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def aggregate(self, conn, group_by=(), where=None, params=()):
+        """按指定列分组统计人数、离职人数及主要指标的平均值"""
+        left = self.quote('left')
+        group_sql = ', '.join(self.quote(c) for c in group_by)
+        select_group = group_sql + ', ' if group_sql else ''
+        query = f"""
+        SELECT {select_group}
+               COUNT(*) AS total,
+               SUM(CASE WHEN {left} = 1 THEN 1 ELSE 0 END) AS leavers,
+               SUM(CASE WHEN {left} = 0 THEN 1 ELSE 0 END) AS headcount,
+               AVG(satisfaction_level) AS avg_satisfaction,
+               AVG(average_monthly_hours) AS avg_monthly_hours,
+               AVG(actual_salary) AS avg_salary,
+               AVG(CASE WHEN {left} = 0 THEN turnover_probability END) AS avg_turnover_probability
+        FROM employees
+        """
+        if where:
+            query += f" WHERE {where}"
+        if group_sql:
+            query += f" GROUP BY {group_sql} ORDER BY {group_sql}"
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, tuple(params))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        for row in rows:
+            for key in ('total', 'leavers', 'headcount'):
+                row[key] = int(row[key] or 0)
+            row['turnover_rate'] = row['leavers'] / row['total'] if row['total'] else 0.0
+        return rows
+
+    def period_counts(self, conn, period='year'):
+        """按年或按月统计入职和离职人数，返回 {期间: (入职, 离职)}"""
+        cursor = conn.cursor()
+        counts = {}
+        try:
+            for index, column in enumerate(('hire_date', 'termination_date')):
+                expression = self.period_sql(column, period)
+                cursor.execute(f"""
+                SELECT {expression} AS period, COUNT(*)
+                FROM employees
+                WHERE {column} IS NOT NULL
+                GROUP BY {expression}
+                """)
+                for key, count in cursor.fetchall():
+                    counts.setdefault(str(key), [0, 0])[index] += int(count)
+        finally:
+            cursor.close()
+        return {key: tuple(value) for key, value in sorted(counts.items())}
+
+
+class MySQLBackend(StorageBackend):
+    """MySQL后端，使用 mysql.connector"""
+
+    name = 'mysql'
+
+    def __init__(self, db_config=None):
+        self.db_config = dict(db_config or DB_CONFIG)
+
+    def _require_driver(self):
+        if _load_driver('mysql') is None:
+            raise RuntimeError("未安装 mysql-connector-python，无法使用MySQL后端")
+
+    def connect(self):
+        self._require_driver()
+        return mysql.connector.connect(**self.db_config)
+
+    def driver_errors(self):
+        if _load_driver('mysql') is None:
+            return DB_ERRORS
+        return (mysql.connector.Error, *DB_ERRORS)
+
+    def create_database(self):
+        self._require_driver()
+        server_config = {k: v for k, v in self.db_config.items() if k != 'database'}
+        conn = mysql.connector.connect(**server_config)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.db_config['database']}")
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        return True
+
+    def acquire_lock(self, name, timeout=0):
+        """GET_LOCK 的锁属于会话，因此用单独的连接持有；锁名在整个MySQL实例内共享，加上库名区分不同的库"""
+        lock_name = f"{self.db_config['database']}.{name}"[:64]
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (lock_name, timeout))
+            acquired = cursor.fetchone()[0] == 1
+        finally:
+            cursor.close()
+        if not acquired:
+            conn.close()
+            return None
+        return conn, lock_name
+
+    def release_lock(self, handle):
+        """释放 acquire_lock 获得的锁（连接断开时MySQL也会自动释放）"""
+        conn, lock_name = handle
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+            cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """SQLite嵌入式后端，连接由 sqlite_standin 提供"""
+
+    name = 'sqlite'
+    concurrent_writes = False  # 数据库文件同一时间只允许一个写入者
+
+    def __init__(self, path=None):
+        self.path = path or EMBEDDED_DB_PATH
+
+    def connect(self):
+        return sqlite_standin.Connection(self.path)
+
+    def quote(self, identifier):
+        return f'"{identifier}"'
+
+    def auto_increment_column(self, table, column):
+        return f"{self.quote(column)} INTEGER PRIMARY KEY AUTOINCREMENT"
+
+    def table_exists(self, conn, table):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+            return cursor.fetchone()[0] > 0
+        finally:
+            cursor.close()
+
+    def years_between_sql(self, start, end):
+        return f"TIMESTAMPDIFF_YEAR({start}, {end})"
+
+    def period_sql(self, column, period):
+        fmt = '%Y-%m' if period == 'month' else '%Y'
+        return f"strftime('{fmt}', {column})"
+
+    def upsert_clause(self, key, columns):
+        updates = ', '.join(f"{self.quote(c)} = excluded.{self.quote(c)}" for c in columns if c != key)
+        return f"ON CONFLICT({self.quote(key)}) DO UPDATE SET {updates}"
+
+    def init_sequence(self, conn, name, start):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO id_sequences (name, next_value, updated_at) VALUES (%s, %s, %s) "
+                "ON CONFLICT (name) DO NOTHING", (name, start, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        finally:
+            cursor.close()
+
+    def reserve_sequence(self, conn, name, count):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE id_sequences SET next_value = next_value + %s, updated_at = %s "
+                "WHERE name = %s RETURNING next_value", (count, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), name))
+            rows = cursor.fetchall()
+            return int(rows[0][0]) if rows else None
+        finally:
+            cursor.close()
+
+    def update_join_sql(self, table, staging, key, columns):
+        assignments = ', '.join(f"{self.quote(c)} = s.{self.quote(c)}" for c in columns)
+        return f"UPDATE {table} AS t SET {assignments} FROM {staging} AS s WHERE t.{key} = s.{key}"
+
+    def drop_temporary_sql(self, table):
+        return f"DROP TABLE {table}"
+
+    def acquire_lock(self, name, timeout=0):
+        """嵌入式数据库没有 GET_LOCK，改为对数据库文件旁的 <文件>.<name>.lock 加操作系统文件锁"""
+        handle = open(f"{self.path}.{name}.lock", 'a+b')
+        deadline = time.monotonic() + max(0, timeout)
+        while not _try_file_lock(handle):
+            if time.monotonic() >= deadline:
+                handle.close()
+                return None
+            time.sleep(LOCK_POLL_INTERVAL)
+        return handle
+
+    def release_lock(self, handle):
+        try:
+            _unlock_file(handle)
+        finally:
+            handle.close()
+
+    def swap_tables(self, conn, table, shadow, retired):
+        """在调用方的事务中用两条 ALTER TABLE 改名，提交前其他连接看不到改名"""
+        cursor = conn.cursor()
+        try:
+            # sqlite3 模块不会为DDL自动开启事务：用保存点包住两次改名，
+            # 调用方没有打开的事务时保存点本身就是一个事务，两次改名一起提交
+            cursor.execute("SAVEPOINT swap_tables")
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {retired}")
+            cursor.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+            cursor.execute("RELEASE SAVEPOINT swap_tables")
+        finally:
+            cursor.close()
+
+
+@contextlib.contextmanager
+def _translate_duckdb_errors():
+    """把 duckdb.Error 转换为 DuckDBError"""
+    try:
+        yield
+    except duckdb.Error as e:
+        raise DuckDBError(str(e)) from e
+
+
+class DuckDBConnection(sqlite_standin.Connection):
+    """mysql.connector 风格的DuckDB连接
+
+    DuckDB 的 cursor() 会打开独立的事务，因此所有游标都直接在同一连接上执行，
+    并在第一条语句前显式开启事务，以便与MySQL一样通过 commit()/rollback() 控制。
+    """
+
+    def __init__(self, path):
+        with _translate_duckdb_errors():
+            self._connection = duckdb.connect(path)
+            self._connection.execute("CREATE OR REPLACE MACRO RAND() AS random()")
+            self._connection.execute(
+                "CREATE OR REPLACE MACRO TIMESTAMPDIFF_YEAR(a, b) AS date_sub('year', CAST(a AS DATE), CAST(b AS DATE))")
+            self._connection.execute("CREATE OR REPLACE MACRO CURDATE() AS current_date")
+        self._in_transaction = False
+
+    def _begin(self):
+        if not self._in_transaction:
+            with _translate_duckdb_errors():
+                self._connection.execute("BEGIN TRANSACTION")
+            self._in_transaction = True
+
+    def cursor(self, dictionary=False, buffered=None):
+        return DuckDBCursor(self, dictionary=dictionary)
+
+    def commit(self):
+        if self._in_transaction:
+            with _translate_duckdb_errors():
+                self._connection.execute("COMMIT")
+            self._in_transaction = False
+
+    def rollback(self):
+        if self._in_transaction:
+            with _translate_duckdb_errors():
+                self._connection.execute("ROLLBACK")
+            self._in_transaction = False
+
+    def close(self):
+        self.rollback()
+        self._connection.close()
+
+
+class DuckDBCursor(sqlite_standin.Cursor):
+    """在DuckDB连接上执行语句的游标，反引号改写为双引号"""
+
+    def __init__(self, connection, dictionary=False):
+        self._owner = connection
+        self._cursor = connection._connection
+        self._dictionary = dictionary
+
+    def translate(self, sql):
+        sql = sqlite_standin.translate(sql)
+        return sql.replace('`', '"') if sql is not None else None
+
+    def execute(self, sql, params=()):
+        self._owner._begin()
+        with _translate_duckdb_errors():
+            return super().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        self._owner._begin()
+        with _translate_duckdb_errors():
+            return super().executemany(sql, seq_of_params)
+
+    def close(self):
+        pass
+
+
+class DuckDBBackend(SQLiteBackend):
+    """DuckDB嵌入式列式后端，聚合查询明显快于行存储"""
+
+    name = 'duckdb'
+    type_map = {'FLOAT': 'DOUBLE', 'DATETIME': 'TIMESTAMP'}
+
+    def __init__(self, path=None):
+        if _load_driver('duckdb') is None:
+            raise RuntimeError("未安装 duckdb，无法使用DuckDB后端")
+        super().__init__(path)
+
+    def connect(self):
+        return DuckDBConnection(self.path)
+
+    def auto_increment_column(self, table, column):
+        return f"{self.quote(column)} INTEGER PRIMARY KEY DEFAULT nextval('{table}_{column}_seq')"
+
+    def create_table_sql(self, table, name=None, temporary=False):
+        sql = super().create_table_sql(table, name=name, temporary=temporary)
+        if TABLE_SCHEMAS[table].get('auto_increment'):
+            sequence = f"{name or table}_{TABLE_SCHEMAS[table]['primary_key']}_seq"
+            sql = f"CREATE SEQUENCE IF NOT EXISTS {sequence};\n{sql}"
+        return sql
+
+    def ensure_table(self, conn, table):
+        if self.table_exists(conn, table):
+            return False
+        cursor = conn.cursor()
+        try:
+            for statement in self.create_table_sql(table).split(';\n'):
+                cursor.execute(statement)
+            conn.commit()
+        finally:
+            cursor.close()
+        return True
+
+    def bulk_insert(self, conn, table, columns, rows, upsert_key=None, batch_size=100000):
+        """DuckDB 的 executemany 逐行执行，这里改为注册DataFrame后用一条 INSERT ... SELECT 写入"""
+        import pandas as pd
+
+        rows = rows if isinstance(rows, list) else list(rows)
+        column_sql = ', '.join(self.quote(c) for c in columns)
+        query = f"INSERT INTO {table} ({column_sql}) SELECT {column_sql} FROM _bulk_rows"
+        if upsert_key:
+            query += ' ' + self.upsert_clause(upsert_key, columns)
+        conn._begin()
+        for i in range(0, len(rows), batch_size):
+            frame = pd.DataFrame(rows[i:i + batch_size], columns=columns)
+            conn._connection.register('_bulk_rows', frame)
+            try:
+                with _translate_duckdb_errors():
+                    conn._connection.execute(query)
+            finally:
+                conn._connection.unregister('_bulk_rows')
+        return len(rows)
+
+    def years_between_sql(self, start, end):
+        return f"date_sub('year', CAST({start} AS DATE), CAST({end} AS DATE))"
+
+    def swap_tables(self, conn, table, shadow, retired):
+        # DuckDB 不支持保存点；连接包装层在第一条语句前已开启事务，提交时两次改名一起生效
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {retired}")
+            cursor.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+        finally:
+            cursor.close()
+
+    def random_sql(self, seed=None):
+        # DuckDB 并行扫描时 setseed() 之后的 random() 也不可复现，带种子时改用员工ID的哈希
+        if seed is None:
+            return "random()"
+        return f"(hash(employee_id, {int(seed)}) % 1000003) / 1000003.0"
+
+    def text_to_date_sql(self, expression):
+        # DuckDB 不会把字符串表达式隐式转换为日期
+        return f"CAST({expression} AS DATE)"
+
+    def period_sql(self, column, period):
+        fmt = '%Y-%m' if period == 'month' else '%Y'
+        return f"strftime({column}, '{fmt}')"
+
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+    'duckdb': DuckDBBackend
+}
+
+_backend = None
+_replica = None
+
+
+def backend_from_dsn(dsn, name=None):
+    """根据DSN创建后端：mysql://用户:密码@主机:端口/数据库、sqlite://路径 或 duckdb://路径
+
+    DSN 不带协议时按 name（默认 config.STORAGE_BACKEND）指定的后端处理，嵌入式后端直接视为文件路径；
+    MySQL DSN 中未给出的部分沿用 config.DB_CONFIG。
+    """
+    scheme = dsn.split('://', 1)[0] if '://' in dsn else None
+    name = name or scheme or STORAGE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"未知的存储后端: {name}")
+    if name == 'mysql':
+        url = urlparse(dsn)
+        if url.scheme != 'mysql':
+            raise ValueError(f"MySQL DSN应为 mysql://用户:密码@主机:端口/数据库: {dsn}")
+        db_config = dict(DB_CONFIG, host=url.hostname or DB_CONFIG['host'], port=url.port or DB_CONFIG['port'])
+        if url.username:
+            db_config['user'] = unquote(url.username)
+        if url.password is not None:
+            db_config['password'] = unquote(url.password)
+        if url.path.strip('/'):
+            db_config['database'] = url.path.strip('/')
+        return MySQLBackend(db_config)
+    prefix = f'{name}://'
+    return BACKENDS[name](dsn[len(prefix):] if dsn.startswith(prefix) else dsn)
+
+
+def configure(name=None, path=None, db_config=None, replica_dsn=None, dsn=None):
+    """选择当前使用的存储后端，返回后端对象
+
+    dsn 给出时按 backend_from_dsn() 解析（如多租户运行时的各租户库），此时不使用 config.REPLICA_DSN；
+    replica_dsn 为只读分析副本，默认使用 config.REPLICA_DSN，未设置时不使用副本。
+    """
+    global _backend, _replica
+    if dsn:
+        _backend = backend_from_dsn(dsn, name)
+        name = _backend.name
+    else:
+        name = name or STORAGE_BACKEND
+        if name not in BACKENDS:
+            raise ValueError(f"未知的存储后端: {name}")
+        if name == 'mysql':
+            _backend = MySQLBackend(db_config)
+        else:
+            _backend = BACKENDS[name](path)
+        replica_dsn = replica_dsn or REPLICA_DSN
+    _replica = backend_from_dsn(replica_dsn, name) if replica_dsn else None
+    return _backend
+
+
+def add_cli_arguments(parser, db_path=True, replica=False):
+    """为命令行脚本添加 --backend、--db-path 参数，replica=True 时再添加 --replica-dsn"""
+    parser.add_argument('--backend', choices=sorted(BACKENDS), help='存储后端，默认使用 config.py 中的设置')
+    if db_path:
+        parser.add_argument('--db-path', type=str, help='嵌入式数据库文件路径（sqlite/duckdb 后端）')
+    if replica:
+        parser.add_argument('--replica-dsn', type=str, help='只读分析副本，默认使用 config.py 中的设置')
+    return parser
+
+
+def configure_from_args(args):
+    """按 add_cli_arguments() 添加的参数选择存储后端，均未指定时沿用 config.py 的配置，返回当前后端"""
+    db_path = getattr(args, 'db_path', None)
+    replica_dsn = getattr(args, 'replica_dsn', None)
+    if args.backend or db_path or replica_dsn:
+        return configure(args.backend, path=db_path, replica_dsn=replica_dsn)
+    return get_backend()
+
+
+def get_backend():
+    """返回当前存储后端，首次调用时按 config.py 的配置创建"""
+    if _backend is None:
+        configure()
+    return _backend
+
+
+def get_replica_backend():
+    """返回只读分析副本的后端，未配置副本时返回 None"""
+    get_backend()
+    return _replica
+
+
+def fetch_update_watermark(conn):
+    """获取 last_update 表的最新记录 (id, 更新日期)，用于判断数据是否已刷新"""
+    if not get_backend().table_exists(conn, 'last_update'):
+        return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(id), MAX(update_date) FROM last_update")
+        result = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not result or result[0] is None:
+        return None
+    return result[0], str(result[1])
+
+
+def replica_lag(primary_watermark, replica_watermark):
+    """副本落后主库的 last_update 记录数"""
+    primary_id = primary_watermark[0] if primary_watermark else 0
+    replica_id = replica_watermark[0] if replica_watermark else 0
+    return max(0, primary_id - replica_id)
+
+
+def connect_for_analytics(max_lag=None):
+    """为只读分析查询返回 (连接, 'replica' 或 'primary')
+
+    配置了副本且副本的 last_update 水位落后主库不超过 max_lag（默认 config.REPLICA_MAX_LAG）时连接副本，
+    副本不可用或数据过旧时回退到主库，避免分析查询与 daily_update 的写事务争用主库。
+    """
+    primary = get_backend()
+    replica = get_replica_backend()
+    if replica is None:
+        return primary.connect(), 'primary'
+    max_lag = REPLICA_MAX_LAG if max_lag is None else max_lag
+
+    try:
+        replica_conn = replica.connect()
+    except DB_ERRORS as e:
+        logging.warning(f"分析副本连接失败，回退到主库: {e}")
+        return primary.connect(), 'primary'
+    try:
+        replica_watermark = fetch_update_watermark(replica_conn)
+        primary_conn = primary.connect()
+        try:
+            primary_watermark = fetch_update_watermark(primary_conn)
+        finally:
+            primary_conn.close()
+    except DB_ERRORS as e:
+        replica_conn.close()
+        logging.warning(f"检查分析副本延迟失败，回退到主库: {e}")
+        return primary.connect(), 'primary'
+
+    lag = replica_lag(primary_watermark, replica_watermark)
+    if lag <= max_lag:
+        return replica_conn, 'replica'
+    replica_conn.close()
+    logging.warning(f"分析副本落后主库 {lag} 次更新（副本: {replica_watermark}, 主库: {primary_watermark}），回退到主库")
+    return primary.connect(), 'primary'
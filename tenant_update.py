@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多租户并发每日更新 (HR离职分析版)
+
+每个业务单元使用独立的 employee_db，原先由各自的 cron 依次运行 daily_update.py，
+整晚耗时是所有租户之和。此脚本：
+- 读取租户DSN列表（命令行参数或 --tenants-file，每行 [名称=]DSN，# 开头为注释），
+  DSN 格式见 storage.backend_from_dsn()：mysql://用户:密码@主机:端口/数据库、sqlite://路径、duckdb://路径
+- 在进程池中并发更新各租户（storage 的后端配置是进程级的全局状态，每个租户在独立进程中运行），
+  总耗时取决于最慢的租户
+- 更新前获取该库的更新锁（MySQL GET_LOCK，嵌入式数据库为文件锁），与同一库上的其他更新进程
+  （包括单独运行的 daily_update.py 和 ingest.py）互斥；锁被占用时等待 --lock-timeout 秒后跳过该租户，
+  持锁后再次检查 last_update，当天已更新则不重复更新，因此重叠或重复的运行是安全且幂等的
+- 新员工ID从各库的ID序列原子预留（id_allocator.py），不依赖 MAX(employee_id)
+- 每个租户的二进制事件日志单独存放：config.EVENT_LOG_PATH 加上租户名，如 employee_events.<租户>.bin
+- 输出每个租户的状态、等待锁的时间和更新耗时，以及总耗时与各租户耗时之和
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import change_log
+import daily_update
+import storage
+from config import EVENT_LOG_PATH
+from storage import DB_ERRORS
+
+DEFAULT_MAX_WORKERS = 8
+LOG_FORMAT = '%(asctime)s - %(levelname)s - [{tenant}] %(message)s'
+
+# 各租户的运行结果
+STATUS_UPDATED = 'updated'
+STATUS_UP_TO_DATE = 'up_to_date'
+STATUS_LOCKED = 'locked'
+STATUS_FAILED = 'failed'
+STATUS_LABELS = {
+    STATUS_UPDATED: '已更新',
+    STATUS_UP_TO_DATE: '当天已更新',
+    STATUS_LOCKED: '被占用，跳过',
+    STATUS_FAILED: '失败'
+}
+
+
+def tenant_name(dsn):
+    """未指定名称时用库名或数据库文件名作为租户名"""
+    if dsn.startswith('mysql://'):
+        return storage.backend_from_dsn(dsn).db_config['database']
+    return os.path.splitext(os.path.basename(dsn.split('://', 1)[-1]))[0]
+
+
+def tenant_event_log(tenant):
+    """租户的二进制事件日志路径"""
+    root, ext = os.path.splitext(EVENT_LOG_PATH)
+    return f"{root}.{tenant}{ext}"
+
+
+def parse_tenants(lines):
+    """解析 [名称=]DSN 列表，返回 [(名称, DSN)]，名称重复时抛出 ValueError"""
+    tenants = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        name, sep, dsn = line.partition('=')
+        # 只有 = 出现在 :// 之前时才是名称（DSN 的密码或查询串中也可能有 =）
+        if not sep or '://' in name:
+            name, dsn = tenant_name(line), line
+        tenants.append((name.strip(), dsn.strip()))
+    names = [name for name, _ in tenants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"租户名称重复: {', '.join(duplicates)}")
+    return tenants
+
+
+def failed_result(tenant):
+    """租户失败时的结果"""
+    return {'tenant': tenant, 'status': STATUS_FAILED, 'lock_wait': 0.0, 'seconds': 0.0}
+
+
+def update_tenant(tenant, dsn, update_date, lock_timeout=0):
+    """在子进程中更新一个租户，返回 {'tenant', 'status', 'lock_wait', 'seconds'}"""
+    formatter = logging.Formatter(LOG_FORMAT.format(tenant=tenant))
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(formatter)
+    # 子进程可能从父进程继承相同的随机数状态，各租户重新从系统熵取种子
+    import numpy as np
+    random.seed()
+    np.random.seed()
+
+    start = time.perf_counter()
+    result = failed_result(tenant)
+    expected_errors = (OSError, RuntimeError, ValueError, *DB_ERRORS)
+    try:
+        backend = storage.configure(dsn=dsn)
+        expected_errors += backend.driver_errors()
+        change_log.configure(tenant_event_log(tenant))
+        lock = backend.acquire_lock(daily_update.UPDATE_LOCK_NAME, lock_timeout)
+        result['lock_wait'] = time.perf_counter() - start
+        if lock is None:
+            logging.warning("另一个进程正在更新此数据库，跳过")
+            result['status'] = STATUS_LOCKED
+        else:
+            try:
+                # 持锁后再检查一次：等待锁期间其他进程可能已完成当天的更新
+                if daily_update.get_last_update_date() == update_date:
+                    logging.info(f"数据库已经在 {update_date} 更新过，不再重复更新")
+                    result['status'] = STATUS_UP_TO_DATE
+                elif daily_update.update_employee_database(update_date):
+                    result['status'] = STATUS_UPDATED
+            finally:
+                backend.release_lock(lock)
+    except Exception as e:
+        # 任何错误都只使该租户失败，其他租户照常完成并输出报告
+        if isinstance(e, expected_errors):
+            logging.error(f"更新失败: {e}")
+        else:
+            logging.exception(f"更新失败: {e}")
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_tenants(tenants, update_date, workers=None, lock_timeout=0):
+    """并发更新所有租户，返回按输入顺序排列的结果列表"""
+    workers = workers or min(len(tenants), DEFAULT_MAX_WORKERS)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(update_tenant, name, dsn, update_date, lock_timeout) for name, dsn in tenants]
+        for (name, _), future in zip(tenants, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # 子进程异常退出（如被系统终止）或结果无法传回
+                logging.error(f"[{name}] 更新进程异常结束: {e!r}")
+                results.append(failed_result(name))
+    return results
+
+
+def print_report(results, wall_seconds):
+    """输出每个租户的状态和耗时"""
+    width = max(len('租户'), *(len(result['tenant']) for result in results))
+    print("\n===== 多租户每日更新 =====")
+    print(f"{'租户':<{width}}  {'状态':<8}  {'等待锁(秒)':>10}  {'耗时(秒)':>9}")
+    for result in results:
+        print(f"{result['tenant']:<{width}}  {STATUS_LABELS[result['status']]:<8}  "
+              f"{result['lock_wait']:>10.2f}  {result['seconds']:>9.2f}")
+    counts = {status: sum(result['status'] == status for result in results) for status in STATUS_LABELS}
+    print(f"总耗时 {wall_seconds:.2f} 秒（各租户耗时之和 {sum(result['seconds'] for result in results):.2f} 秒）；"
+          + '，'.join(f"{STATUS_LABELS[status]} {count}" for status, count in counts.items() if count))
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='并发运行多个租户数据库的每日更新')
+    parser.add_argument('tenants', nargs='*', help='租户DSN，可写成 名称=DSN')
+    parser.add_argument('--tenants-file', type=str, help='租户列表文件，每行一个 [名称=]DSN')
+    parser.add_argument('--date', type=str, help='更新日期 (YYYY-MM-DD 格式)，默认当天')
+    parser.add_argument('--workers', type=int, help=f'并发进程数，默认为租户数（最多 {DEFAULT_MAX_WORKERS}）')
+    parser.add_argument('--lock-timeout', type=float, default=daily_update.UPDATE_LOCK_TIMEOUT,
+                        help='租户正被其他进程更新时最多等待的秒数')
+    args = parser.parse_args()
+
+    lines = list(args.tenants)
+    if args.tenants_file:
+        with open(args.tenants_file, encoding='utf-8') as f:
+            lines.extend(f)
+    try:
+        tenants = parse_tenants(lines)
+    except ValueError as e:
+        parser.error(str(e))
+    if not tenants:
+        parser.error('请指定至少一个租户DSN')
+    update_date = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else datetime.now().date()
+
+    logging.info(f"开始更新 {len(tenants)} 个租户: {update_date}")
+    start = time.perf_counter()
+    results = run_tenants(tenants, update_date, args.workers, args.lock_timeout)
+    print_report(results, time.perf_counter() - start)
+    return 1 if any(result['status'] == STATUS_FAILED for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,10 @@
 # test_mysql_connection.py
 import mysql.connector
 
+from config import DB_CONFIG
+
 try:
-    conn = mysql.connector.connect(
-        host='localhost',
-        user='root',
-        password='Taylor@1989',  # 填写您的密码
-        database='employee_db'
-    )
+    conn = mysql.connector.connect(**DB_CONFIG)  # 连接信息统一在 config.py 中配置
     print("连接成功！")
     
     cursor = conn.cursor()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+快照对比测试 (HR离职分析版)
+
+检查 snapshot_diff.diff_snapshots() 对重复 employee_id 的处理：
+- 两侧都以最后一次出现的行为准，快照与自身对比不报告任何变化
+- 每个重复的键只计一次
+- 分区哈希连接与不分区的结果一致
+
+运行：python -m pytest -q test_snapshot_diff.py
+"""
+
+import csv
+
+import pytest
+
+import snapshot_diff
+
+HEADER = ['employee_id', 'department', 'salary', 'last_updated']
+
+
+def write_snapshot(path, rows):
+    """把 rows 写成带表头的CSV快照"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def duplicated(tmp_path):
+    """1001 出现两次、1002 出现三次，且各次取值不同"""
+    return write_snapshot(tmp_path / 'duplicated.csv', [
+        ['1001', 'sales', 'low', '2025-06-01'],
+        ['1002', 'IT', 'medium', '2025-06-01'],
+        ['1001', 'sales', 'high', '2025-06-02'],
+        ['1003', 'hr', 'low', '2025-06-01'],
+        ['1002', 'IT', 'low', '2025-06-02'],
+        ['1002', 'support', 'high', '2025-06-03'],
+    ])
+
+
+@pytest.mark.parametrize('partitions', [1, 3])
+def test_snapshot_with_duplicates_equals_itself(duplicated, partitions):
+    result = snapshot_diff.diff_snapshots(duplicated, duplicated, partitions=partitions)
+    assert (result.added, result.removed, result.changed) == (0, 0, 0)
+    assert result.unchanged == 3
+    assert result.duplicate_keys == 2
+
+
+@pytest.mark.parametrize('partitions', [1, 3])
+def test_duplicates_compare_last_occurrence(duplicated, tmp_path, partitions):
+    new = write_snapshot(tmp_path / 'new.csv', [
+        ['1001', 'sales', 'high', '2025-06-04'],
+        ['1002', 'support', 'medium', '2025-06-04'],
+        ['1004', 'IT', 'low', '2025-06-04'],
+    ])
+    result = snapshot_diff.diff_snapshots(duplicated, new, partitions=partitions)
+    assert (result.added, result.removed, result.changed, result.unchanged) == (1, 1, 1, 1)
+    assert result.column_changes == {'department': 0, 'salary': 1}
+    assert result.duplicate_keys == 2
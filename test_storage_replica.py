@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分析副本路由测试 (HR离职分析版)
+
+用两个SQLite文件分别充当主库和分析副本，检查 storage.connect_for_analytics()：
+- 副本与主库的 last_update 水位一致时连接副本
+- 副本落后超过 max_lag 时回退到主库，落后不超过 max_lag 时仍使用副本
+- 副本无法连接、未配置副本时使用主库
+
+运行：python -m pytest -q test_storage_replica.py
+"""
+
+import pytest
+
+import storage
+
+
+def write_updates(path, dates):
+    """在 path 的 last_update 表中登记 dates 中的每个更新日期"""
+    backend = storage.SQLiteBackend(str(path))
+    conn = backend.connect()
+    try:
+        backend.ensure_table(conn, 'last_update')
+        cursor = conn.cursor()
+        try:
+            for update_date in dates:
+                cursor.execute("INSERT INTO last_update (update_date, updated_at) VALUES (%s, %s)",
+                               (update_date, f"{update_date} 01:00:00"))
+        finally:
+            cursor.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    """返回 (主库路径, 副本路径)，测试结束后恢复 storage 的全局后端配置"""
+    monkeypatch.setattr(storage, '_backend', None)
+    monkeypatch.setattr(storage, '_replica', None)
+    monkeypatch.setattr(storage, 'REPLICA_DSN', None)
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    write_updates(primary, ['2025-06-01', '2025-06-02'])
+    write_updates(replica, ['2025-06-01', '2025-06-02'])
+    return primary, replica
+
+
+def route(primary, replica_dsn, max_lag=None):
+    """按给定的主库和副本配置路由一次，返回 'replica' 或 'primary'"""
+    storage.configure('sqlite', path=str(primary), replica_dsn=replica_dsn)
+    conn, role = storage.connect_for_analytics(max_lag=max_lag)
+    conn.close()
+    return role
+
+
+def test_in_sync_replica_is_used(databases):
+    primary, replica = databases
+    assert route(primary, f"sqlite://{replica}") == 'replica'
+
+
+def test_stale_replica_falls_back_to_primary(databases):
+    primary, replica = databases
+    write_updates(primary, ['2025-06-03'])
+    assert route(primary, f"sqlite://{replica}", max_lag=0) == 'primary'
+
+
+def test_lag_within_limit_uses_replica(databases):
+    primary, replica = databases
+    write_updates(primary, ['2025-06-03'])
+    assert route(primary, f"sqlite://{replica}", max_lag=1) == 'replica'
+
+
+def test_replica_without_last_update_is_stale(databases, tmp_path):
+    primary, _ = databases
+    empty = tmp_path / 'empty.db'
+    storage.SQLiteBackend(str(empty)).connect().close()
+    assert route(primary, f"sqlite://{empty}", max_lag=0) == 'primary'
+
+
+def test_unreachable_replica_falls_back_to_primary(databases, tmp_path):
+    primary, _ = databases
+    missing = tmp_path / 'no_such_dir' / 'replica.db'
+    assert route(primary, f"sqlite://{missing}") == 'primary'
+
+
+def test_no_replica_configured_uses_primary(databases):
+    primary, _ = databases
+    assert route(primary, None) == 'primary'
+
+
+def test_replica_lag_counts_update_records():
+    assert storage.replica_lag((5, '2025-06-05'), (3, '2025-06-03')) == 2
+    assert storage.replica_lag((5, '2025-06-05'), None) == 5
+    assert storage.replica_lag(None, (3, '2025-06-03')) == 0
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+员工数据完整性校验 (HR离职分析版)
+
+用一次整体计算检查员工表或快照的全部数据，返回每条规则的违规数量和示例员工ID：
+- 离职日期晚于入职日期；left 与 termination_date 一致
+- 在职员工的工作年限与入职日期一致（需要指定校验日期）
+- 满意度、评估分数、月均工时、项目数、离职概率在合理范围内
+- employee_id 唯一；department、salary_level 取值在预设类别内
+- 数据库中的表：所有规则合并为一条聚合查询，由数据库一次扫描完成，只有存在违规的规则
+  才再查询示例ID；快照（CSV/Parquet）和 EmployeeStore：用NumPy向量化计算
+- daily_update 每次更新后、data.py 每次批量导入后自动运行，违规时记录警告
+"""
+
+import argparse
+import logging
+import sys
+from datetime import date, datetime
+
+import numpy as np
+
+import storage
+from employee_store import CATEGORICAL_COLUMNS, read_snapshot_frame
+from storage import get_backend
+
+SAMPLE_SIZE = 10
+
+# 数值列的合理范围（闭区间，与 data.py 的生成范围一致）
+VALUE_RANGES = {
+    'satisfaction_level': (0.0, 1.0),
+    'last_evaluation': (0.0, 1.0),
+    'average_monthly_hours': (96, 310),
+    'number_project': (2, 7),
+    'turnover_probability': (0.0, 1.0)
+}
+
+# 类别列的取值范围
+CATEGORY_DOMAINS = {name: categories for name, (_, categories) in CATEGORICAL_COLUMNS.items()}
+
+# 校验需要的列
+VALIDATION_COLUMNS = [
+    'employee_id', 'left', 'hire_date', 'termination_date', 'time_spend_company',
+    *VALUE_RANGES, *CATEGORY_DOMAINS
+]
+
+RULE_DESCRIPTIONS = {
+    'termination_after_hire': '离职日期必须晚于入职日期',
+    'left_matches_termination_date': 'left=1 当且仅当有离职日期',
+    'tenure_matches_hire_date': '在职员工的工作年限等于入职至校验日期的整年数',
+    **{f'{column}_in_range': f'{column} 在 [{low}, {high}] 范围内' for column, (low, high) in VALUE_RANGES.items()},
+    'unique_employee_id': 'employee_id 不重复',
+    **{f'{column}_in_domain': f'{column} 属于预设类别' for column in CATEGORY_DOMAINS}
+}
+
+
+def _years_between(start, end):
+    """两个 datetime64[D] 数组（或日期）之间的整年数，与 MySQL TIMESTAMPDIFF(YEAR, ...) 一致"""
+    def parts(values):
+        months = values.astype('datetime64[M]')
+        years = months.astype('datetime64[Y]').astype(np.int64) + 1970
+        month_day = (months.astype(np.int64) % 12 + 1) * 100 + (values - months).astype(np.int64) + 1
+        return years, month_day
+
+    # 结束日期早于开始日期时结果为负数，与 MySQL 一样向零取整
+    start, end = np.broadcast_arrays(start, end)
+    backwards = end < start
+    start_year, start_md = parts(np.where(backwards, end, start))
+    end_year, end_md = parts(np.where(backwards, start, end))
+    years = end_year - start_year - (end_md < start_md)
+    return np.where(backwards, -years, years)
+
+
+def _sample_ids(employee_ids, mask):
+    return [int(emp_id) for emp_id in employee_ids[mask][:SAMPLE_SIZE]]
+
+
+def validate_columns(columns, as_of=None):
+    """用NumPy校验列数组，返回 {规则名: {'violations': 违规数, 'sample_ids': 示例ID}}
+
+    columns 需包含 VALIDATION_COLUMNS 中的列：日期为 datetime64 数组（缺失为NaT），
+    类别列为字符串数组。as_of 为空时跳过工作年限规则。
+    """
+    employee_ids = np.asarray(columns['employee_id'], dtype=np.int64)
+    left = np.asarray(columns['left'])
+    hire = np.asarray(columns['hire_date']).astype('datetime64[D]')
+    termination = np.asarray(columns['termination_date']).astype('datetime64[D]')
+    terminated = ~np.isnat(termination)
+
+    masks = {
+        # NaT 参与比较时结果为False，因此无离职日期的行不会违规
+        'termination_after_hire': terminated & (termination <= hire),
+        'left_matches_termination_date': (left == 1) != terminated
+    }
+    if as_of is not None:
+        tenure = np.asarray(columns['time_spend_company'], dtype=np.float64)
+        expected = _years_between(hire, np.datetime64(as_of, 'D'))
+        masks['tenure_matches_hire_date'] = (left == 0) & ~np.isnat(hire) & (tenure != expected)
+    for column, (low, high) in VALUE_RANGES.items():
+        values = np.asarray(columns[column], dtype=np.float64)
+        masks[f'{column}_in_range'] = np.isnan(values) | (values < low) | (values > high)
+
+    # 重复ID：排序后与前一个相同的位置
+    order = np.argsort(employee_ids, kind='stable')
+    duplicated = np.zeros(len(employee_ids), dtype=bool)
+    duplicated[order[1:]] = employee_ids[order[1:]] == employee_ids[order[:-1]]
+    masks['unique_employee_id'] = duplicated
+
+    for column, domain in CATEGORY_DOMAINS.items():
+        masks[f'{column}_in_domain'] = ~np.isin(np.asarray(columns[column], dtype=object), domain)
+
+    return {
+        rule: {'violations': int(mask.sum()), 'sample_ids': _sample_ids(employee_ids, mask)}
+        for rule, mask in masks.items()
+    }
+
+
+def columns_from_store(store):
+    """从 EmployeeStore 取出校验需要的列（数值和日期列直接引用底层数组）"""
+    columns = {name: store.column(name) for name in VALIDATION_COLUMNS if name not in CATEGORY_DOMAINS}
+    for name in CATEGORY_DOMAINS:
+        categories = np.asarray(store.categories(name), dtype=object)
+        columns[name] = categories[store.column(name)]
+    return columns
+
+
+def columns_from_frame(df):
+    """从 pandas DataFrame 取出校验需要的列"""
+    import pandas as pd
+
+    columns = {name: df[name].to_numpy() for name in VALIDATION_COLUMNS}
+    for name in ('hire_date', 'termination_date'):
+        columns[name] = pd.to_datetime(df[name], errors='coerce').to_numpy().astype('datetime64[D]')
+    return columns
+
+
+def validate_store(store, as_of=None):
+    """校验内存中的 EmployeeStore"""
+    return validate_columns(columns_from_store(store), as_of)
+
+
+def validate_snapshot(path, as_of=None):
+    """校验员工快照文件（CSV或Parquet），支持旧版列名；缺少校验需要的列时抛出 ValueError"""
+    df = read_snapshot_frame(path, VALIDATION_COLUMNS)
+    return validate_columns(columns_from_frame(df), as_of)
+
+
+def rule_predicates(backend, as_of=None):
+    """各规则的SQL违规条件（与 validate_columns 中的规则一一对应），返回 [(规则名, 条件, 参数)]"""
+    left = backend.quote('left')
+    predicates = [
+        ('termination_after_hire', "termination_date IS NOT NULL AND termination_date <= hire_date", ()),
+        ('left_matches_termination_date',
+         f"({left} = 1 AND termination_date IS NULL) OR ({left} <> 1 AND termination_date IS NOT NULL)", ())
+    ]
+    if as_of is not None:
+        predicates.append((
+            'tenure_matches_hire_date',
+            f"{left} = 0 AND hire_date IS NOT NULL AND "
+            f"COALESCE(time_spend_company, -1) <> {backend.years_between_sql('hire_date', '%s')}",
+            (as_of.strftime('%Y-%m-%d'),)
+        ))
+    for column, (low, high) in VALUE_RANGES.items():
+        predicates.append((f'{column}_in_range', f"{column} IS NULL OR {column} < {low} OR {column} > {high}", ()))
+    for column, domain in CATEGORY_DOMAINS.items():
+        values = ', '.join(f"'{value}'" for value in domain)
+        predicates.append((f'{column}_in_domain', f"{column} IS NULL OR {column} NOT IN ({values})", ()))
+    return predicates
+
+
+def validate_table(conn, as_of=None):
+    """校验数据库中的员工表：全部规则合并为一条聚合查询，返回格式同 validate_columns"""
+    backend = get_backend()
+    predicates = rule_predicates(backend, as_of)
+    select = [f"SUM(CASE WHEN {predicate} THEN 1 ELSE 0 END)" for _, predicate, _ in predicates]
+    select.append("COUNT(*) - COUNT(DISTINCT employee_id)")
+    params = [param for _, _, rule_params in predicates for param in rule_params]
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(select)} FROM employees", tuple(params))
+        counts = [int(value or 0) for value in cursor.fetchone()]
+
+        report = {}
+        for (rule, predicate, rule_params), count in zip(predicates, counts):
+            sample_ids = []
+            if count:
+                cursor.execute(f"SELECT employee_id FROM employees WHERE {predicate} LIMIT {SAMPLE_SIZE}",
+                               rule_params)
+                sample_ids = [int(row[0]) for row in cursor.fetchall()]
+            report[rule] = {'violations': count, 'sample_ids': sample_ids}
+
+        sample_ids = []
+        if counts[-1]:
+            cursor.execute(f"SELECT employee_id FROM employees GROUP BY employee_id "
+                           f"HAVING COUNT(*) > 1 LIMIT {SAMPLE_SIZE}")
+            sample_ids = [int(row[0]) for row in cursor.fetchall()]
+        report['unique_employee_id'] = {'violations': counts[-1], 'sample_ids': sample_ids}
+    finally:
+        cursor.close()
+    return report
+
+
+def total_violations(report):
+    return sum(result['violations'] for result in report.values())
+
+
+def log_report(report, source):
+    """记录校验结果：无违规时一行INFO，否则每条违规规则一行WARNING"""
+    violated = {rule: result for rule, result in report.items() if result['violations']}
+    if not violated:
+        logging.info(f"数据校验通过 ({source}): {len(report)} 条规则")
+        return
+    for rule, result in violated.items():
+        logging.warning(f"数据校验 ({source}) {rule}: {result['violations']} 条违规 "
+                        f"[{RULE_DESCRIPTIONS.get(rule, rule)}] 示例ID: {result['sample_ids']}")
+
+
+def print_report(report, source):
+    """打印校验报告"""
+    print(f"\n===== 数据校验: {source} =====")
+    for rule, result in report.items():
+        status = '通过' if not result['violations'] else f"{result['violations']} 条违规"
+        print(f"  {rule}: {status}")
+        if result['sample_ids']:
+            print(f"    示例ID: {', '.join(str(emp_id) for emp_id in result['sample_ids'])}")
+    print(f"违规总数: {total_violations(report)}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='员工数据完整性校验')
+    parser.add_argument('--snapshot', type=str, help='校验快照文件（CSV或Parquet），默认校验数据库中的员工表')
+    parser.add_argument('--as-of', type=str,
+                        help='工作年限规则的校验日期 (YYYY-MM-DD)，默认为数据库最后更新日期，快照默认不检查')
+    storage.add_cli_arguments(parser)
+    args = parser.parse_args()
+
+    as_of = datetime.strptime(args.as_of, '%Y-%m-%d').date() if args.as_of else None
+
+    if args.snapshot:
+        try:
+            report = validate_snapshot(args.snapshot, as_of)
+        except ValueError as e:
+            print(f"无法校验快照: {e}", file=sys.stderr)
+            return 1
+        print_report(report, args.snapshot)
+        return 1 if total_violations(report) else 0
+
+    storage.configure_from_args(args)
+    backend = get_backend()
+    conn = backend.connect()
+    try:
+        if not backend.table_exists(conn, 'employees'):
+            print("数据库中没有 employees 表")
+            return 1
+        if as_of is None and backend.table_exists(conn, 'last_update'):
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(update_date) FROM last_update")
+            last_update = cursor.fetchone()[0]
+            cursor.close()
+            if last_update:
+                as_of = date.fromisoformat(str(last_update)[:10])
+        report = validate_table(conn, as_of)
+    finally:
+        conn.close()
+    print_report(report, f"employees 表 (校验日期: {as_of or '不检查工作年限'})")
+    return 1 if total_violations(report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())